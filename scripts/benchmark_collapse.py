@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+# Usage: python -m scripts.benchmark_collapse --hits 100 --inner-hits 20
+import argparse
+import copy
+import time
+
+import numpy
+from pydash import _
+
+from shraga_common.retrievers.collapse import collapse_hits, get_inner_hits
+
+
+def parse_args():
+    """Parse command line arguments."""
+    parser = argparse.ArgumentParser(
+        description="Measure the time to merge a page of collapsed hits with their chunks."
+    )
+    parser.add_argument("--hits", type=int, default=100, help="Hits per result page")
+    parser.add_argument("--inner-hits", type=int, default=20, help="Inner hits per hit")
+    parser.add_argument("--text-size", type=int, default=1000, help="Characters per chunk")
+    parser.add_argument("--iterations", type=int, default=200, help="Pages to merge")
+    return parser.parse_args()
+
+
+def legacy_merge_inner_hits_results(inner_hits, orig_doc):
+    """The pydash based merge that collapse.merge_inner_hits_results replaced."""
+    original_chunk = orig_doc.get("_source", {})
+    original_system_id = original_chunk.get("system_id", "")
+    inner_hits.append(orig_doc)
+    inner_hits = sorted(_.uniq(inner_hits), key=lambda x: x["_id"])
+    inner_hits = _.uniq_by(inner_hits, lambda x: x["_source"].get("system_id", x["_id"]))
+    merged_text = "\n".join([x["_source"]["text"] for x in inner_hits])
+    merged_inner_hits = inner_hits[0]["_source"] if inner_hits else {}
+    merged_inner_hits["_score"] = orig_doc.get("_score", 0)
+    merged_inner_hits["_index"] = orig_doc.get("_index", "")
+    merged_inner_hits["_id"] = original_chunk["id"]
+    merged_inner_hits["text"] = merged_text
+    merged_inner_hits["chunk_text_length"] = len(merged_text)
+    start_system_id = inner_hits[0]["_source"].get("system_id", "")
+    end_system_id = inner_hits[-1]["_source"].get("system_id", "")
+    merged_inner_hits["system_id"] = f"{start_system_id} - {end_system_id} ({original_system_id})"
+    return merged_inner_hits
+
+
+def legacy_collapse_hits(hits):
+    return [legacy_merge_inner_hits_results(get_inner_hits(hit), hit) for hit in hits]
+
+
+def synthetic_page(n_hits: int, n_inner_hits: int, text_size: int):
+    """A collapsed result page, where every hit is also one of its own inner hits."""
+    text = "x" * text_size
+    page = []
+    for doc in range(n_hits):
+        chunks = [
+            {
+                "_id": f"{doc}-{chunk:04d}",
+                "_index": "index",
+                "_score": 1.0,
+                "_source": {"id": str(doc), "system_id": f"{doc}-{chunk}", "text": text},
+            }
+            for chunk in range(n_inner_hits)
+        ]
+        hit = copy.deepcopy(chunks[n_inner_hits // 2])
+        hit["inner_hits"] = {"chunks": {"hits": {"hits": chunks}}}
+        page.append(hit)
+    return page
+
+
+def measure(merge, page, iterations: int):
+    latencies = []
+    for _i in range(iterations):
+        # merging updates the hits in place, so every iteration gets a fresh page
+        fresh_page = copy.deepcopy(page)
+        start = time.perf_counter()
+        merge(fresh_page)
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+
+def benchmark(args):
+    page = synthetic_page(args.hits, args.inner_hits, args.text_size)
+    print(f"{args.hits} hits x {args.inner_hits} inner hits, {args.iterations} pages")
+    print(f"{'merge':<10}{'mean ms':>10}{'p50 ms':>10}{'p99 ms':>10}")
+    for name, merge in [("legacy", legacy_collapse_hits), ("current", collapse_hits)]:
+        latencies = measure(merge, page, args.iterations)
+        print(
+            f"{name:<10}{numpy.mean(latencies):>10.3f}"
+            f"{numpy.percentile(latencies, 50):>10.3f}{numpy.percentile(latencies, 99):>10.3f}"
+        )
+
+
+def main():
+    benchmark(parse_args())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+# Usage: python -m scripts.benchmark_local_knn --size 100000 --dim 256 --index-factory HNSW32
+import argparse
+import time
+from typing import Optional
+
+import faiss
+import numpy
+
+from shraga_common.retrievers.local_document_store import LocalDocumentStore
+from shraga_common.retrievers.local_knn import LocalKnnRetriever
+
+DEFAULT_INDEX_FACTORIES = ["Flat", "HNSW32", "IVF256,Flat", "IVF256,SQ8", "IVF256,PQ32"]
+
+
+def parse_args():
+    """Parse command line arguments."""
+    parser = argparse.ArgumentParser(
+        description="Compare recall and latency of LocalKnnRetriever index types on a synthetic corpus."
+    )
+    parser.add_argument("--size", type=int, default=100_000, help="Number of corpus vectors")
+    parser.add_argument("--dim", type=int, default=256, help="Vector dimension")
+    parser.add_argument("--queries", type=int, default=500, help="Number of queries")
+    parser.add_argument("--top-k", type=int, default=10, help="Results per query")
+    parser.add_argument("--nprobe", type=int, default=16, help="IVF nprobe")
+    parser.add_argument("--ef-search", type=int, default=64, help="HNSW efSearch")
+    parser.add_argument("--shards", type=int, default=1, help="Index shards")
+    parser.add_argument("--search-threads", type=int, help="Shard search threads")
+    parser.add_argument("--omp-threads", type=int, help="Faiss OpenMP threads")
+    parser.add_argument(
+        "--index-factory",
+        action="append",
+        help="Faiss index factory string, may be repeated",
+    )
+    return parser.parse_args()
+
+
+def synthetic_corpus(size: int, dim: int, n_queries: int, seed: int = 0):
+    """Clustered vectors, so that ANN indexes have structure to exploit."""
+    rng = numpy.random.default_rng(seed)
+    centers = rng.normal(size=(max(size // 500, 1), dim)).astype(numpy.float32)
+    assignments = rng.integers(0, len(centers), size=size + n_queries)
+    vectors = centers[assignments] + 0.5 * rng.normal(size=(size + n_queries, dim)).astype(
+        numpy.float32
+    )
+    faiss.normalize_L2(vectors)
+    return vectors[:size], vectors[size:]
+
+
+def build_indexes(
+    retriever: LocalKnnRetriever, corpus: numpy.ndarray, documents_dir: Optional[str] = None
+):
+    """
+    Index a matrix of normalized vectors directly, skipping the JSONL loading.
+    Without documents_dir the retriever is only usable through search_vectors.
+    With it, each vector gets an {"id": position} document there, and its
+    full-precision copy is stored for rescoring.
+    """
+    retriever.create_indexes(corpus.shape[1])
+    retriever.add_vectors(corpus, numpy.arange(len(corpus)))
+    if documents_dir:
+        documents = LocalDocumentStore(documents_dir)
+        for i in range(len(corpus)):
+            documents.append({"id": i})
+        if retriever.rescore_factor:
+            documents.append_vectors(corpus)
+        documents.commit()
+        retriever.documents = documents
+
+
+def recall_at_k(ground_truth: numpy.ndarray, found: numpy.ndarray) -> float:
+    hits = sum(len(set(gt) & set(f)) for gt, f in zip(ground_truth, found))
+    return hits / ground_truth.size
+
+
+def benchmark(args):
+    corpus, queries = synthetic_corpus(args.size, args.dim, args.queries)
+    _, ground_truth = faiss.knn(queries, corpus, args.top_k, metric=faiss.METRIC_INNER_PRODUCT)
+
+    print(
+        f"{'index':<16}{'build s':>10}{'memory MB':>12}{'recall@' + str(args.top_k):>12}"
+        f"{'batch qps':>12}{'p50 ms':>10}{'p99 ms':>10}"
+    )
+    for index_factory in args.index_factory or DEFAULT_INDEX_FACTORIES:
+        exact = index_factory == "Flat"
+        retriever = LocalKnnRetriever(
+            nprobe=args.nprobe,
+            index_factory=index_factory,
+            exact_index=exact,
+            ef_search=args.ef_search,
+            shards=args.shards,
+            search_threads=args.search_threads,
+            omp_threads=args.omp_threads,
+        )
+
+        start = time.perf_counter()
+        build_indexes(retriever, corpus)
+        build_time = time.perf_counter() - start
+        index = retriever.index if exact else retriever.index_ann
+        memory_mb = sum(
+            faiss.serialize_index(shard).nbytes for shard in getattr(index, "shards", [index])
+        ) / 2**20
+
+        start = time.perf_counter()
+        _, found = retriever.search_vectors(queries, args.top_k, use_ann=not exact)
+        qps = len(queries) / (time.perf_counter() - start)
+
+        latencies = []
+        for query in queries:
+            start = time.perf_counter()
+            retriever.search_vectors(query[None, :], args.top_k, use_ann=not exact)
+            latencies.append((time.perf_counter() - start) * 1000)
+
+        print(
+            f"{index_factory:<16}{build_time:>10.2f}{memory_mb:>12.1f}"
+            f"{recall_at_k(ground_truth, found):>12.3f}{qps:>12.0f}"
+            f"{numpy.percentile(latencies, 50):>10.3f}{numpy.percentile(latencies, 99):>10.3f}"
+        )
+
+
+def main():
+    benchmark(parse_args())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+# Usage: python -m scripts.benchmark_local_knn_storage --size 100000 --dim 1536 --rescore-factor 4
+import argparse
+import tempfile
+import time
+
+import faiss
+
+from scripts.benchmark_local_knn import build_indexes, recall_at_k, synthetic_corpus
+from shraga_common.retrievers.local_knn import STORAGE_TYPES, LocalKnnRetriever
+
+
+def parse_args():
+    """Parse command line arguments."""
+    parser = argparse.ArgumentParser(
+        description="Compare memory and recall@k of LocalKnnRetriever vector storage types."
+    )
+    parser.add_argument("--size", type=int, default=100_000, help="Number of corpus vectors")
+    parser.add_argument("--dim", type=int, default=1536, help="Vector dimension")
+    parser.add_argument("--queries", type=int, default=500, help="Number of queries")
+    parser.add_argument("--top-k", type=int, default=10, help="Results per query")
+    parser.add_argument(
+        "--rescore-factor",
+        type=int,
+        default=4,
+        help="Candidates per result rescored with full precision",
+    )
+    return parser.parse_args()
+
+
+def benchmark(args):
+    corpus, queries = synthetic_corpus(args.size, args.dim, args.queries)
+    _, ground_truth = faiss.knn(queries, corpus, args.top_k, metric=faiss.METRIC_INNER_PRODUCT)
+
+    print(
+        f"{'storage':<10}{'rescore':>9}{'index MB':>10}{'recall@' + str(args.top_k):>12}"
+        f"{'batch qps':>12}"
+    )
+    for storage in STORAGE_TYPES:
+        for rescore_factor in (None, args.rescore_factor):
+            if storage == "float32" and rescore_factor:
+                continue
+            retriever = LocalKnnRetriever(
+                index_factory="Flat", storage=storage, rescore_factor=rescore_factor
+            )
+            with tempfile.TemporaryDirectory(prefix="shraga-knn-benchmark-") as tmp:
+                build_indexes(retriever, corpus, tmp)
+                memory_mb = faiss.serialize_index(retriever.index).nbytes / 2**20
+
+                start = time.perf_counter()
+                _, found = retriever.search_vectors(queries, args.top_k)
+                qps = len(queries) / (time.perf_counter() - start)
+                retriever.close()
+
+            print(
+                f"{storage:<10}{rescore_factor or '-':>9}{memory_mb:>10.1f}"
+                f"{recall_at_k(ground_truth, found):>12.3f}{qps:>12.0f}"
+            )
+    # full-precision vectors used for rescoring are memory-mapped from disk,
+    # they are not part of the index memory
+    print(f"float32 vectors on disk: {corpus.nbytes / 2**20:.1f} MB")
+
+
+def main():
+    benchmark(parse_args())
+
+
+if __name__ == "__main__":
+    main()
@@ -7,6 +7,8 @@ from fastapi import Request
 from shraga_common.models import FlowBase, FlowResponse
 
 from shraga_common import RequestCancelledException, LLMServiceUnavailableException
+from shraga_common.utils.deadline import deadline
+from ..config import get_config
 from ..models import FlowRunApiRequest
 
 logger = logging.getLogger(__name__)
@@ -42,7 +44,9 @@ async def execute_cancellable_flow(
 
     try:
         cancel_event = await cancel_manager.setup()
-        flow_task = asyncio.create_task(flow.execute(req_body))
+        # the flow and the searches it runs share the flows.timeout budget
+        with deadline(get_config("flows.timeout")):
+            flow_task = asyncio.create_task(flow.execute(req_body))
         cancel_task = asyncio.create_task(cancel_event.wait())
 
         try:
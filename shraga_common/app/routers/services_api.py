@@ -1,6 +1,5 @@
 from fastapi import APIRouter
 
-from shraga_common.embedders import BedrockEmbedder
 from shraga_common.retrievers import (ElasticsearchRetriever,
                                       OpenSearchRetriever)
 
@@ -14,11 +13,8 @@ router = APIRouter()
 async def list_services() -> dict:
     shraga_config = get_config()
     d = dict()
-    try:
-        embedder = BedrockEmbedder(shraga_config)
-        d["embedder"] = "bedrock"
-    except Exception:
-        pass
+    # report the configured provider, building it could load a local model
+    d["embedder"] = shraga_config.get("embedders.provider") or "bedrock"
 
     for retriever_name, r in shraga_config.retrievers().items():
         try:
@@ -1,4 +1,6 @@
+import asyncio
 import os
+from contextlib import asynccontextmanager
 from typing import List
 
 from fastapi import FastAPI, HTTPException, Request
@@ -10,6 +12,7 @@ from starlette.middleware.gzip import GZipMiddleware
 
 from shraga_common.logger import get_git_commit
 from shraga_common.models import FlowBase
+from shraga_common.retrievers import client_registry
 
 from ..config import get_config, load_config
 from ..middlewares import logging_middleware
@@ -28,7 +31,16 @@ def setup_app(config_path: str, flows: List[FlowBase]) -> FastAPI:
     load_api_app()
     load_oauth_app()
 
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        health_checks = asyncio.create_task(client_registry.run_health_checks())
+        yield
+        health_checks.cancel()
+        # search clients are created lazily and shared, close their pools on shutdown
+        await client_registry.aclose()
+
     app = FastAPI(
+        lifespan=lifespan,
         title="Shraga",
         description="Shraga AI",
         openapi_url="/openapi.json",
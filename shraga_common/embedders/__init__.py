@@ -1,9 +1,13 @@
 from .base_embedder import BaseEmbedder
 from .bedrock_embedder import BedrockEmbedder
+from .cached_embedder import CachedEmbedder
 from .cohere_embedder import CohereEmbedder
+from .embedding_scheduler import EmbeddingScheduler
+from .get_embedder import get_embedder
 
 # commented out due to slow loading!
 # from .google_embedder import GoogleEmbedder
+from .local_embedder import LocalEmbedder
 from .openai_embedder import OpenAIEmbedder
 from .types import EmbedderModelName, EmbedderModelProvider
 
@@ -14,4 +18,8 @@ __all__ = [
     "BedrockEmbedder",
     "OpenAIEmbedder",
     "CohereEmbedder",
+    "CachedEmbedder",
+    "EmbeddingScheduler",
+    "LocalEmbedder",
+    "get_embedder",
 ]
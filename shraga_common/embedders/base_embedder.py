@@ -1,32 +1,94 @@
-import asyncio
+import logging
 from abc import abstractmethod
-from typing import Any, Optional
+from typing import Any, Iterator, List, Optional, Sequence, Tuple
 
 from pydantic import BaseModel
 
+logger = logging.getLogger(__name__)
+
 
 class BaseEmbedderGenerateOptions(BaseModel):
     embed_model_name: Optional[str]
     task: Optional[str]
 
 
+def pack_batches(
+    texts: Sequence[str], max_size: int, max_chars: Optional[int] = None
+) -> Iterator[Tuple[int, int]]:
+    """
+    Split texts into consecutive (start, end) ranges of at most max_size texts
+    and, when max_chars is set, at most max_chars characters. A text longer than
+    max_chars gets a batch of its own.
+    """
+    start = 0
+    chars = 0
+    for i, text in enumerate(texts):
+        if i > start and (
+            i - start >= max_size or (max_chars and chars + len(text) > max_chars)
+        ):
+            yield start, i
+            start = i
+            chars = 0
+        chars += len(text)
+    if start < len(texts):
+        yield start, len(texts)
+
+
 class BaseEmbedder:
+    # Longest text sent to the provider, in characters. Longer texts are truncated.
+    MAX_INPUT_SIZE: Optional[int] = None
+    # Most texts, and characters, sent in one request by generate_vectors.
+    # Embedders that override embed_batch raise MAX_BATCH_SIZE above 1.
+    MAX_BATCH_SIZE: int = 1
+    MAX_BATCH_CHARS: Optional[int] = None
+    # Requests generate_vectors keeps in flight, and sends per second (unlimited
+    # if None), across all calls for the same provider and model. get_embedder
+    # reads them from embedders.<provider>. Throttled requests are retried, see
+    # EmbeddingScheduler.
+    MAX_CONCURRENCY: int = 8
+    REQUESTS_PER_SECOND: Optional[float] = None
+
     @abstractmethod
     async def generate_vector(
         self, text: str, extra_options: Optional[BaseEmbedderGenerateOptions] = None
     ) -> Any:
         pass
 
+    async def embed_batch(
+        self,
+        texts: List[str],
+        extra_options: Optional[BaseEmbedderGenerateOptions] = None,
+    ) -> List[Any]:
+        """Embed texts in a single provider request, returning vectors in input order."""
+        raise NotImplementedError
+
+    def get_batch_limits(
+        self, extra_options: Optional[BaseEmbedderGenerateOptions] = None
+    ) -> Tuple[int, Optional[int]]:
+        """The (max texts, max characters) of a request for these options."""
+        return self.MAX_BATCH_SIZE, self.MAX_BATCH_CHARS
+
+    def truncate(self, text: str) -> str:
+        if self.MAX_INPUT_SIZE and len(text) > self.MAX_INPUT_SIZE:
+            logger.warning(
+                "Text is too long (%d) characters). Truncating to %d characters.",
+                len(text),
+                self.MAX_INPUT_SIZE,
+            )
+            text = text[: self.MAX_INPUT_SIZE]
+        return text
+
     async def generate_vectors(
         self,
         texts: list[str],
         extra_options: Optional[BaseEmbedderGenerateOptions] = None,
     ) -> Any:
-        tasks = [
-            self.generate_vector(
-                q,
-                extra_options,
-            )
-            for q in texts
-        ]
-        return await asyncio.gather(*tasks)
+        # imported here, the scheduler module depends on this one
+        from .embedding_scheduler import EmbeddingScheduler
+
+        scheduler = EmbeddingScheduler(
+            self,
+            max_concurrency=self.MAX_CONCURRENCY,
+            requests_per_second=self.REQUESTS_PER_SECOND,
+        )
+        return await scheduler.embed(texts, extra_options)
@@ -1,9 +1,12 @@
+import asyncio
 import json
 import logging
-from typing import Any, Dict, Optional, Tuple, Union
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple, Union
 
 import boto3
 from boto3.exceptions import Boto3Error
+from botocore.config import Config
 
 from shraga_common import ShragaConfig, LLMServiceUnavailableException
 from .base_embedder import BaseEmbedder, BaseEmbedderGenerateOptions
@@ -18,6 +21,9 @@ class BedrockEmbedder(BaseEmbedder):
     # The cohere embed method supports input of up to 2048 *characters*
     # See experiments/nevo/max_chunk_size.ipynb for more details
     MAX_INPUT_SIZE = 2048
+    # Bedrock cohere models embed up to 96 texts per call, titan one
+    BATCH_MODELS = {"cohere-multilingual", "cohere"}
+    MAX_BATCH_SIZE = 96
 
     def __init__(
         self,
@@ -26,6 +32,7 @@ class BedrockEmbedder(BaseEmbedder):
         aws_secret_access_key: Optional[str] = None,
         profile_name: Optional[str] = None,
         region_name: str = "us-east-1",
+        max_workers: int = 10,
     ):
 
         if shraga_config:
@@ -45,6 +52,11 @@ class BedrockEmbedder(BaseEmbedder):
             aws_access_key_id=aws_access_key_id,
             aws_secret_access_key=aws_secret_access_key,
             region_name=region_name,
+            config=Config(max_pool_connections=max_workers),
+        )
+        # boto3 is blocking, so requests run on a bounded pool off the event loop
+        self.executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="bedrock-embedder"
         )
 
     def get_endpoint_name_and_body(
@@ -73,24 +85,24 @@ class BedrockEmbedder(BaseEmbedder):
         else:
             raise ValueError(f"Unsupported model type: {model_name}")
 
-    async def generate_vector(
-        self, text: str, extra_options: Optional[BaseEmbedderGenerateOptions] = None
-    ) -> Any:
+    def get_endpoint_name_and_batch_body(
+        self, model_name: str, texts: List[str], task="search_document"
+    ) -> Tuple[str, Dict[str, Union[str, Any]]]:
+        if model_name.lower() not in self.BATCH_MODELS:
+            raise ValueError(f"Model does not support batches: {model_name}")
+        model_id, body = self.get_endpoint_name_and_body(model_name, "", task)
+        return model_id, {**body, "texts": texts}
+
+    def get_batch_limits(
+        self, extra_options: Optional[BaseEmbedderGenerateOptions] = None
+    ) -> Tuple[int, Optional[int]]:
+        model_name = (extra_options or {}).get("embed_model_name", "cohere")
+        if model_name.lower() not in self.BATCH_MODELS:
+            return 1, None
+        return super().get_batch_limits(extra_options)
+
+    def invoke_embeddings(self, model_id: str, body: dict, count: int) -> List[Any]:
         try:
-            if not extra_options:
-                extra_options = {}
-
-            if len(text) > self.MAX_INPUT_SIZE:
-                logger.warning(
-                    "Text is too long (%d) characters). Truncating to %d characters.",
-                    len(text),
-                    self.MAX_INPUT_SIZE,
-                )
-                text = text[: self.MAX_INPUT_SIZE]
-
-            task = extra_options.get("task", "search_document")
-            model_name = extra_options.get("embed_model_name", "cohere")
-            model_id, body = self.get_endpoint_name_and_body(model_name, text, task)
             response = self.bedrock_client.invoke_model(
                 modelId=model_id,
                 body=json.dumps(body),
@@ -101,10 +113,9 @@ class BedrockEmbedder(BaseEmbedder):
             response_body = response["body"].read().decode("utf-8")
             embeddings = json.loads(response_body).get("embeddings")
             if isinstance(embeddings, list):
-                v = embeddings[0] if embeddings else None
-                if not v:
+                if len(embeddings) != count or not all(embeddings):
                     raise LLMServiceUnavailableException("Empty embedding")
-                return v
+                return embeddings
             else:
                 raise LLMServiceUnavailableException("Unexpected embedding format")
         except Boto3Error as e:
@@ -113,3 +124,34 @@ class BedrockEmbedder(BaseEmbedder):
             raise LLMServiceUnavailableException("Failed to decode embedding", e)
         except Exception as e:
             raise LLMServiceUnavailableException("Unexpected error", e)
+
+    async def run_in_executor(self, model_id: str, body: dict, count: int) -> List[Any]:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self.executor, self.invoke_embeddings, model_id, body, count
+        )
+
+    async def generate_vector(
+        self, text: str, extra_options: Optional[BaseEmbedderGenerateOptions] = None
+    ) -> Any:
+        if not extra_options:
+            extra_options = {}
+
+        text = self.truncate(text)
+        task = extra_options.get("task", "search_document")
+        model_name = extra_options.get("embed_model_name", "cohere")
+        model_id, body = self.get_endpoint_name_and_body(model_name, text, task)
+        return (await self.run_in_executor(model_id, body, 1))[0]
+
+    async def embed_batch(
+        self,
+        texts: List[str],
+        extra_options: Optional[BaseEmbedderGenerateOptions] = None,
+    ) -> List[Any]:
+        if not extra_options:
+            extra_options = {}
+
+        task = extra_options.get("task", "search_document")
+        model_name = extra_options.get("embed_model_name", "cohere")
+        model_id, body = self.get_endpoint_name_and_batch_body(model_name, texts, task)
+        return await self.run_in_executor(model_id, body, len(texts))
@@ -0,0 +1,269 @@
+import asyncio
+import hashlib
+import json
+import sqlite3
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy
+
+from shraga_common import ShragaConfig
+
+from .base_embedder import BaseEmbedder, BaseEmbedderGenerateOptions
+
+DIMENSION_OPTIONS = ("output_dimension", "dimensionality")
+
+
+class SQLiteEmbeddingStore:
+    """Persistent embedding store, keeping vectors as float16 blobs in a SQLite file."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._lock = Lock()
+        with self._lock, self._connection:
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings "
+                "(key TEXT PRIMARY KEY, shape TEXT NOT NULL, vector BLOB NOT NULL)"
+            )
+
+    def get_many(self, keys: List[str]) -> Dict[str, Any]:
+        found = {}
+        # stay below SQLite's limit on query parameters
+        for start in range(0, len(keys), 500):
+            chunk = keys[start : start + 500]
+            with self._lock:
+                rows = self._connection.execute(
+                    "SELECT key, shape, vector FROM embeddings WHERE key IN (%s)"
+                    % ",".join("?" * len(chunk)),
+                    chunk,
+                ).fetchall()
+            for key, shape, vector in rows:
+                found[key] = (
+                    numpy.frombuffer(vector, dtype=numpy.float16)
+                    .reshape(json.loads(shape))
+                    .astype(numpy.float32)
+                    .tolist()
+                )
+        return found
+
+    def set_many(self, items: Dict[str, Any]):
+        rows = []
+        for key, vector in items.items():
+            array = numpy.asarray(vector, dtype=numpy.float16)
+            rows.append((key, json.dumps(array.shape), array.tobytes()))
+        with self._lock, self._connection:
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, shape, vector) VALUES (?, ?, ?)",
+                rows,
+            )
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._connection.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    def close(self):
+        self._connection.close()
+
+
+class CachedEmbedder(BaseEmbedder):
+    """
+    Wraps any embedder with a cache of its vectors, keyed by
+    (provider, model, task, dimension, sha256(text)).
+
+    Lookups go to an in-memory LRU first, then to an optional SQLite file, so
+    re-embedding unchanged documents, retried questions and evaluation runs
+    costs no provider calls. SQLite is accessed on a dedicated thread, off the
+    event loop. Vectors read back from SQLite are rounded to float16.
+    The batching and rate limits, get_batch_limits and truncate are the wrapped
+    embedder's, and embed_batch goes through the cache too, so schedulers driving
+    the wrapper batch like the wrapped embedder. Attributes BaseEmbedder does not
+    define are forwarded to the wrapped embedder.
+
+    get_embedder wraps the embedders it builds as configured under embedders.cache.
+    """
+
+    def __init__(
+        self,
+        embedder: BaseEmbedder,
+        max_size: int = 10000,
+        path: Optional[str] = None,
+        provider: Optional[str] = None,
+    ):
+        self.embedder = embedder
+        self.provider = provider or type(embedder).__name__
+        self.max_size = max_size
+        self.store = SQLiteEmbeddingStore(path) if path else None
+        self.store_executor = (
+            ThreadPoolExecutor(max_workers=1, thread_name_prefix="embedding-cache")
+            if path
+            else None
+        )
+        self._entries: OrderedDict[str, Any] = OrderedDict()
+        self._lock = Lock()
+        self.memory_hits = 0
+        self.store_hits = 0
+        self.misses = 0
+
+    @classmethod
+    def from_config(
+        cls, shraga_config: Optional[ShragaConfig], embedder: BaseEmbedder
+    ) -> BaseEmbedder:
+        """
+        Wrap an embedder as configured under embedders.cache (max_size, path).
+        Returns the embedder unchanged if no cache is configured.
+        """
+        config = shraga_config.get("embedders.cache") if shraga_config else None
+        if not config:
+            return embedder
+        return cls(
+            embedder, max_size=config.get("max_size", 10000), path=config.get("path")
+        )
+
+    def __getattr__(self, name: str) -> Any:
+        if name == "embedder":
+            raise AttributeError(name)
+        return getattr(self.embedder, name)
+
+    # BaseEmbedder defines these, so __getattr__ never sees them
+    @property
+    def MAX_INPUT_SIZE(self) -> Optional[int]:
+        return self.embedder.MAX_INPUT_SIZE
+
+    @property
+    def MAX_BATCH_SIZE(self) -> int:
+        return self.embedder.MAX_BATCH_SIZE
+
+    @property
+    def MAX_BATCH_CHARS(self) -> Optional[int]:
+        return self.embedder.MAX_BATCH_CHARS
+
+    @property
+    def MAX_CONCURRENCY(self) -> int:
+        return self.embedder.MAX_CONCURRENCY
+
+    @property
+    def REQUESTS_PER_SECOND(self) -> Optional[float]:
+        return self.embedder.REQUESTS_PER_SECOND
+
+    def get_batch_limits(
+        self, extra_options: Optional[BaseEmbedderGenerateOptions] = None
+    ) -> Tuple[int, Optional[int]]:
+        return self.embedder.get_batch_limits(extra_options)
+
+    def truncate(self, text: str) -> str:
+        return self.embedder.truncate(text)
+
+    def make_key(
+        self, text: str, extra_options: Optional[BaseEmbedderGenerateOptions] = None
+    ) -> str:
+        options = extra_options or {}
+        dimension = next(
+            (options.get(name) for name in DIMENSION_OPTIONS if options.get(name)), None
+        )
+        return json.dumps(
+            [
+                self.provider,
+                options.get("embed_model_name"),
+                options.get("task"),
+                dimension,
+                hashlib.sha256(text.encode("utf-8")).hexdigest(),
+            ],
+            separators=(",", ":"),
+        )
+
+    async def run_store(self, method, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.store_executor, method, *args)
+
+    async def get_many(self, keys: List[str]) -> Dict[str, Any]:
+        found = {}
+        with self._lock:
+            for key in keys:
+                if key in self._entries:
+                    self._entries.move_to_end(key)
+                    found[key] = self._entries[key]
+        self.memory_hits += len(found)
+        missing = [key for key in keys if key not in found]
+        if self.store is not None and missing:
+            stored = await self.run_store(self.store.get_many, missing)
+            self.store_hits += len(stored)
+            self._remember(stored)
+            found.update(stored)
+        return found
+
+    async def set_many(self, items: Dict[str, Any]):
+        self._remember(items)
+        if self.store is not None:
+            await self.run_store(self.store.set_many, items)
+
+    def _remember(self, items: Dict[str, Any]):
+        with self._lock:
+            for key, vector in items.items():
+                self._entries[key] = vector
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    async def generate_vector(
+        self, text: str, extra_options: Optional[BaseEmbedderGenerateOptions] = None
+    ) -> Any:
+        key = self.make_key(text, extra_options)
+        found = await self.get_many([key])
+        if key in found:
+            return found[key]
+        self.misses += 1
+        vector = await self.embedder.generate_vector(text, extra_options)
+        await self.set_many({key: vector})
+        return vector
+
+    async def embed_batch(
+        self,
+        texts: List[str],
+        extra_options: Optional[BaseEmbedderGenerateOptions] = None,
+    ) -> List[Any]:
+        return await self.embed_missing(texts, extra_options, self.embedder.embed_batch)
+
+    async def generate_vectors(
+        self,
+        texts: list[str],
+        extra_options: Optional[BaseEmbedderGenerateOptions] = None,
+    ) -> Any:
+        return await self.embed_missing(
+            texts, extra_options, self.embedder.generate_vectors
+        )
+
+    async def embed_missing(self, texts, extra_options, embed) -> List[Any]:
+        """Serve texts from the cache and embed the rest with one call to embed."""
+        keys = [self.make_key(text, extra_options) for text in texts]
+        found = await self.get_many(list(dict.fromkeys(keys)))
+        # embed each missing text once, however often it repeats
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in found:
+                missing.setdefault(key, text)
+        if missing:
+            self.misses += len(missing)
+            vectors = await embed(list(missing.values()), extra_options)
+            new = dict(zip(missing.keys(), vectors))
+            await self.set_many(new)
+            found.update(new)
+        return [found[key] for key in keys]
+
+    def stats(self) -> dict:
+        hits = self.memory_hits + self.store_hits
+        total = hits + self.misses
+        return {
+            "hits": hits,
+            "memory_hits": self.memory_hits,
+            "store_hits": self.store_hits,
+            "misses": self.misses,
+            "hit_rate": hits / total if total else 0.0,
+        }
+
+    def close(self):
+        if self.store is not None:
+            self.store_executor.shutdown(wait=True)
+            self.store.close()
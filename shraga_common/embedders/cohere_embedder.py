@@ -1,6 +1,6 @@
 import json
 import logging
-from typing import Any, Optional
+from typing import Any, List, Optional
 
 from shraga_common import ShragaConfig
 
@@ -15,6 +15,8 @@ logger = logging.getLogger(__name__)
 
 class CohereEmbedder(BaseEmbedder):
     MAX_INPUT_SIZE = 128000
+    # https://docs.cohere.com/v2/reference/embed accepts up to 96 texts per call
+    MAX_BATCH_SIZE = 96
 
     def __init__(
         self,
@@ -29,28 +31,27 @@ class CohereEmbedder(BaseEmbedder):
         if cohere_access_key == "":
             cohere_access_key = None
 
-        self.cohere_client = cohere.ClientV2(cohere_access_key)
+        self.cohere_client = cohere.AsyncClientV2(cohere_access_key)
 
     async def generate_vector(
         self, text: str, extra_options: Optional[BaseEmbedderGenerateOptions] = None
     ) -> Any:
+        return (await self.embed_batch([self.truncate(text)], extra_options))[0]
+
+    async def embed_batch(
+        self,
+        texts: List[str],
+        extra_options: Optional[BaseEmbedderGenerateOptions] = None,
+    ) -> List[Any]:
         try:
             if not extra_options:
                 extra_options = {}
 
-            if len(text) > self.MAX_INPUT_SIZE:
-                logger.warning(
-                    "Text is too long (%d) characters). Truncating to %d characters.",
-                    len(text),
-                    self.MAX_INPUT_SIZE,
-                )
-                text = text[: self.MAX_INPUT_SIZE]
-
             task = extra_options.get("task", "search_document")
             model_name = extra_options.get("embed_model_name", "embed-v4.0")
             output_dimension = extra_options.get("output_dimension", 1536)
-            response = self.cohere_client.embed(
-                texts=[text],
+            response = await self.cohere_client.embed(
+                texts=texts,
                 model=model_name,
                 input_type=task,
                 output_dimension=output_dimension,
@@ -59,10 +60,9 @@ class CohereEmbedder(BaseEmbedder):
 
             embeddings = response.embeddings.float_
             if isinstance(embeddings, list):
-                v = embeddings[0] if embeddings else None
-                if not v:
+                if len(embeddings) != len(texts) or not all(embeddings):
                     raise LLMServiceUnavailableException("Empty embedding")
-                return v
+                return embeddings
             else:
                 raise LLMServiceUnavailableException("Unexpected embedding format")
         except json.JSONDecodeError as e:
@@ -0,0 +1,225 @@
+import asyncio
+import logging
+import random
+import time
+from threading import Lock
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+from weakref import WeakKeyDictionary
+
+from .base_embedder import BaseEmbedder, BaseEmbedderGenerateOptions, pack_batches
+
+logger = logging.getLogger(__name__)
+
+THROTTLING_ERROR_CODES = {
+    "ThrottlingException",
+    "TooManyRequestsException",
+    "TooManyRequests",
+    "RateLimitError",
+    "TooManyRequestsError",
+}
+
+
+def is_throttling_error(error: BaseException) -> bool:
+    """
+    Whether an error, or one it wraps, is a provider rate limit: an HTTP 429,
+    a Bedrock ThrottlingException or an SDK rate limit error.
+    """
+    seen = set()
+    pending = [error]
+    while pending:
+        e = pending.pop()
+        if not isinstance(e, BaseException) or id(e) in seen:
+            continue
+        seen.add(id(e))
+        if getattr(e, "status_code", None) == 429:
+            return True
+        # botocore ClientError
+        response = getattr(e, "response", None)
+        if isinstance(response, dict):
+            if response.get("Error", {}).get("Code") in THROTTLING_ERROR_CODES:
+                return True
+        if type(e).__name__ in THROTTLING_ERROR_CODES:
+            return True
+        # wrappers such as LLMServiceUnavailableException keep only the message
+        if any(code in str(e) for code in THROTTLING_ERROR_CODES):
+            return True
+        pending.extend([e.__cause__, e.__context__, *e.args])
+    return False
+
+
+class TokenBucket:
+    """
+    Rate limiter releasing `rate` requests per second, with bursts of up to
+    `capacity`. The rate halves on throttling and recovers additively on
+    success, down to min_rate and up to the configured rate.
+    """
+
+    def __init__(
+        self, rate: float, capacity: Optional[float] = None, min_rate: Optional[float] = None
+    ):
+        self.max_rate = rate
+        self.rate = rate
+        self.min_rate = min_rate or rate / 32
+        self.capacity = capacity or max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    async def acquire(self):
+        # reserve a token, possibly going into debt, then wait the debt out
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        self.tokens -= 1
+        if self.tokens < 0:
+            await asyncio.sleep(-self.tokens / self.rate)
+
+    def throttle(self):
+        self.rate = max(self.min_rate, self.rate / 2)
+        self.tokens = min(self.tokens, 0)
+
+    def recover(self):
+        self.rate = min(self.max_rate, self.rate + self.max_rate / 20)
+
+
+class EmbeddingScheduler:
+    """
+    Runs the requests of an embedding fan-out with at most max_concurrency in
+    flight and, when requests_per_second is set, through a token bucket. Both
+    limits are shared by every scheduler of the same provider and model, so
+    concurrent fan-outs stay within them together. Throttled requests are
+    retried with exponential backoff, and the bucket slows down until requests
+    succeed again, so long runs settle at the provider's limit.
+    """
+
+    _buckets: Dict[tuple, TokenBucket] = {}
+    _buckets_lock = Lock()
+    # semaphores are bound to the event loop they are used on
+    _semaphores: WeakKeyDictionary = WeakKeyDictionary()
+
+    def __init__(
+        self,
+        embedder: BaseEmbedder,
+        max_concurrency: int = 8,
+        requests_per_second: Optional[float] = None,
+        max_retries: int = 5,
+        initial_backoff: float = 1.0,
+        max_backoff: float = 30.0,
+        provider: Optional[str] = None,
+    ):
+        self.embedder = embedder
+        self.max_concurrency = max_concurrency
+        self.requests_per_second = requests_per_second
+        self.max_retries = max_retries
+        self.initial_backoff = initial_backoff
+        self.max_backoff = max_backoff
+        self.provider = provider or type(embedder).__name__
+
+    def get_bucket(
+        self, extra_options: Optional[BaseEmbedderGenerateOptions] = None
+    ) -> Optional[TokenBucket]:
+        if not self.requests_per_second:
+            return None
+        model_name = (extra_options or {}).get("embed_model_name")
+        key = (self.provider, model_name, self.requests_per_second)
+        with self._buckets_lock:
+            if key not in self._buckets:
+                self._buckets[key] = TokenBucket(self.requests_per_second)
+            return self._buckets[key]
+
+    def get_semaphore(
+        self, extra_options: Optional[BaseEmbedderGenerateOptions] = None
+    ) -> asyncio.Semaphore:
+        model_name = (extra_options or {}).get("embed_model_name")
+        key = (self.provider, model_name, self.max_concurrency)
+        with self._buckets_lock:
+            semaphores = self._semaphores.setdefault(asyncio.get_running_loop(), {})
+            if key not in semaphores:
+                semaphores[key] = asyncio.Semaphore(self.max_concurrency)
+            return semaphores[key]
+
+    async def request(
+        self,
+        texts: List[str],
+        extra_options: Optional[BaseEmbedderGenerateOptions],
+        batched: bool,
+        semaphore: asyncio.Semaphore,
+        bucket: Optional[TokenBucket],
+    ) -> List[Any]:
+        """Send one request, retrying it while the provider is throttling."""
+        async with semaphore:
+            for attempt in range(self.max_retries + 1):
+                if bucket:
+                    await bucket.acquire()
+                try:
+                    if batched:
+                        vectors = await self.embedder.embed_batch(texts, extra_options)
+                    else:
+                        vectors = [
+                            await self.embedder.generate_vector(texts[0], extra_options)
+                        ]
+                except Exception as e:
+                    if attempt == self.max_retries or not is_throttling_error(e):
+                        raise
+                    if bucket:
+                        bucket.throttle()
+                    delay = min(self.max_backoff, self.initial_backoff * 2**attempt)
+                    delay *= random.uniform(0.5, 1.0)
+                    logger.warning(
+                        "%s throttled, retrying in %.1fs (attempt %d)",
+                        self.provider,
+                        delay,
+                        attempt + 1,
+                    )
+                    await asyncio.sleep(delay)
+                    continue
+                if bucket:
+                    bucket.recover()
+                return vectors
+
+    async def stream(
+        self,
+        texts: List[str],
+        extra_options: Optional[BaseEmbedderGenerateOptions] = None,
+    ) -> AsyncIterator[Tuple[int, Any]]:
+        """
+        Embed texts, yielding (position, vector) pairs as their requests complete.
+        Remaining requests are cancelled if the iteration stops early.
+        """
+        max_size, max_chars = self.embedder.get_batch_limits(extra_options)
+        batched = max_size > 1
+        if batched:
+            texts = [self.embedder.truncate(text) for text in texts]
+        semaphore = self.get_semaphore(extra_options)
+        bucket = self.get_bucket(extra_options)
+
+        async def run(start: int, end: int) -> Tuple[int, List[Any]]:
+            vectors = await self.request(
+                texts[start:end], extra_options, batched, semaphore, bucket
+            )
+            return start, vectors
+
+        if batched:
+            ranges = pack_batches(texts, max_size, max_chars)
+        else:
+            ranges = ((i, i + 1) for i in range(len(texts)))
+        tasks = [asyncio.ensure_future(run(start, end)) for start, end in ranges]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                start, vectors = await next_done
+                for offset, vector in enumerate(vectors):
+                    yield start + offset, vector
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def embed(
+        self,
+        texts: List[str],
+        extra_options: Optional[BaseEmbedderGenerateOptions] = None,
+    ) -> List[Any]:
+        """Embed texts, returning their vectors in input order."""
+        vectors = [None] * len(texts)
+        async for i, vector in self.stream(texts, extra_options):
+            vectors[i] = vector
+        return vectors
@@ -0,0 +1,62 @@
+from threading import Lock
+from typing import Dict, Optional
+
+from shraga_common import ShragaConfig
+
+from .base_embedder import BaseEmbedder
+from .bedrock_embedder import BedrockEmbedder
+from .cached_embedder import CachedEmbedder
+from .cohere_embedder import CohereEmbedder
+from .local_embedder import LocalEmbedder
+from .openai_embedder import OpenAIEmbedder
+from .types import EmbedderModelProvider
+
+EMBEDDERS = {
+    "bedrock": BedrockEmbedder,
+    "cohere": CohereEmbedder,
+    "local": LocalEmbedder,
+    "openai": OpenAIEmbedder,
+}
+
+_embedders: Dict[tuple, BaseEmbedder] = {}
+_embedders_lock = Lock()
+
+
+def get_embedder(
+    shraga_config: ShragaConfig, provider: Optional[EmbedderModelProvider] = None
+) -> BaseEmbedder:
+    """
+    Get the embedder of a provider, embedders.provider in the config by default,
+    wrapped in a CachedEmbedder when embedders.cache is configured. The
+    provider's max_concurrency and requests_per_second are read from
+    embedders.<provider>.
+
+    Embedders are built once per config and provider and shared afterwards, so
+    their clients, caches and thread pools are not rebuilt on every request.
+    """
+    provider = provider or shraga_config.get("embedders.provider") or "bedrock"
+    key = (id(shraga_config), provider)
+    with _embedders_lock:
+        if key not in _embedders:
+            _embedders[key] = create_embedder(shraga_config, provider)
+        return _embedders[key]
+
+
+def create_embedder(shraga_config: ShragaConfig, provider: str) -> BaseEmbedder:
+    if provider == "google":
+        # imported here, vertexai is slow to load
+        from .google_embedder import GoogleEmbedder
+
+        embedder_class = GoogleEmbedder
+    elif provider in EMBEDDERS:
+        embedder_class = EMBEDDERS[provider]
+    else:
+        raise ValueError(f"Unsupported embedder provider: {provider}")
+    embedder = embedder_class(shraga_config)
+    # request limits of the provider, shared by all of its generate_vectors calls
+    limits = shraga_config.get(f"embedders.{provider}") or {}
+    if limits.get("max_concurrency"):
+        embedder.MAX_CONCURRENCY = limits["max_concurrency"]
+    if limits.get("requests_per_second"):
+        embedder.REQUESTS_PER_SECOND = limits["requests_per_second"]
+    return CachedEmbedder.from_config(shraga_config, embedder)
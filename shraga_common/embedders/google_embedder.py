@@ -1,5 +1,5 @@
 import logging
-from typing import Any, Optional
+from typing import Any, List, Optional, Tuple
 
 import vertexai
 from vertexai.language_models import TextEmbeddingInput, TextEmbeddingModel
@@ -20,6 +20,10 @@ TASK_TYPE = {"document": "RETRIEVAL_DOCUMENT", "query": "RETRIEVAL_QUERY"}
 
 
 class GoogleEmbedder(BaseEmbedder):
+    # Vertex AI embeds up to 250 inputs and 20k tokens per request
+    MAX_BATCH_SIZE = 250
+    MAX_BATCH_CHARS = 20_000
+
     def __init__(
         self, shraga_config: ShragaConfig, google_ai_api_key: Optional[str] = None
     ):
@@ -30,14 +34,13 @@ class GoogleEmbedder(BaseEmbedder):
 
         vertexai.init(project=project_id, location=region)
 
-    async def generate_vector(
-        self, text: str, extra_options: Optional[BaseEmbedderGenerateOptions] = None
-    ) -> Any:
+    def get_model_and_task(
+        self, extra_options: Optional[BaseEmbedderGenerateOptions] = None
+    ) -> Tuple[str, str]:
         if not extra_options:
             extra_options = {}
         model_name = extra_options.get("embed_model_name", "text-embedding-004")
         task = extra_options.get("task", "document")
-        dimensionality = extra_options.get("dimensionality", 768)
 
         if model_name not in GOOGLE_AI_EMBEDDING_MODEL_IDS:
             raise ValueError(
@@ -47,14 +50,28 @@ class GoogleEmbedder(BaseEmbedder):
             raise ValueError(
                 f"Invalid task type. Available model IDs are: {', '.join(TASK_TYPE.keys())}"
             )
+        return model_name, task
+
+    async def generate_vector(
+        self, text: str, extra_options: Optional[BaseEmbedderGenerateOptions] = None
+    ) -> Any:
+        return (await self.embed_batch([text], extra_options))[0]
+
+    async def embed_batch(
+        self,
+        texts: List[str],
+        extra_options: Optional[BaseEmbedderGenerateOptions] = None,
+    ) -> List[Any]:
+        model_name, task = self.get_model_and_task(extra_options)
+        dimensionality = (extra_options or {}).get("dimensionality", 768)
 
         try:
             model = TextEmbeddingModel.from_pretrained(model_name)
-            inputs = [TextEmbeddingInput(text, TASK_TYPE[task])]
+            inputs = [TextEmbeddingInput(text, TASK_TYPE[task]) for text in texts]
             kwargs = (
                 dict(output_dimensionality=dimensionality) if dimensionality else {}
             )
-            embeddings = model.get_embeddings(inputs, **kwargs)
+            embeddings = await model.get_embeddings_async(inputs, **kwargs)
             return [embedding.values for embedding in embeddings]
 
         except Exception as e:
@@ -0,0 +1,144 @@
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Literal, Optional, Tuple
+
+from shraga_common import ShragaConfig
+
+from .base_embedder import BaseEmbedder, BaseEmbedderGenerateOptions
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+DEFAULT_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+
+
+class LocalEmbedder(BaseEmbedder):
+    """
+    Embeds on the local CPU with a sentence-transformers model, either on
+    PyTorch or exported to ONNX Runtime (backend="onnx"), with no network calls.
+
+    Concurrent generate_vector calls arriving within max_wait seconds of each
+    other are encoded together in one forward pass. Encoding runs on a thread
+    pool, so the event loop is never blocked.
+
+    Configured under embedders.local: model, backend, device, max_batch_size,
+    max_wait and max_workers, unless passed explicitly. Needs the "local" extra
+    (sentence-transformers, and onnxruntime for the onnx backend).
+    """
+
+    # batches already share the model's intra-op threads, run one at a time
+    MAX_CONCURRENCY = 1
+
+    def __init__(
+        self,
+        shraga_config: Optional[ShragaConfig] = None,
+        model_name_or_path: Optional[str] = None,
+        backend: Optional[Literal["torch", "onnx"]] = None,
+        device: Optional[str] = None,
+        max_batch_size: Optional[int] = None,
+        max_wait: Optional[float] = None,
+        max_workers: Optional[int] = None,
+        normalize: bool = True,
+        model: Optional[Any] = None,
+    ):
+        local_configs: Dict = (
+            (shraga_config.get("embedders.local") or {}) if shraga_config else {}
+        )
+        # explicit arguments win over the config, which wins over the defaults
+        model_name_or_path = (
+            model_name_or_path or local_configs.get("model") or DEFAULT_MODEL
+        )
+        backend = backend or local_configs.get("backend") or "torch"
+        device = device or local_configs.get("device") or "cpu"
+        self.max_batch_size = max_batch_size or local_configs.get("max_batch_size") or 64
+        self.max_wait = (
+            max_wait if max_wait is not None else local_configs.get("max_wait", 0.005)
+        )
+        max_workers = max_workers or local_configs.get("max_workers") or 1
+        self.normalize = normalize
+        self.model_name = model_name_or_path
+        self.model = model or self.load_model(model_name_or_path, backend, device)
+        self.executor = ThreadPoolExecutor(
+            max_workers=max_workers,
+            thread_name_prefix="local-embedder",
+        )
+        self._pending: List[Tuple[str, Optional[str], asyncio.Future]] = []
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        self._batches = set()
+
+    @staticmethod
+    def load_model(model_name_or_path: str, backend: str, device: str) -> Any:
+        # sentence-transformers pulls in torch, so it is only imported when used
+        from sentence_transformers import SentenceTransformer
+
+        logger.info("Loading %s (%s on %s)", model_name_or_path, backend, device)
+        return SentenceTransformer(model_name_or_path, device=device, backend=backend)
+
+    def get_batch_limits(
+        self, extra_options: Optional[BaseEmbedderGenerateOptions] = None
+    ) -> Tuple[int, Optional[int]]:
+        return self.max_batch_size, None
+
+    def encode(self, texts: List[str], task: Optional[str] = None) -> List[Any]:
+        kwargs = {}
+        # models with prompts (e.g. "query" / "document") prefix the text by task
+        if task and task in (getattr(self.model, "prompts", None) or {}):
+            kwargs["prompt_name"] = task
+        vectors = self.model.encode(
+            texts,
+            batch_size=self.max_batch_size,
+            normalize_embeddings=self.normalize,
+            convert_to_numpy=True,
+            **kwargs,
+        )
+        return vectors.tolist()
+
+    async def embed_batch(
+        self,
+        texts: List[str],
+        extra_options: Optional[BaseEmbedderGenerateOptions] = None,
+    ) -> List[Any]:
+        task = (extra_options or {}).get("task")
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, self.encode, texts, task)
+
+    async def generate_vector(
+        self, text: str, extra_options: Optional[BaseEmbedderGenerateOptions] = None
+    ) -> Any:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        task = (extra_options or {}).get("task")
+        self._pending.append((self.truncate(text), task, future))
+        if len(self._pending) >= self.max_batch_size:
+            self.flush()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(self.max_wait, self.flush)
+        return await future
+
+    def flush(self):
+        """Encode the pending generate_vector calls, one batch per task."""
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        pending, self._pending = self._pending, []
+        by_task: Dict[Optional[str], list] = {}
+        for text, task, future in pending:
+            by_task.setdefault(task, []).append((text, future))
+        for task, items in by_task.items():
+            batch = asyncio.ensure_future(self.encode_pending(items, task))
+            # keep a reference until the batch is done
+            self._batches.add(batch)
+            batch.add_done_callback(self._batches.discard)
+
+    async def encode_pending(self, items: List[Tuple[str, asyncio.Future]], task):
+        try:
+            vectors = await self.embed_batch([text for text, _ in items], {"task": task})
+        except Exception as e:
+            for _, future in items:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for (_, future), vector in zip(items, vectors):
+            if not future.done():
+                future.set_result(vector)
@@ -4,7 +4,7 @@ import os
 import uuid
 from typing import Any, List, Optional
 
-from openai import OpenAI, OpenAIError
+from openai import AsyncOpenAI, OpenAI, OpenAIError
 
 from shraga_common import ShragaConfig
 
@@ -17,33 +17,54 @@ OPENAI_EMBEDDING_MODEL_IDS = ["text-embedding-3-small", "text-embedding-3-large"
 
 
 class OpenAIEmbedder(BaseEmbedder):
+    # The embeddings endpoint takes up to 2048 inputs, 8191 tokens per input and
+    # 300k tokens per request. Limits are counted in characters, and a character
+    # is at most 4 tokens (one per UTF-8 byte), so they hold for any text.
+    MAX_INPUT_SIZE = 8191 // 4
+    MAX_BATCH_SIZE = 2048
+    MAX_BATCH_CHARS = 300_000 // 4
+
     def __init__(
         self,
         shraga_config: Optional[ShragaConfig] = None,
         openai_api_key: Optional[str] = None,
     ):
         openai_api_key = openai_api_key or shraga_config.get("services.openai.api_key")
+        # the sync client serves the batch jobs API
         self.client = OpenAI(api_key=openai_api_key)
+        self.async_client = AsyncOpenAI(api_key=openai_api_key)
+
+    def get_model_name(
+        self, extra_options: Optional[BaseEmbedderGenerateOptions] = None
+    ) -> str:
+        model_name = (extra_options or {}).get(
+            "embed_model_name", "text-embedding-3-small"
+        )
+        if model_name not in OPENAI_EMBEDDING_MODEL_IDS:
+            raise ValueError(
+                f"Invalid model ID. Available model IDs are: {', '.join(OPENAI_EMBEDDING_MODEL_IDS)}"
+            )
+        return model_name
 
     async def generate_vector(
         self, text: str, extra_options: Optional[BaseEmbedderGenerateOptions] = None
     ) -> Any:
-        if not extra_options:
-            extra_options = {}
-
-        model_name = extra_options.get("embed_model_name", "text-embedding-3-small")
+        return (await self.embed_batch([text], extra_options))[0]
 
-        if model_name not in OPENAI_EMBEDDING_MODEL_IDS:
-            raise ValueError(
-                f"Invalid model ID. Available model IDs are: {', '.join(OPENAI_EMBEDDING_MODEL_IDS)}"
-            )
+    async def embed_batch(
+        self,
+        texts: List[str],
+        extra_options: Optional[BaseEmbedderGenerateOptions] = None,
+    ) -> List[Any]:
+        model_name = self.get_model_name(extra_options)
 
         try:
-            return (
-                self.client.embeddings.create(input=[text], model=model_name)
-                .data[0]
-                .embedding
+            response = await self.async_client.embeddings.create(
+                input=texts, model=model_name
             )
+            return [
+                item.embedding for item in sorted(response.data, key=lambda d: d.index)
+            ]
         except OpenAIError as e:
             raise RuntimeError(f"OpenAI API returned an error: {e}")
         except Exception as e:
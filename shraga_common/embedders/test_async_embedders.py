@@ -0,0 +1,69 @@
+import asyncio
+import unittest
+from unittest.mock import MagicMock
+
+from .cohere_embedder import CohereEmbedder
+from .openai_embedder import OpenAIEmbedder
+
+
+class InFlight:
+    """Async side effect that records how many calls overlap."""
+
+    def __init__(self, response):
+        self.response = response
+        self.current = 0
+        self.max = 0
+
+    async def __call__(self, **kwargs):
+        self.current += 1
+        self.max = max(self.max, self.current)
+        await asyncio.sleep(0.01)
+        self.current -= 1
+        return self.response(**kwargs)
+
+
+class TestAsyncEmbedders(unittest.IsolatedAsyncioTestCase):
+
+    async def test_cohere_calls_overlap(self):
+        embedder = CohereEmbedder(cohere_access_key="test")
+
+        def response(texts, **kwargs):
+            result = MagicMock()
+            result.embeddings.float_ = [[float(text)] for text in texts]
+            return result
+
+        calls = InFlight(response)
+        embedder.cohere_client = MagicMock()
+        embedder.cohere_client.embed = MagicMock(side_effect=calls)
+        vectors = await asyncio.gather(
+            *[embedder.generate_vector(str(i)) for i in range(5)]
+        )
+        self.assertEqual(vectors, [[float(i)] for i in range(5)])
+        self.assertEqual(calls.max, 5)
+
+    async def test_openai_calls_overlap(self):
+        embedder = OpenAIEmbedder(openai_api_key="test")
+
+        def response(input, **kwargs):
+            result = MagicMock()
+            # results may arrive in any order, they are matched by index
+            result.data = [
+                MagicMock(index=i, embedding=[float(text)])
+                for i, text in reversed(list(enumerate(input)))
+            ]
+            return result
+
+        calls = InFlight(response)
+        embedder.async_client = MagicMock()
+        embedder.async_client.embeddings.create = MagicMock(side_effect=calls)
+        vectors = await asyncio.gather(
+            *[embedder.generate_vector(str(i)) for i in range(5)],
+            embedder.generate_vectors(["7", "8"]),
+        )
+        self.assertEqual(vectors[:5], [[float(i)] for i in range(5)])
+        self.assertEqual(vectors[5], [[7.0], [8.0]])
+        self.assertEqual(calls.max, 6)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,20 @@
+import unittest
+
+from .base_embedder import pack_batches
+
+
+class TestPackBatches(unittest.TestCase):
+
+    def test_max_size(self):
+        self.assertEqual(list(pack_batches(["a"] * 5, 2)), [(0, 2), (2, 4), (4, 5)])
+        self.assertEqual(list(pack_batches([], 2)), [])
+
+    def test_max_chars(self):
+        texts = ["aaa", "bb", "c", "dddddd", "e"]
+        self.assertEqual(
+            list(pack_batches(texts, 10, max_chars=5)), [(0, 2), (2, 3), (3, 4), (4, 5)]
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,4 +1,7 @@
+import asyncio
 import json
+import threading
+import time
 import unittest
 from unittest.mock import MagicMock
 
@@ -43,3 +46,56 @@ class TestBedrockEmbedder(unittest.IsolatedAsyncioTestCase):
         self.embedder.bedrock_client.invoke_model.assert_called_once()
         invoke_text = self._get_invoke_texts()[0]
         self.assertEqual(len(invoke_text), 2048)
+
+    async def test_embed_batches(self):
+        def invoke_model(body, **kwargs):
+            texts = json.loads(body)["texts"]
+            stream_mock = MagicMock()
+            stream_mock.read.return_value = json.dumps(
+                {"embeddings": [[float(text)] for text in texts]}
+            ).encode("utf-8")
+            return {"body": stream_mock}
+
+        self.embedder.bedrock_client.invoke_model = MagicMock(side_effect=invoke_model)
+        texts = [str(i) for i in range(200)]
+        vectors = await self.embedder.generate_vectors(texts)
+        self.assertEqual(vectors, [[float(i)] for i in range(200)])
+        self.assertEqual(self.embedder.bedrock_client.invoke_model.call_count, 3)
+
+    async def test_titan_is_not_batched(self):
+        await self.embedder.generate_vectors(
+            ["a", "b"], {"embed_model_name": "titan"}
+        )
+        self.assertEqual(self.embedder.bedrock_client.invoke_model.call_count, 2)
+
+    async def test_calls_do_not_block_event_loop(self):
+        in_flight = 0
+        max_in_flight = 0
+        lock = threading.Lock()
+
+        def invoke_model(**kwargs):
+            nonlocal in_flight, max_in_flight
+            with lock:
+                in_flight += 1
+                max_in_flight = max(max_in_flight, in_flight)
+            time.sleep(0.05)
+            with lock:
+                in_flight -= 1
+            stream_mock = MagicMock()
+            stream_mock.read.return_value = b'{"embeddings": [[0.1]]}'
+            return {"body": stream_mock}
+
+        self.embedder.bedrock_client.invoke_model = MagicMock(side_effect=invoke_model)
+        ticks = 0
+
+        async def tick():
+            nonlocal ticks
+            while True:
+                ticks += 1
+                await asyncio.sleep(0.005)
+
+        ticker = asyncio.create_task(tick())
+        await asyncio.gather(*[self.embedder.generate_vector(str(i)) for i in range(5)])
+        ticker.cancel()
+        self.assertEqual(max_in_flight, 5)
+        self.assertGreater(ticks, 3)
@@ -0,0 +1,129 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import MagicMock, patch
+
+from .base_embedder import BaseEmbedder
+from .cached_embedder import CachedEmbedder
+from .embedding_scheduler import EmbeddingScheduler
+from .get_embedder import EMBEDDERS, _embedders, get_embedder
+
+
+class CountingEmbedder(BaseEmbedder):
+    MAX_BATCH_SIZE = 10
+
+    def __init__(self):
+        self.texts = []
+
+    async def generate_vector(self, text, extra_options=None):
+        return (await self.embed_batch([text], extra_options))[0]
+
+    async def embed_batch(self, texts, extra_options=None):
+        self.texts.extend(texts)
+        return [[float(len(text)), 0.5] for text in texts]
+
+
+class TestCachedEmbedder(unittest.IsolatedAsyncioTestCase):
+
+    async def test_memory_cache(self):
+        inner = CountingEmbedder()
+        embedder = CachedEmbedder(inner, max_size=2)
+
+        self.assertEqual(await embedder.generate_vector("abc"), [3.0, 0.5])
+        self.assertEqual(await embedder.generate_vector("abc"), [3.0, 0.5])
+        vectors = await embedder.generate_vectors(["abc", "de", "de", "f"])
+        self.assertEqual(vectors, [[3.0, 0.5], [2.0, 0.5], [2.0, 0.5], [1.0, 0.5]])
+        self.assertEqual(inner.texts, ["abc", "de", "f"])
+        # the key includes the task, and "abc" was evicted by the LRU
+        await embedder.generate_vector("de", {"task": "search_query"})
+        await embedder.generate_vector("abc")
+        self.assertEqual(inner.texts, ["abc", "de", "f", "de", "abc"])
+        self.assertEqual(embedder.stats()["memory_hits"], 2)
+        self.assertEqual(embedder.stats()["misses"], 5)
+
+    async def test_persistent_store(self):
+        with tempfile.TemporaryDirectory() as folder:
+            path = os.path.join(folder, "embeddings.sqlite")
+            embedder = CachedEmbedder(CountingEmbedder(), path=path)
+            await embedder.generate_vectors(["abc", "de"])
+            embedder.close()
+
+            inner = CountingEmbedder()
+            embedder = CachedEmbedder(inner, path=path)
+            vectors = await embedder.generate_vectors(["de", "abc", "ghij"])
+            self.assertEqual(vectors, [[2.0, 0.5], [3.0, 0.5], [4.0, 0.5]])
+            self.assertEqual(inner.texts, ["ghij"])
+            self.assertEqual(embedder.stats()["store_hits"], 2)
+            self.assertAlmostEqual(embedder.stats()["hit_rate"], 2 / 3)
+            self.assertEqual(len(embedder.store), 3)
+            embedder.close()
+
+    async def test_forwards_attributes(self):
+        inner = CountingEmbedder()
+        embedder = CachedEmbedder(inner)
+        self.assertIs(embedder.texts, inner.texts)
+
+    async def test_batching_follows_the_wrapped_embedder(self):
+        inner = CountingEmbedder()
+        inner.MAX_INPUT_SIZE = 4
+        inner.MAX_CONCURRENCY = 3
+        embedder = CachedEmbedder(inner)
+        self.assertEqual(embedder.MAX_BATCH_SIZE, 10)
+        self.assertEqual(embedder.MAX_CONCURRENCY, 3)
+        self.assertEqual(embedder.get_batch_limits(), (10, None))
+        self.assertEqual(embedder.truncate("abcdef"), "abcd")
+
+        self.assertEqual(
+            await embedder.embed_batch(["ab", "ab", "c"]),
+            [[2.0, 0.5], [2.0, 0.5], [1.0, 0.5]],
+        )
+        scheduler = EmbeddingScheduler(embedder)
+        vectors = [vector async for _, vector in scheduler.stream(["ab", "def", "c"])]
+        self.assertEqual(len(vectors), 3)
+        # one batched request for the single text missing from the cache
+        self.assertEqual(inner.texts, ["ab", "c", "def"])
+
+    async def test_from_config(self):
+        inner = CountingEmbedder()
+        self.assertIs(CachedEmbedder.from_config(None, inner), inner)
+        shraga_config = MagicMock()
+        shraga_config.get.return_value = None
+        self.assertIs(CachedEmbedder.from_config(shraga_config, inner), inner)
+
+        with tempfile.TemporaryDirectory() as tmp:
+            shraga_config.get.return_value = {
+                "max_size": 5,
+                "path": os.path.join(tmp, "embeddings.sqlite"),
+            }
+            embedder = CachedEmbedder.from_config(shraga_config, inner)
+            self.assertIsInstance(embedder, CachedEmbedder)
+            self.assertEqual(embedder.max_size, 5)
+            await embedder.generate_vector("abc")
+            self.assertEqual(len(embedder.store), 1)
+            embedder.close()
+
+    async def test_get_embedder(self):
+        configs = {
+            "embedders.provider": "counting",
+            "embedders.cache": {"max_size": 5},
+            "embedders.counting": {"max_concurrency": 2, "requests_per_second": 10},
+        }
+        shraga_config = MagicMock()
+        shraga_config.get.side_effect = configs.get
+        embedders = {"counting": lambda shraga_config: CountingEmbedder()}
+        with patch.dict(EMBEDDERS, embedders), patch.dict(
+            _embedders, clear=True
+        ):
+            embedder = get_embedder(shraga_config)
+            self.assertIsInstance(embedder, CachedEmbedder)
+            self.assertIsInstance(embedder.embedder, CountingEmbedder)
+            self.assertEqual(embedder.MAX_CONCURRENCY, 2)
+            self.assertEqual(embedder.REQUESTS_PER_SECOND, 10)
+            # built once, then shared
+            self.assertIs(get_embedder(shraga_config), embedder)
+            with self.assertRaises(ValueError):
+                get_embedder(shraga_config, "unknown")
+
+
+if __name__ == "__main__":
+    unittest.main()
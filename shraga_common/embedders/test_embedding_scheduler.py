@@ -0,0 +1,120 @@
+import asyncio
+import unittest
+
+from botocore.exceptions import ClientError
+
+from shraga_common.exceptions import LLMServiceUnavailableException
+
+from .base_embedder import BaseEmbedder
+from .embedding_scheduler import EmbeddingScheduler, TokenBucket, is_throttling_error
+
+
+def throttling_error():
+    try:
+        raise ClientError(
+            {"Error": {"Code": "ThrottlingException", "Message": "slow down"}},
+            "InvokeModel",
+        )
+    except ClientError as e:
+        return LLMServiceUnavailableException("Unexpected error", e)
+
+
+class FlakyEmbedder(BaseEmbedder):
+    MAX_BATCH_SIZE = 2
+
+    def __init__(self, failures: int = 0):
+        self.failures = failures
+        self.calls = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def generate_vector(self, text, extra_options=None):
+        return (await self.embed_batch([text], extra_options))[0]
+
+    async def embed_batch(self, texts, extra_options=None):
+        self.calls += 1
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(0.01)
+            if self.failures:
+                self.failures -= 1
+                raise throttling_error()
+            return [[float(text)] for text in texts]
+        finally:
+            self.in_flight -= 1
+
+
+class TestEmbeddingScheduler(unittest.IsolatedAsyncioTestCase):
+
+    def test_is_throttling_error(self):
+        self.assertTrue(is_throttling_error(throttling_error()))
+        self.assertFalse(is_throttling_error(LLMServiceUnavailableException("Empty embedding")))
+
+        class TooManyRequestsError(Exception):
+            status_code = 429
+
+        try:
+            try:
+                raise TooManyRequestsError()
+            except TooManyRequestsError as e:
+                raise RuntimeError(f"An unexpected error occurred: {e}")
+        except RuntimeError as e:
+            self.assertTrue(is_throttling_error(e))
+
+    async def test_bounded_concurrency(self):
+        embedder = FlakyEmbedder()
+        scheduler = EmbeddingScheduler(embedder, max_concurrency=3)
+        texts = [str(i) for i in range(40)]
+        self.assertEqual(await scheduler.embed(texts), [[float(i)] for i in range(40)])
+        self.assertEqual(embedder.calls, 20)
+        self.assertEqual(embedder.max_in_flight, 3)
+
+    async def test_generate_vectors_is_bounded(self):
+        embedder = FlakyEmbedder()
+        embedder.MAX_CONCURRENCY = 4
+        await embedder.generate_vectors([str(i) for i in range(40)])
+        self.assertEqual(embedder.max_in_flight, 4)
+
+    async def test_concurrency_is_shared(self):
+        embedder = FlakyEmbedder()
+        embedder.MAX_CONCURRENCY = 3
+        await asyncio.gather(
+            *[embedder.generate_vectors([str(i) for i in range(10)]) for _ in range(4)]
+        )
+        self.assertEqual(embedder.max_in_flight, 3)
+
+    async def test_retries_throttling(self):
+        embedder = FlakyEmbedder(failures=3)
+        scheduler = EmbeddingScheduler(
+            embedder, max_concurrency=1, initial_backoff=0.001, requests_per_second=1000
+        )
+        self.assertEqual(await scheduler.embed(["1", "2"]), [[1.0], [2.0]])
+        self.assertEqual(embedder.calls, 4)
+        self.assertLess(scheduler.get_bucket().rate, 1000)
+
+        embedder = FlakyEmbedder(failures=3)
+        scheduler = EmbeddingScheduler(embedder, max_retries=2, initial_backoff=0.001)
+        with self.assertRaises(LLMServiceUnavailableException):
+            await scheduler.embed(["1"])
+
+    async def test_stream(self):
+        scheduler = EmbeddingScheduler(FlakyEmbedder(), max_concurrency=2)
+        results = [result async for result in scheduler.stream(["1", "2", "3"])]
+        self.assertEqual(sorted(results), [(0, [1.0]), (1, [2.0]), (2, [3.0])])
+
+    async def test_token_bucket(self):
+        bucket = TokenBucket(rate=100, capacity=1)
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        for _ in range(6):
+            await bucket.acquire()
+        self.assertGreaterEqual(loop.time() - start, 0.04)
+        bucket.throttle()
+        self.assertEqual(bucket.rate, 50)
+        bucket.recover()
+        self.assertEqual(bucket.rate, 55)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,89 @@
+import asyncio
+import threading
+import unittest
+from unittest.mock import MagicMock, patch
+
+import numpy
+
+from .local_embedder import DEFAULT_MODEL, LocalEmbedder
+
+
+class FakeModel:
+    prompts = {"query": "query: "}
+
+    def __init__(self):
+        self.calls = []
+        self.threads = set()
+
+    def encode(self, texts, prompt_name=None, **kwargs):
+        self.calls.append((list(texts), prompt_name))
+        self.threads.add(threading.current_thread().name)
+        return numpy.array([[float(len(text)), 1.0] for text in texts])
+
+
+class TestLocalEmbedder(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.model = FakeModel()
+
+    async def test_concurrent_calls_share_a_batch(self):
+        embedder = LocalEmbedder(model=self.model, max_batch_size=4)
+        vectors = await asyncio.gather(
+            *[embedder.generate_vector("x" * i) for i in range(1, 7)]
+        )
+        self.assertEqual(vectors, [[float(i), 1.0] for i in range(1, 7)])
+        # a full batch is encoded at once, the rest after max_wait
+        self.assertEqual([len(texts) for texts, _ in self.model.calls], [4, 2])
+        self.assertTrue(all(t.startswith("local-embedder") for t in self.model.threads))
+
+    async def test_batches_by_task(self):
+        embedder = LocalEmbedder(model=self.model)
+        await asyncio.gather(
+            embedder.generate_vector("a", {"task": "query"}),
+            embedder.generate_vector("b", {"task": "document"}),
+            embedder.generate_vector("c", {"task": "query"}),
+        )
+        self.assertCountEqual(self.model.calls, [(["a", "c"], "query"), (["b"], None)])
+
+    async def test_generate_vectors(self):
+        embedder = LocalEmbedder(model=self.model, max_batch_size=3)
+        vectors = await embedder.generate_vectors(["a", "bb", "ccc", "dddd"])
+        self.assertEqual([vector[0] for vector in vectors], [1.0, 2.0, 3.0, 4.0])
+        self.assertEqual(len(self.model.calls), 2)
+
+    async def test_errors_reach_every_caller(self):
+        self.model.encode = MagicMock(side_effect=RuntimeError("boom"))
+        embedder = LocalEmbedder(model=self.model)
+        results = await asyncio.gather(
+            embedder.generate_vector("a"),
+            embedder.generate_vector("b"),
+            return_exceptions=True,
+        )
+        self.assertTrue(all(isinstance(result, RuntimeError) for result in results))
+
+    def test_model_from_config(self):
+        shraga_config = MagicMock()
+        shraga_config.get.return_value = {"model": "intfloat/e5-small-v2", "backend": "onnx"}
+        with patch.object(LocalEmbedder, "load_model") as load_model:
+            LocalEmbedder(shraga_config)
+        load_model.assert_called_once_with("intfloat/e5-small-v2", "onnx", "cpu")
+
+    def test_arguments_win_over_config(self):
+        shraga_config = MagicMock()
+        shraga_config.get.return_value = {
+            "backend": "onnx",
+            "device": "cuda",
+            "max_batch_size": 8,
+            "max_wait": 0.1,
+        }
+        with patch.object(LocalEmbedder, "load_model") as load_model:
+            embedder = LocalEmbedder(
+                shraga_config, backend="torch", max_batch_size=16, max_wait=0
+            )
+        load_model.assert_called_once_with(DEFAULT_MODEL, "torch", "cuda")
+        self.assertEqual(embedder.max_batch_size, 16)
+        self.assertEqual(embedder.max_wait, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,4 +1,4 @@
 from typing import Literal
 
-EmbedderModelProvider = Literal["cohere", "openai"]
+EmbedderModelProvider = Literal["bedrock", "cohere", "google", "local", "openai"]
 EmbedderModelName = Literal["cohere-multilingual", "cohere", "text-embedding-3-small"]
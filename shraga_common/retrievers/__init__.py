@@ -1,13 +1,18 @@
 from .base_search_retriever import BaseSearchRetriever
-from .collapse import get_inner_hits, merge_inner_hits_results
+from .client_registry import ClientRegistry, client_registry
+from .collapse import collapse_hits, get_inner_hits, merge_inner_hits_results
 from .common import RetrieverConfig
 from .elasticsearch import ElasticsearchRetriever
+from .fusion import reciprocal_rank_fusion
 from .get_client import get_client
+from .mmr import maximal_marginal_relevance, mmr_rerank
 
 # commented out due to slow loading!
 # from .google_maps import GoogleMapsRetriever
 from .local import LocalRetriever
 from .opensearch import OpenSearchRetriever
+from .search_cache import (InMemorySearchCacheBackend, SearchCache,
+                           SearchCacheBackend)
 
 __all__ = [
     "ElasticsearchRetriever",
@@ -17,5 +22,14 @@ __all__ = [
     "RetrieverConfig",
     "merge_inner_hits_results",
     "get_inner_hits",
+    "collapse_hits",
     "get_client",
+    "ClientRegistry",
+    "client_registry",
+    "SearchCache",
+    "SearchCacheBackend",
+    "InMemorySearchCacheBackend",
+    "reciprocal_rank_fusion",
+    "maximal_marginal_relevance",
+    "mmr_rerank",
 ]
@@ -1,13 +1,43 @@
 import asyncio
 from abc import ABC, abstractmethod
-from typing import Dict, List, Optional
+from fnmatch import fnmatch
+from functools import partial
+from logging import getLogger
+from typing import (AsyncIterator, Awaitable, Callable, Dict, Iterable, List,
+                    Optional, Sequence, Tuple)
 
-from .common import RetrieverConfig
+from pydash import _
+
+from shraga_common.models import RetrievalResult
+from shraga_common.utils.deadline import remaining_time
+
+from .collapse import collapse_hits, collapse_key
+from .common import RetrieverConfig, build_source_filter
+from .fusion import DEFAULT_RANK_CONSTANT, hit_key, reciprocal_rank_fusion
+from .mmr import DEFAULT_LAMBDA, hit_to_retrieval_result, mmr_rerank
+from .search_cache import SearchCache
+
+logger = getLogger(__name__)
+
+# share of the client timeout given to the engine, so that slow shards return
+# partial results before the client gives up on the request
+ENGINE_TIMEOUT_RATIO = 0.8
 
 
 class BaseSearchRetriever(ABC):
+    # sort used by scan when the query has none: the point in time tiebreaker,
+    # a total order in index order that needs no field data
+    SCAN_SORT: List = [{"_shard_doc": "asc"}]
+
     def __init__(self, *args, **kwargs):
         self.client = None
+        self.async_client = None
+        self.request_timeout: float = 300
+        self.cache: Optional[SearchCache] = None
+        self.collapse: Optional[dict] = None
+        self.source_includes: Optional[List[str]] = None
+        self.source_excludes: List[str] = []
+        self.docvalue_fields: Optional[List[str]] = None
 
     @staticmethod
     @abstractmethod
@@ -37,6 +67,252 @@ class BaseSearchRetriever(ABC):
     async def execute_empty_query(self, index_name: Optional[str] = None):
         pass
 
+    def apply_source_filter(self, query: dict, exclude_fields: Iterable[str] = ()) -> dict:
+        """
+        Add the configured _source filter and docvalue_fields to a query.
+        exclude_fields are excluded on top of the configured source_excludes.
+        """
+        source = build_source_filter(
+            self.source_includes, [*self.source_excludes, *exclude_fields]
+        )
+        if source:
+            query["_source"] = source
+        if self.docvalue_fields:
+            query["docvalue_fields"] = list(self.docvalue_fields)
+        return query
+
+    def apply_collapse(self, query: dict) -> dict:
+        """Add the configured collapse clause, if any, to a query."""
+        if self.collapse:
+            query["collapse"] = self.collapse
+        return query
+
+    def collapse_results(self, hits: List[Dict]) -> List[Dict]:
+        """Merge collapsed hits with their chunks when collapsing is configured."""
+        if not self.collapse:
+            return hits
+        return collapse_hits(hits)
+
+    def build_vector_query(
+        self, field_name: str, query_vector: List[float], k: int = 10
+    ) -> dict:
+        raise NotImplementedError(f"{type(self).__name__} does not build vector queries")
+
+    def build_text_query(self, text: str, k: int = 10) -> dict:
+        raise NotImplementedError(f"{type(self).__name__} does not build text queries")
+
+    def build_hybrid_query(
+        self,
+        text: str,
+        query_vector: List[float],
+        field_name: str,
+        k: int,
+        weights: Optional[Sequence[float]],
+        rank_constant: int,
+        rank_window_size: int,
+    ) -> Optional[dict]:
+        """
+        Build a query that fuses text and vector search on the engine itself.
+        Returns None when native hybrid search is unavailable or not enabled.
+        """
+        return None
+
+    async def execute_hybrid_search(
+        self,
+        text: str,
+        query_vector: List[float],
+        k: int = 10,
+        weights: Optional[Sequence[float]] = None,
+        *,
+        field_name: str,
+        index_name: Optional[str] = None,
+        rank_constant: int = DEFAULT_RANK_CONSTANT,
+        rank_window_size: Optional[int] = None,
+    ) -> List[Dict]:
+        """
+        Combined BM25 and kNN search merged with reciprocal rank fusion.
+
+        Uses the engine's native hybrid search when configured. Otherwise both
+        searches are sent in a single multi-search and fused locally.
+
+        Args:
+            text (str): Text query.
+            query_vector (List[float]): Query vector.
+            k (int): Number of hits to return.
+            weights (Optional[Sequence[float]]): (text, vector) weights for the fusion.
+            field_name (str): The vector field to search.
+            index_name (Optional[str]): Index to search, the configured index by default.
+            rank_constant (int): RRF rank constant.
+            rank_window_size (Optional[int]): Hits fetched per sub-search, k by default.
+
+        Returns:
+            List[Dict]: Fused hits, best first.
+        """
+        rank_window_size = max(rank_window_size or k, k)
+        hybrid_query = self.build_hybrid_query(
+            text, query_vector, field_name, k, weights, rank_constant, rank_window_size
+        )
+        if hybrid_query is not None:
+            return self.collapse_results(
+                await self.execute_raw_search(hybrid_query, index_name)
+            )
+
+        text_hits, vector_hits = await self.execute_raw_searches(
+            [
+                self.build_text_query(text, rank_window_size),
+                self.build_vector_query(field_name, query_vector, rank_window_size),
+            ],
+            index_name,
+        )
+        key = collapse_key(self.collapse["field"]) if self.collapse else hit_key
+        return self.collapse_results(
+            reciprocal_rank_fusion(
+                [text_hits, vector_hits],
+                weights,
+                k=k,
+                rank_constant=rank_constant,
+                key=key,
+            )
+        )
+
+    def get_request_timeout(self) -> float:
+        """
+        The client timeout of the next request: request_timeout, capped by the time
+        left until the deadline of the current flow request.
+        """
+        remaining = remaining_time()
+        if remaining is None:
+            return self.request_timeout
+        if remaining <= 0:
+            raise TimeoutError("Request deadline exceeded")
+        return min(self.request_timeout, remaining)
+
+    @staticmethod
+    def with_engine_timeout(query: dict, timeout: float) -> dict:
+        """A copy of query with a server-side timeout derived from the client timeout."""
+        if "timeout" in query:
+            return query
+        engine_timeout_ms = max(int(timeout * ENGINE_TIMEOUT_RATIO * 1000), 1)
+        return {**query, "timeout": f"{engine_timeout_ms}ms"}
+
+    @staticmethod
+    def get_response_hits(response) -> Tuple[List[Dict], bool]:
+        """The hits of a search response, and whether the search timed out."""
+        timed_out = bool(_.get(response, "timed_out"))
+        if timed_out:
+            logger.warning("Search timed out, returning partial results")
+        return _.get(response, "hits.hits") or [], timed_out
+
+    async def call_client(self, method: str, **kwargs):
+        """
+        Call a client API method, on the async client when there is one, otherwise
+        on the sync client in the default executor.
+        """
+        if self.async_client:
+            return await getattr(self.async_client, method)(**kwargs)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            None, partial(getattr(self.client, method), **kwargs)
+        )
+
+    async def open_point_in_time(self, index_name: str, keep_alive: str) -> str:
+        raise NotImplementedError()
+
+    async def close_point_in_time(self, pit_id: str):
+        raise NotImplementedError()
+
+    async def search_point_in_time(self, body: dict) -> dict:
+        return await self.call_client("search", body=body)
+
+    async def scan(
+        self,
+        query: Optional[dict] = None,
+        index_name: Optional[str] = None,
+        page_size: int = 1000,
+        keep_alive: str = "1m",
+    ) -> AsyncIterator[Dict]:
+        """
+        Iterate over every hit of a query with a point in time and search_after.
+
+        Only one page of hits is held at a time, and the point in time gives a
+        consistent view of the index while it is walked. Use it with
+        contextlib.aclosing when stopping early, so the point in time is released.
+
+        Args:
+            query (Optional[dict]): Search body, all documents by default. Its sort is
+                kept (it should be a total order), otherwise SCAN_SORT is used.
+            index_name (Optional[str]): Index to scan, the configured index by default.
+            page_size (int): Hits fetched per request.
+            keep_alive (str): How long the point in time is kept between pages.
+
+        Yields:
+            Dict: The hits, in sort order.
+        """
+        index_name = index_name or self.index_name
+        body = {
+            key: value
+            for key, value in (query or {"query": {"match_all": {}}}).items()
+            if key not in ("from", "search_after")
+        }
+        body.setdefault("sort", self.SCAN_SORT)
+        body["size"] = page_size
+        if "_source" not in body:
+            self.apply_source_filter(body)
+
+        pit_id = await self.open_point_in_time(index_name, keep_alive)
+        try:
+            while True:
+                body["pit"] = {"id": pit_id, "keep_alive": keep_alive}
+                response = await self.search_point_in_time(body)
+                # the point in time id may change between requests
+                pit_id = response.get("pit_id") or pit_id
+                hits = _.get(response, "hits.hits") or []
+                for hit in hits:
+                    yield hit
+                if len(hits) < page_size:
+                    break
+                body["search_after"] = hits[-1]["sort"]
+        finally:
+            try:
+                await self.close_point_in_time(pit_id)
+            except Exception as e:
+                logger.warning(f"Error closing point in time: {e}")
+
+    async def execute_mmr_search(
+        self,
+        field_name: str,
+        query_vector: List[float],
+        k: int = 10,
+        fetch_k: int = 50,
+        lambda_mult: float = DEFAULT_LAMBDA,
+        index_name: Optional[str] = None,
+    ) -> List[RetrievalResult]:
+        """
+        Vector search for fetch_k candidates, diversified down to k results with
+        maximal marginal relevance. The candidates are fetched with their vectors,
+        which are removed from the returned results.
+        """
+        query = self.build_vector_query(field_name, query_vector, max(fetch_k, k))
+        source = build_source_filter(
+            self.source_includes and [*self.source_includes, field_name],
+            [pattern for pattern in self.source_excludes if not fnmatch(field_name, pattern)],
+        )
+        query.pop("_source", None)
+        if source:
+            query["_source"] = source
+        # rerank before collapsing, merged chunks are built from inner hits that
+        # do not carry the vectors
+        hits = mmr_rerank(
+            query_vector,
+            await self.execute_raw_search(query, index_name),
+            k,
+            lambda_mult,
+            vector_field=field_name,
+            exclude_fields=self.source_excludes,
+            to_result=lambda hit: hit,
+        )
+        return [hit_to_retrieval_result(hit) for hit in self.collapse_results(hits)]
+
     def count(self, body: dict, index_name: str):
         return self.client.count(body, index_name)
 
@@ -55,3 +331,78 @@ class BaseSearchRetriever(ABC):
     ) -> List[Dict]:
         tasks = [self.execute_raw_search(query, index_name) for query in queries]
         return await asyncio.gather(*tasks)
+
+    @staticmethod
+    def build_msearch_body(queries: List[dict], index_name: str) -> List[dict]:
+        body = []
+        for query in queries:
+            body.append({"index": index_name})
+            body.append(query)
+        return body
+
+    async def cached_search(
+        self,
+        index_name: Optional[str],
+        raw_query: dict,
+        search: Callable[[], Awaitable[Tuple[List[Dict], bool]]],
+    ) -> List[Dict]:
+        """
+        Return the hits of raw_query from the cache, or run search and cache them.
+        search returns (hits, timed_out), partial hits of timed out searches are
+        not cached.
+        """
+        if self.cache is None:
+            hits, _timed_out = await search()
+            return hits
+        hits = await self.cache.get(index_name, raw_query)
+        if hits is None:
+            hits, timed_out = await search()
+            if not timed_out:
+                await self.cache.set(index_name, raw_query, hits)
+        return hits
+
+    async def cached_searches(
+        self,
+        index_name: Optional[str],
+        queries: List[dict],
+        search_many: Callable[
+            [List[dict]], Awaitable[List[Optional[Tuple[List[Dict], bool]]]]
+        ],
+    ) -> List[List[Dict]]:
+        """
+        Serve each query from the cache when possible and run search_many once for
+        the rest. search_many returns (hits, timed_out) per query, or None for
+        failed queries. Failed and timed out queries are not cached.
+        """
+        if self.cache is None:
+            results = [result and result[0] for result in await search_many(queries)]
+        else:
+            results = [await self.cache.get(index_name, query) for query in queries]
+            missing = [i for i, hits in enumerate(results) if hits is None]
+            if missing:
+                fetched = await search_many([queries[i] for i in missing])
+                for i, result in zip(missing, fetched):
+                    if result is None:
+                        continue
+                    results[i], timed_out = result
+                    if not timed_out:
+                        await self.cache.set(index_name, queries[i], results[i])
+        return [hits or [] for hits in results]
+
+    @staticmethod
+    def get_msearch_hits(response: dict) -> List[Optional[Tuple[List[Dict], bool]]]:
+        """
+        Extract the (hits, timed_out) of every sub-search of a multi-search response.
+        A failed sub-search is logged and yields None, without failing the others.
+        """
+        results = []
+        for i, sub_response in enumerate(_.get(response, "responses") or []):
+            if "error" in sub_response:
+                logger.error(
+                    f"Error executing search query {i} of multi-search: "
+                    f"{sub_response['error']}"
+                )
+                results.append(None)
+            else:
+                results.append(BaseSearchRetriever.get_response_hits(sub_response))
+        return results
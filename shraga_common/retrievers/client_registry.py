@@ -0,0 +1,143 @@
+import asyncio
+import inspect
+from logging import getLogger
+from threading import Lock
+from typing import Any, Callable, Dict
+
+from .common import RetrieverConfig
+
+logger = getLogger(__name__)
+
+# config fields that determine the connections of a client
+CONNECTION_FIELDS = (
+    "type",
+    "host",
+    "port",
+    "auth_method",
+    "auth_type",
+    "user",
+    "password",
+    "use_ssl",
+    "verify_certs",
+    "pool_maxsize",
+    "keepalive_timeout",
+    "use_cloud_id",
+    "cloud_id",
+    "api_key",
+)
+
+
+class ClientRegistry:
+    """
+    Process-wide registry of search clients, keyed by connection config.
+
+    Clients, sync or async, are built lazily on first use and shared afterwards,
+    so their connection pools (and TLS sessions) survive across requests and
+    retrievers. Getting a client never does network I/O; clients are pinged by
+    health_check, typically from run_health_checks in the app lifespan, and are
+    never closed while in use since their pools reconnect on their own.
+    """
+
+    def __init__(self, health_check_interval: float = 30):
+        self.health_check_interval = health_check_interval
+        self._clients: Dict[tuple, Any] = {}
+        self._lock = Lock()
+
+    @staticmethod
+    def make_key(shraga_config, config: RetrieverConfig, is_async: bool = False) -> tuple:
+        key = tuple(getattr(config, field) for field in CONNECTION_FIELDS)
+        if config.auth_method == "aws":
+            key += (shraga_config.get("aws.region") if shraga_config else None,)
+        if is_async:
+            key += ("async",)
+        return key
+
+    def get(
+        self,
+        shraga_config,
+        config: RetrieverConfig,
+        factory: Callable[[Any, RetrieverConfig], Any],
+        is_async: bool = False,
+    ):
+        """
+        Get the shared client for config, building it with factory(shraga_config,
+        config) if there is none yet. Async clients are registered apart from sync
+        clients of the same config.
+        """
+        key = self.make_key(shraga_config, config, is_async)
+        with self._lock:
+            client = self._clients.get(key)
+            if client is None:
+                client = factory(shraga_config, config)
+                self._clients[key] = client
+            return client
+
+    @staticmethod
+    async def is_healthy(client) -> bool:
+        try:
+            if inspect.iscoroutinefunction(client.ping):
+                return bool(await client.ping())
+            # sync clients block, ping them off the event loop
+            return bool(await asyncio.to_thread(client.ping))
+        except Exception as e:
+            logger.warning(f"Search client health check failed: {e}")
+            return False
+
+    async def health_check(self) -> Dict[str, bool]:
+        """Ping every registered client, by host and kind."""
+        with self._lock:
+            clients = list(self._clients.items())
+        results = await asyncio.gather(
+            *[self.is_healthy(client) for _key, client in clients]
+        )
+        health = {}
+        for (key, _client), healthy in zip(clients, results):
+            kind = "async" if key[-1] == "async" else "sync"
+            health[f"{key[0]}://{key[1]}:{key[2]} ({kind})"] = healthy
+        return health
+
+    async def run_health_checks(self):
+        """Check the clients every health_check_interval seconds, until cancelled."""
+        while True:
+            await asyncio.sleep(self.health_check_interval)
+            for host, healthy in (await self.health_check()).items():
+                if not healthy:
+                    logger.warning(f"Search client for {host} is unhealthy")
+
+    def _pop_all(self) -> list:
+        with self._lock:
+            clients = list(self._clients.values())
+            self._clients.clear()
+        return clients
+
+    def close(self):
+        """Close and forget every registered client. Async clients need aclose()."""
+        for client in self._pop_all():
+            if inspect.iscoroutinefunction(client.close):
+                logger.warning("Async search client not closed, use aclose()")
+                continue
+            self.close_client(client)
+
+    async def aclose(self):
+        """Close and forget every registered client, sync or async."""
+        for client in self._pop_all():
+            if not inspect.iscoroutinefunction(client.close):
+                self.close_client(client)
+                continue
+            try:
+                await client.close()
+            except Exception as e:
+                logger.warning(f"Error closing search client: {e}")
+
+    @staticmethod
+    def close_client(client):
+        try:
+            client.close()
+        except Exception as e:
+            logger.warning(f"Error closing search client: {e}")
+
+    def __len__(self) -> int:
+        return len(self._clients)
+
+
+client_registry = ClientRegistry()
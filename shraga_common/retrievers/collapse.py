@@ -1,6 +1,9 @@
-from typing import List
+from typing import Callable, Hashable, List, Optional
 
-from pydash import _
+from .common import RetrieverConfig, build_source_filter
+from .fusion import hit_key
+
+CHUNKS_INNER_HITS = "chunks"
 
 
 def get_inner_hits(result_set: dict):
@@ -8,22 +11,47 @@ def get_inner_hits(result_set: dict):
         result_set = {}
     return (
         result_set.get("inner_hits", {})
-        .get("chunks", {})
+        .get(CHUNKS_INNER_HITS, {})
         .get("hits", {})
         .get("hits", [])
     )
 
 
+def build_collapse(config: RetrieverConfig) -> Optional[dict]:
+    """
+    The collapse clause that groups the chunks of a document into a single hit,
+    with the chunks returned as inner hits. None if collapsing is disabled.
+    """
+    if not config.collapse_field:
+        return None
+    inner_hits = {"name": CHUNKS_INNER_HITS, "size": config.collapse_inner_hits}
+    source = build_source_filter(config.source_includes, config.source_excludes)
+    if source:
+        inner_hits["_source"] = source
+    return {"field": config.collapse_field, "inner_hits": inner_hits}
+
+
+def collapse_key(field: str) -> Callable[[dict], Hashable]:
+    """Identify collapsed hits by the value they were collapsed on."""
+
+    def key(hit: dict) -> Hashable:
+        values = hit.get("fields", {}).get(field)
+        if not values:
+            return hit_key(hit)
+        return hit.get("_index"), values[0]
+
+    return key
+
+
 def merge_inner_hits_results(inner_hits: List[dict], orig_doc: dict):
     original_chunk = orig_doc.get("_source", {})
     original_system_id = original_chunk.get("system_id", "")
 
-    # Sort by system_id ascending
-    inner_hits.append(orig_doc)
-    inner_hits = sorted(_.uniq(inner_hits), key=lambda x: x["_id"])
-    inner_hits = _.uniq_by(
-        inner_hits, lambda x: x["_source"].get("system_id", x["_id"])
-    )
+    # Sort by _id and keep the first chunk of every system_id
+    chunks = {}
+    for hit in sorted([*inner_hits, orig_doc], key=lambda x: x["_id"]):
+        chunks.setdefault(hit["_source"].get("system_id", hit["_id"]), hit)
+    inner_hits = list(chunks.values())
     # text
     merged_text = "\n".join([x["_source"]["text"] for x in inner_hits])
 
@@ -43,3 +71,8 @@ def merge_inner_hits_results(inner_hits: List[dict], orig_doc: dict):
         f"{start_system_id} - {end_system_id} ({original_system_id})"
     )
     return merged_inner_hits
+
+
+def collapse_hits(hits: List[dict]) -> List[dict]:
+    """Merge every collapsed hit with its inner hits into a single document."""
+    return [merge_inner_hits_results(get_inner_hits(hit), hit) for hit in hits]
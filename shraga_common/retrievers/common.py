@@ -1,4 +1,4 @@
-from typing import Optional, Literal
+from typing import Iterable, List, Literal, Optional
 from pydantic import BaseModel
 class RetrieverConfig(BaseModel):
     type: str
@@ -11,7 +11,37 @@ class RetrieverConfig(BaseModel):
     password: Optional[str] = None
     use_ssl: bool = True
     verify_certs: bool = False
+    # asyncio transport
+    use_async: bool = False
+    pool_maxsize: int = 10
+    keepalive_timeout: float = 15.0
+    # client timeout of a search in seconds, capped by the request deadline
+    request_timeout: float = 300
+    # search result cache, disabled unless a TTL (seconds) is set
+    cache_ttl: Optional[float] = None
+    cache_max_size: int = 1024
+    # use the engine's own hybrid search (RRF) instead of fusing locally
+    native_hybrid: bool = False
+    # collapse chunks of the same document on this field (e.g. "id") server-side
+    collapse_field: Optional[str] = None
+    collapse_inner_hits: int = 20
+    # _source filtering applied to every generated query, vectors are left out
+    source_includes: Optional[List[str]] = None
+    source_excludes: List[str] = ["vector_*"]
+    # small fields read from doc values instead of _source
+    docvalue_fields: Optional[List[str]] = None
     # Elasticsearch specific
     use_cloud_id: bool = False
     cloud_id: Optional[str] = None
-    api_key: Optional[str] = None
\ No newline at end of file
+    api_key: Optional[str] = None
+
+def build_source_filter(
+    includes: Optional[Iterable[str]], excludes: Optional[Iterable[str]]
+) -> Optional[dict]:
+    """The _source clause for the given field patterns, None to return all fields."""
+    source = {}
+    if includes:
+        source["includes"] = list(includes)
+    if excludes:
+        source["excludes"] = list(excludes)
+    return source or None
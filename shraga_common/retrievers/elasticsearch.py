@@ -1,31 +1,71 @@
+import asyncio
 from logging import getLogger
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Sequence, Tuple
 
-from elasticsearch import Elasticsearch
+from elasticsearch import AsyncElasticsearch, Elasticsearch
 from elasticsearch.exceptions import NotFoundError
-from pydash import _
 
 from shraga_common import ShragaConfig
 
 from .base_search_retriever import BaseSearchRetriever
+from .client_registry import client_registry
+from .collapse import build_collapse
 from .common import RetrieverConfig
+from .search_cache import SearchCache
 
 logger = getLogger(__name__)
 
+NUM_CANDIDATES_FACTOR = 10
+
 
 class ElasticsearchRetriever(BaseSearchRetriever):
     """
     ElasticsearchRetriever class
+
+    With use_async enabled searches go through AsyncElasticsearch over a pooled
+    aiohttp transport, otherwise the sync client runs on the default executor.
     """
 
     def __init__(self, shraga_config: ShragaConfig):
         super().__init__()
         config = RetrieverConfig(**shraga_config.get("retrievers.elasticsearch"))
-        self.client = ElasticsearchRetriever.get_client(shraga_config, config)
+        self.client = client_registry.get(
+            shraga_config, config, ElasticsearchRetriever.get_client
+        )
+        self.async_client = (
+            client_registry.get(
+                shraga_config, config, ElasticsearchRetriever.get_async_client, is_async=True
+            )
+            if config.use_async
+            else None
+        )
+        self.cache = SearchCache.from_config(config, shraga_config)
+        self.native_hybrid = config.native_hybrid
+        self.collapse = build_collapse(config)
+        self.source_includes = config.source_includes
+        self.source_excludes = config.source_excludes
+        self.docvalue_fields = config.docvalue_fields
+        self.request_timeout = config.request_timeout
         self.index_name = config.index
 
     @staticmethod
     def get_client(shraga_config, extra_configs: RetrieverConfig):
+        return ElasticsearchRetriever.create_client(
+            Elasticsearch,
+            extra_configs,
+            connections_per_node=extra_configs.pool_maxsize,
+        )
+
+    @staticmethod
+    def get_async_client(shraga_config, extra_configs: RetrieverConfig):
+        return ElasticsearchRetriever.create_client(
+            AsyncElasticsearch,
+            extra_configs,
+            connections_per_node=extra_configs.pool_maxsize,
+        )
+
+    @staticmethod
+    def create_client(client_class, extra_configs: RetrieverConfig, **kwargs):
         use_cloud_id = extra_configs.use_cloud_id
         cloud_id = extra_configs.cloud_id
         host = extra_configs.host
@@ -36,30 +76,31 @@ class ElasticsearchRetriever(BaseSearchRetriever):
         auth_type = extra_configs.auth_type
         if auth_type == "apikey":
             api_key = extra_configs.api_key
-            auth = {"api_key": api_key} if api_key else None
+            auth = {"api_key": api_key} if api_key else {}
         else:  # default to basic auth
             http_auth_user = extra_configs.user
             http_auth_password = extra_configs.password
             auth = (
                 {"basic_auth": (http_auth_user, http_auth_password)}
                 if http_auth_user and http_auth_password
-                else None
+                else {}
             )
 
         if use_cloud_id:
             if not cloud_id:
                 raise ValueError("cloud_id must be provided if use_cloud_id is true")
-            return Elasticsearch(
-                cloud_id=cloud_id, verify_certs=verify_certs, **auth
+            return client_class(
+                cloud_id=cloud_id, verify_certs=verify_certs, **auth, **kwargs
             )
         else:
             use_ssl = extra_configs.use_ssl
             if not host:
                 raise ValueError("host must be provided if use_cloud_id is false")
-            return Elasticsearch(
+            return client_class(
                 hosts=[f"{'https' if use_ssl else 'http'}://{host}:{port}"],
                 verify_certs=verify_certs,
                 **auth,
+                **kwargs,
             )
 
     async def get_indices_list(self):
@@ -78,9 +119,8 @@ class ElasticsearchRetriever(BaseSearchRetriever):
             return None
 
     async def execute_empty_query(self, index_name: Optional[str] = None):
-        return await self.execute_raw_search(
-            {"query": {"match_all": {}}, "size": 0}, index_name
-        )
+        query = self.apply_source_filter({"query": {"match_all": {}}, "size": 0})
+        return await self.execute_raw_search(query, index_name)
 
     async def execute_vector_search(
         self,
@@ -89,18 +129,26 @@ class ElasticsearchRetriever(BaseSearchRetriever):
         k: int = 10,
         index_name: Optional[str] = None,
     ) -> List[Dict]:
+        query = self.build_vector_query(field_name, query_vector, k)
+        return self.collapse_results(await self.execute_raw_search(query, index_name))
+
+    def build_vector_query(
+        self, field_name: str, query_vector: List[float], k: int = 10
+    ) -> dict:
         query = {
             "size": k,  # max number of results to return
-            "query": {
-                "knn": {
-                    field_name: {
-                        "vector": query_vector,
-                        "k": k,  # number of nearest neighbors to return
-                    }
-                }
-            },
+            "query": {"knn": self.build_knn(field_name, query_vector, k)},
+        }
+        return self.apply_collapse(self.apply_source_filter(query, [field_name]))
+
+    @staticmethod
+    def build_knn(field_name: str, query_vector: List[float], k: int) -> dict:
+        return {
+            "field": field_name,
+            "query_vector": query_vector,
+            # candidates per shard, more candidates trade latency for recall
+            "num_candidates": k * NUM_CANDIDATES_FACTOR,
         }
-        return await self.execute_raw_search(query, index_name)
 
     async def execute_text_search(
         self,
@@ -108,22 +156,124 @@ class ElasticsearchRetriever(BaseSearchRetriever):
         k: int = 10,
         index_name: Optional[str] = None,
     ) -> List[Dict]:
+        query = self.build_text_query(text, k)
+        return self.collapse_results(await self.execute_raw_search(query, index_name))
+
+    def build_text_query(self, text: str, k: int = 10) -> dict:
         query = {"size": k, "query": {"match": {"content": text}}}
-        return await self.execute_raw_search(query)
+        return self.apply_collapse(self.apply_source_filter(query))
+
+    def build_hybrid_query(
+        self,
+        text: str,
+        query_vector: List[float],
+        field_name: str,
+        k: int,
+        weights: Optional[Sequence[float]],
+        rank_constant: int,
+        rank_window_size: int,
+    ) -> Optional[dict]:
+        # RRF retriever, Elasticsearch 8.14+ (requires a license that includes RRF)
+        if not self.native_hybrid:
+            return None
+        if weights is not None:
+            logger.warning("Native RRF does not support weights, they are ignored")
+        knn = self.build_knn(field_name, query_vector, rank_window_size)
+        knn["k"] = rank_window_size
+        query = {
+            "size": k,
+            "retriever": {
+                "rrf": {
+                    "retrievers": [
+                        {"standard": {"query": self.build_text_query(text)["query"]}},
+                        {"knn": knn},
+                    ],
+                    "rank_constant": rank_constant,
+                    "rank_window_size": rank_window_size,
+                }
+            },
+        }
+        return self.apply_source_filter(query, [field_name])
 
     async def execute_raw_search(
         self, raw_query: dict, index_name: Optional[str] = None
     ) -> List[Dict]:
+        index_name = index_name or self.index_name
+        return await self.cached_search(
+            index_name, raw_query, lambda: self.fetch_hits(raw_query, index_name)
+        )
+
+    async def fetch_hits(
+        self, raw_query: dict, index_name: str
+    ) -> Tuple[List[Dict], bool]:
         try:
-            response = self.client.search(
-                index=index_name or self.index_name, body=raw_query
-            )
+            timeout = self.get_request_timeout()
+            body = self.with_engine_timeout(raw_query, timeout)
+            if self.async_client:
+                response = await self.async_client.options(
+                    request_timeout=timeout
+                ).search(index=index_name, body=body)
+            else:
+                loop = asyncio.get_event_loop()
+                response = await loop.run_in_executor(
+                    None,
+                    self.execute_with_timeout,
+                    body,
+                    index_name,
+                    timeout,
+                )
             # TODO validate search response
-            hits = _.get(response, "hits.hits") or []
-            return hits
+            return self.get_response_hits(response)
         except Exception as e:
             logger.error(f"Error executing search query {e}")
             raise e
 
+    def execute_msearch(self, body: List[dict], timeout: Optional[float] = None):
+        return self.client.options(request_timeout=timeout).msearch(searches=body)
+
+    async def open_point_in_time(self, index_name: str, keep_alive: str) -> str:
+        response = await self.call_client(
+            "open_point_in_time", index=index_name, keep_alive=keep_alive
+        )
+        return response["id"]
+
+    async def close_point_in_time(self, pit_id: str):
+        await self.call_client("close_point_in_time", id=pit_id)
+
+    async def execute_raw_searches(
+        self, queries: List[dict], index_name: Optional[str] = None
+    ) -> List[List[Dict]]:
+        if not queries:
+            return []
+        index_name = index_name or self.index_name
+        return await self.cached_searches(
+            index_name, queries, lambda q: self.fetch_msearch_hits(q, index_name)
+        )
+
+    async def fetch_msearch_hits(
+        self, queries: List[dict], index_name: str
+    ) -> List[Optional[Tuple[List[Dict], bool]]]:
+        try:
+            timeout = self.get_request_timeout()
+            body = self.build_msearch_body(
+                [self.with_engine_timeout(query, timeout) for query in queries],
+                index_name,
+            )
+            if self.async_client:
+                response = await self.async_client.options(
+                    request_timeout=timeout
+                ).msearch(searches=body)
+            else:
+                loop = asyncio.get_event_loop()
+                response = await loop.run_in_executor(
+                    None, self.execute_msearch, body, timeout
+                )
+            return self.get_msearch_hits(response)
+        except Exception as e:
+            logger.error(f"Error executing multi-search {e}")
+            raise e
+
     def execute_with_timeout(self, body: dict, index_name: str, timeout):
-        pass
+        return self.client.options(request_timeout=timeout).search(
+            index=index_name or self.index_name, body=body
+        )
@@ -0,0 +1,66 @@
+from typing import Callable, Dict, Hashable, List, Optional, Sequence
+
+import numpy
+
+DEFAULT_RANK_CONSTANT = 60
+
+
+def hit_key(hit: dict) -> Hashable:
+    return hit.get("_index"), hit.get("_id")
+
+
+def reciprocal_rank_fusion(
+    result_lists: Sequence[List[Dict]],
+    weights: Optional[Sequence[float]] = None,
+    k: int = 10,
+    rank_constant: int = DEFAULT_RANK_CONSTANT,
+    key: Callable[[dict], Hashable] = hit_key,
+) -> List[Dict]:
+    """
+    Merge ranked hit lists with (weighted) reciprocal rank fusion.
+
+    Each hit scores sum(weight_i / (rank_constant + rank_i)) over the lists it
+    appears in, with 1-based ranks. The first occurrence of each hit is returned,
+    with its _score replaced by the fused score.
+
+    Args:
+        result_lists (Sequence[List[Dict]]): Ranked hits of each sub-search.
+        weights (Optional[Sequence[float]]): Weight of each list, 1.0 by default.
+        k (int): Number of fused hits to return.
+        rank_constant (int): Dampens the advantage of top ranks.
+        key (Callable[[dict], Hashable]): Identifies the same document across lists.
+
+    Returns:
+        List[Dict]: Up to k hits, best first.
+    """
+    if weights is None:
+        weights = [1.0] * len(result_lists)
+    if len(weights) != len(result_lists):
+        raise ValueError("weights must have one entry per result list")
+
+    slots: Dict[Hashable, int] = {}
+    docs: List[Dict] = []
+    hit_slots, hit_lists, hit_ranks = [], [], []
+    for list_index, hits in enumerate(result_lists):
+        for rank, hit in enumerate(hits):
+            slot = slots.setdefault(key(hit), len(docs))
+            if slot == len(docs):
+                docs.append(hit)
+            hit_slots.append(slot)
+            hit_lists.append(list_index)
+            hit_ranks.append(rank)
+    if not docs:
+        return []
+
+    contributions = numpy.asarray(weights, dtype=numpy.float64)[hit_lists] / (
+        rank_constant + numpy.asarray(hit_ranks, dtype=numpy.float64) + 1
+    )
+    scores = numpy.bincount(hit_slots, weights=contributions, minlength=len(docs))
+    order = numpy.argsort(-scores, kind="stable")[:k]
+
+    fused = []
+    for slot in order:
+        doc = dict(docs[slot])
+        doc["_score"] = float(scores[slot])
+        fused.append(doc)
+    return fused
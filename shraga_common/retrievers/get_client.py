@@ -1,5 +1,6 @@
 from shraga_common import ShragaConfig
 
+from .client_registry import client_registry
 from .common import RetrieverConfig
 from .elasticsearch import ElasticsearchRetriever
 from .opensearch import OpenSearchRetriever
@@ -9,13 +10,14 @@ def get_client(shraga_config: ShragaConfig):
     opensearch_config = shraga_config.get("retrievers.opensearch")
     elasticsearch_config = shraga_config.get("retrievers.elasticsearch")
     config_obj = opensearch_config or elasticsearch_config
-    config = RetrieverConfig(**config_obj)
 
-    if not config:
+    if not config_obj:
         return None
-    
+    config = RetrieverConfig(**config_obj)
+
     RetrieverClass = (
         OpenSearchRetriever if opensearch_config else ElasticsearchRetriever
     )
 
-    return RetrieverClass.get_client(shraga_config, config)
+    # clients are shared per config, see ClientRegistry
+    return client_registry.get(shraga_config, config, RetrieverClass.get_client)
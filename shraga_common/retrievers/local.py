@@ -1,9 +1,108 @@
 import gzip
+import io
 import json
+import multiprocessing
 import os
+import queue
 import zipfile
 from json import JSONDecodeError
-from typing import Literal
+from typing import Iterator, List, Literal, TextIO
+
+# file type -> LocalRetriever reader method
+FILE_READERS = {
+    "json": "get_data_from_json_file",
+    "zip": "get_data_from_zip",
+    "jsonl.gz": "get_data_from_gz",
+}
+
+
+def iter_json_items(f: TextIO, buffer_size: int = 1 << 16) -> Iterator:
+    """
+    Incrementally decode a JSON document from a text stream.
+
+    The items of a top-level array are decoded and yielded one at a time, so only
+    about one item is held in memory. Any other document is yielded whole.
+    """
+    decoder = json.JSONDecoder()
+    buffer = ""
+    eof = False
+
+    def read_more():
+        nonlocal buffer, eof
+        # read at least as much as is buffered, so large items decode in O(n)
+        chunk = f.read(max(buffer_size, len(buffer)))
+        eof = not chunk
+        buffer += chunk
+
+    def peek() -> str:
+        # drop leading whitespace and return the next character, "" at the end
+        nonlocal buffer
+        while True:
+            buffer = buffer.lstrip()
+            if buffer or eof:
+                return buffer[:1]
+            read_more()
+
+    if peek() != "[":
+        yield json.loads(buffer + f.read())
+        return
+    buffer = buffer[1:]
+    if peek() == "]":
+        return
+
+    while True:
+        peek()
+        while True:
+            try:
+                item, end = decoder.raw_decode(buffer)
+                # a number at the end of the buffer may continue in the next read
+                if end < len(buffer) or eof:
+                    break
+            except JSONDecodeError:
+                if eof:
+                    raise
+            read_more()
+        yield item
+        buffer = buffer[end:]
+        separator = peek()
+        if separator == "]":
+            return
+        if separator != ",":
+            raise JSONDecodeError("Expecting ',' delimiter", buffer, 0)
+        buffer = buffer[1:]
+
+
+def _load_files(
+    file_type: str,
+    files: multiprocessing.Queue,
+    results: multiprocessing.Queue,
+    batch_size: int,
+    verbose: bool,
+    encoding_method: str,
+    stream: bool,
+):
+    """Worker process: decode the files it takes from `files` into batches of items."""
+    try:
+        reader = getattr(LocalRetriever, FILE_READERS[file_type])
+        while True:
+            file_path = files.get()
+            if file_path is None:
+                break
+            batch = []
+            for item in reader(
+                file_path, verbose=verbose, encoding_method=encoding_method, stream=stream
+            ):
+                batch.append(item)
+                if len(batch) >= batch_size:
+                    results.put(batch)
+                    batch = []
+            if batch:
+                results.put(batch)
+    except Exception as e:
+        results.put(e)
+    finally:
+        # use sentinel pattern
+        results.put(None)
 
 
 class LocalRetriever:
@@ -13,7 +112,10 @@ class LocalRetriever:
         path: str,
         verbose: bool = False,
         encoding_method: str = "utf8",
-        file_type: Literal["json", "zip"] = "json",
+        file_type: Literal["json", "zip", "jsonl.gz"] = "json",
+        workers: int = 1,
+        stream: bool = False,
+        batch_size: int = 1000,
     ):
         """
         Get json data from each file in a folder.
@@ -21,7 +123,13 @@ class LocalRetriever:
         Args:
             path (str): Folder's full path.
             verbose (bool): Add prints.
-            file_type (json \\ zip): Type of files to load.
+            file_type (json \\ zip \\ jsonl.gz): Type of files to load.
+            workers (int): Number of processes decoding files in parallel. With more
+                than one, items are yielded as they are decoded, not in file order.
+            stream (bool): Decode the items of top-level json arrays one at a time,
+                instead of loading whole files into memory. A json file is then
+                yielded item by item rather than as a single list.
+            batch_size (int): Items sent at once from a worker process.
 
         Returns:
             dict: Parsed json data by relevant keys.
@@ -30,23 +138,98 @@ class LocalRetriever:
         if not os.path.exists(path) or not os.path.isdir(path):
             raise ValueError(f"Invalid folder path: {path}")
 
-        for file_name in os.listdir(path):
-            print("Loading file", file_name)
-            if file_name.endswith(f".{file_type}"):
-                file_path = os.path.join(path, file_name)
+        file_paths = [
+            os.path.join(path, file_name)
+            for file_name in sorted(os.listdir(path))
+            if file_name.endswith(f".{file_type}")
+        ]
+        if workers > 1 and len(file_paths) > 1:
+            yield from LocalRetriever.get_data_from_files_parallel(
+                file_paths,
+                file_type,
+                workers=workers,
+                verbose=verbose,
+                encoding_method=encoding_method,
+                stream=stream,
+                batch_size=batch_size,
+            )
+            return
 
-                if file_type == "json":
-                    yield from LocalRetriever.get_data_from_json_file(
-                        file_path, verbose=verbose, encoding_method=encoding_method
-                    )
-                elif file_type == "zip":
-                    yield from LocalRetriever.get_data_from_zip(
-                        file_path, verbose=verbose, encoding_method=encoding_method
-                    )
+        reader = getattr(LocalRetriever, FILE_READERS[file_type])
+        for file_path in file_paths:
+            yield from reader(
+                file_path, verbose=verbose, encoding_method=encoding_method, stream=stream
+            )
+
+    @staticmethod
+    def get_data_from_files_parallel(
+        file_paths: List[str],
+        file_type: Literal["json", "zip", "jsonl.gz"],
+        workers: int,
+        verbose: bool = False,
+        encoding_method: str = "utf8",
+        stream: bool = False,
+        batch_size: int = 1000,
+    ):
+        """
+        Decode files in worker processes and yield their items as they arrive.
+
+        The results queue is bounded, so workers pause when the consumer falls
+        behind. Closing the generator early terminates the workers.
+        """
+        workers = min(workers, len(file_paths))
+        files = multiprocessing.Queue()
+        for file_path in file_paths:
+            files.put(file_path)
+        for _ in range(workers):
+            files.put(None)
+        results = multiprocessing.Queue(maxsize=workers * 2)
+        processes = [
+            multiprocessing.Process(
+                target=_load_files,
+                args=(
+                    file_type,
+                    files,
+                    results,
+                    batch_size,
+                    verbose,
+                    encoding_method,
+                    stream,
+                ),
+                daemon=True,
+            )
+            for _ in range(workers)
+        ]
+        for process in processes:
+            process.start()
+
+        try:
+            finished = 0
+            while finished < workers:
+                try:
+                    batch = results.get(timeout=1)
+                except queue.Empty:
+                    if not any(process.is_alive() for process in processes):
+                        raise RuntimeError("File loader worker exited unexpectedly")
+                    continue
+                if batch is None:
+                    finished += 1
+                elif isinstance(batch, Exception):
+                    raise batch
+                else:
+                    yield from batch
+        finally:
+            for process in processes:
+                if process.is_alive():
+                    process.terminate()
+                process.join()
 
     @staticmethod
     def get_data_from_zip(
-        zip_path: str, verbose: bool = False, encoding_method: str = "utf8"
+        zip_path: str,
+        verbose: bool = False,
+        encoding_method: str = "utf8",
+        stream: bool = False,
     ):
         archive = zipfile.ZipFile(zip_path, "r")
         for name in archive.namelist():
@@ -55,6 +238,11 @@ class LocalRetriever:
                     print("Loading file", name)
                 with archive.open(name) as f:
                     try:
+                        if stream:
+                            yield from iter_json_items(
+                                io.TextIOWrapper(f, encoding=encoding_method)
+                            )
+                            continue
                         content = json.load(f)
                         if isinstance(content, list):
                             for item in content:
@@ -66,8 +254,12 @@ class LocalRetriever:
 
     @staticmethod
     def get_data_from_gz(
-        gz_path: str, verbose: bool = False, encoding_method: str = "utf8"
+        gz_path: str,
+        verbose: bool = False,
+        encoding_method: str = "utf8",
+        stream: bool = True,
     ):
+        # jsonl is always read line by line, stream is accepted for a uniform signature
         with gzip.open(gz_path, "rt", encoding=encoding_method) as f:
             if verbose:
                 print(f"Loading file {gz_path}")
@@ -79,14 +271,19 @@ class LocalRetriever:
 
     @staticmethod
     def get_data_from_json_file(
-        file_path: str, verbose: bool = False, encoding_method: str = "utf8"
+        file_path: str,
+        verbose: bool = False,
+        encoding_method: str = "utf8",
+        stream: bool = False,
     ):
         with open(file_path, "r", encoding=encoding_method) as f:
             if verbose:
                 print(f"Loading file {file_path}")
             try:
-                content = json.load(f)
-                yield content
+                if stream:
+                    yield from iter_json_items(f)
+                else:
+                    yield json.load(f)
             except JSONDecodeError:
                 print(f"Error loading {file_path} - JSONDecode")
 
@@ -0,0 +1,140 @@
+import json
+import mmap
+import os
+from array import array
+from pathlib import Path
+from typing import Dict, Optional
+
+import numpy
+
+DOCUMENTS_FILE = "documents.jsonl"
+OFFSETS_FILE = "offsets.npy"
+VECTORS_FILE = "vectors.f32"
+
+
+class LocalDocumentStore:
+    """
+    Append-only JSONL document store addressed by position.
+
+    Documents are written one per line next to a table of byte offsets. Once
+    committed, the documents file is memory-mapped and documents are decoded
+    lazily by offset, so processes that open the same store share the OS page
+    cache instead of each holding a copy of every document on the heap.
+
+    Full-precision float32 vectors can be stored alongside, one row per
+    document, and are memory-mapped as the (n, dim) `vectors` matrix.
+    """
+
+    def __init__(self, path: str):
+        self.path = Path(path)
+        self.offsets = None
+        self._fd = None
+        self._mmap = None
+        self._writer = None
+        self._pending_offsets: Optional[array] = None
+        self.vectors: Optional[numpy.ndarray] = None
+        self._vector_writer = None
+
+    def __len__(self) -> int:
+        if self._pending_offsets is not None:
+            return len(self._pending_offsets) - 1
+        return len(self.offsets) - 1 if self.offsets is not None else 0
+
+    def exists(self) -> bool:
+        return (self.path / OFFSETS_FILE).exists()
+
+    def append(self, doc: Dict) -> int:
+        """
+        Append a document to the store. It becomes readable after commit().
+
+        Returns:
+            int: The position of the document in the store.
+        """
+        if self._writer is None:
+            self.path.mkdir(parents=True, exist_ok=True)
+            self._writer = open(self.path / DOCUMENTS_FILE, "ab")
+            self._pending_offsets = array(
+                "q",
+                self.offsets.tobytes() if self.offsets is not None else [0],
+            )
+        self._writer.write(json.dumps(doc).encode("utf-8") + b"\n")
+        self._pending_offsets.append(self._writer.tell())
+        return len(self._pending_offsets) - 2
+
+    def append_vectors(self, vectors_array: numpy.ndarray):
+        """Append the vectors of the documents appended last. Readable after commit()."""
+        if self._vector_writer is None:
+            self.path.mkdir(parents=True, exist_ok=True)
+            self._vector_writer = open(self.path / VECTORS_FILE, "ab")
+        self._vector_writer.write(
+            numpy.ascontiguousarray(vectors_array, dtype=numpy.float32).tobytes()
+        )
+
+    def commit(self):
+        """Flush pending documents, persist the offsets table and map the store."""
+        if self._vector_writer is not None:
+            self._vector_writer.close()
+            self._vector_writer = None
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+            self._save_offsets(
+                numpy.frombuffer(self._pending_offsets, dtype=numpy.int64)
+            )
+            self._pending_offsets = None
+        elif not self.exists():
+            self.path.mkdir(parents=True, exist_ok=True)
+            (self.path / DOCUMENTS_FILE).touch()
+            self._save_offsets(numpy.zeros(1, dtype=numpy.int64))
+        self.open()
+
+    def _save_offsets(self, offsets: numpy.ndarray):
+        # replace rather than overwrite, the current table may still be mapped
+        tmp_file = self.path / f"{OFFSETS_FILE}.tmp"
+        with open(tmp_file, "wb") as f:
+            numpy.save(f, offsets)
+        os.replace(tmp_file, self.path / OFFSETS_FILE)
+
+    def open(self) -> bool:
+        """
+        Map an existing store.
+
+        Returns:
+            bool: False if nothing was committed at this path.
+        """
+        if not self.exists():
+            return False
+        self._unmap()
+        self.offsets = numpy.load(self.path / OFFSETS_FILE, mmap_mode="r")
+        self._fd = os.open(self.path / DOCUMENTS_FILE, os.O_RDONLY)
+        if self.offsets[-1] > 0:
+            self._mmap = mmap.mmap(self._fd, 0, access=mmap.ACCESS_READ)
+        vectors_file = self.path / VECTORS_FILE
+        if len(self) > 0 and vectors_file.exists() and vectors_file.stat().st_size > 0:
+            self.vectors = numpy.memmap(vectors_file, dtype=numpy.float32, mode="r")
+            self.vectors = self.vectors.reshape(len(self), -1)
+        return True
+
+    def get(self, i: int) -> Dict:
+        start, end = int(self.offsets[i]), int(self.offsets[i + 1])
+        return json.loads(self._mmap[start:end])
+
+    def _unmap(self):
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+        self.offsets = None
+        self.vectors = None
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+            self._pending_offsets = None
+        if self._vector_writer is not None:
+            self._vector_writer.close()
+            self._vector_writer = None
+        self._unmap()
@@ -1,57 +1,569 @@
 import gzip
+import hashlib
 import json
+import logging
+import os
+import shutil
+import tempfile
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple, Union
 
 import faiss
 import numpy
 
+from shraga_common.models import RetrievalResult
+
 from .base_search_retriever import BaseSearchRetriever
+from .local_document_store import (
+    DOCUMENTS_FILE,
+    OFFSETS_FILE,
+    VECTORS_FILE,
+    LocalDocumentStore,
+)
+from .local_sharded_index import ShardedIndex
+from .mmr import DEFAULT_LAMBDA, hit_to_retrieval_result, maximal_marginal_relevance
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_VERSION = 5
+SNAPSHOT_INDEX_FILE = "index.faiss"
+SNAPSHOT_ANN_INDEX_FILE = "index_ann.faiss"
+
+# vector storage: (scalar quantizer of the exact index, index factory encoding)
+STORAGE_TYPES = {
+    "float32": (None, "Flat"),
+    "float16": (faiss.ScalarQuantizer.QT_fp16, "SQfp16"),
+    "int8": (faiss.ScalarQuantizer.QT_8bit, "SQ8"),
+}
 
 
 class LocalKnnRetriever(BaseSearchRetriever):
     """
     FaissRetriever class for querying vectors using cosine similarity with Faiss.
     Supports exact and approximate nearest neighbor (ANN) search.
+
+    The ANN index is described by a Faiss index factory string, e.g.
+    "IVF100,Flat" (the default), "HNSW32", "IVF1024,PQ64" or "IVF1024,SQ8".
+    Use "Flat" to build the exact index only, or exact_index=False to build the
+    ANN index only; searches fall back to whichever index was built.
+
+    Vectors are indexed with their document position as id (through IndexIDMap2
+    unless the index is IVF, which keeps ids natively), so documents can be added
+    and removed without a full reload. The ANN index is
+    retrained once the share of vectors added or removed since it was trained
+    exceeds retrain_threshold.
+
+    With shards > 1 each index is partitioned by id into that many sub-indexes,
+    searched in parallel on a pool of search_threads threads and merged into the
+    global top k. omp_threads sets the process-wide Faiss OpenMP thread count;
+    when sharding, 1 avoids oversubscribing the cores the pool already uses.
+
+    storage="float16" or "int8" keeps the vectors scalar-quantized (int8 with a
+    per-dimension range learned from the data), 2x or 4x smaller than float32.
+    It applies to the exact index and to the default ANN index. With
+    rescore_factor set, searches fetch top_k * rescore_factor candidates and
+    rank them by their full-precision vectors, which are stored memory-mapped
+    next to the documents rather than held in memory.
     """
 
-    def __init__(self, nlist: int = 100, nprobe: int = 10):
+    def __init__(
+        self,
+        nlist: int = 100,
+        nprobe: int = 10,
+        index_factory: Optional[str] = None,
+        exact_index: bool = True,
+        ef_search: int = 64,
+        train_size: int = 100_000,
+        retrain_threshold: float = 0.2,
+        shards: int = 1,
+        search_threads: Optional[int] = None,
+        omp_threads: Optional[int] = None,
+        storage: str = "float32",
+        rescore_factor: Optional[int] = None,
+    ):
+        super().__init__()
+        if storage not in STORAGE_TYPES:
+            raise ValueError(f"storage must be one of {', '.join(STORAGE_TYPES)}")
         self.index = None
-        self.index_ivf = None
-        self.vectors = []
-        self.jsons = []
+        self.index_ann = None
+        self.documents: Optional[LocalDocumentStore] = None
         self.nlist = nlist
         self.nprobe = nprobe
+        self.storage = storage
+        self.rescore_factor = rescore_factor
+        self.index_factory = index_factory or f"IVF{nlist},{STORAGE_TYPES[storage][1]}"
+        self.exact_index = exact_index
+        self.ef_search = ef_search
+        self.train_size = train_size
+        self.retrain_threshold = retrain_threshold
+        self.shards = shards
+        self.executor = (
+            ThreadPoolExecutor(
+                max_workers=search_threads or shards, thread_name_prefix="shraga-knn"
+            )
+            if shards > 1
+            else None
+        )
+        self._trained_count = 0
+        self._changed_count = 0
+        self._owns_documents_dir = False
+
+        if not exact_index and self.index_factory == "Flat":
+            raise ValueError("index_factory 'Flat' requires exact_index")
+        if shards < 1:
+            raise ValueError("shards must be at least 1")
+        if omp_threads:
+            faiss.omp_set_num_threads(omp_threads)
 
-    def load_data(self, folder_path: str, vector_field: str):
+    def load_data(
+        self,
+        folder_path: str,
+        vector_field: str,
+        snapshot_dir: Optional[str] = None,
+        chunk_size: int = 10_000,
+        workers: int = 1,
+    ):
         """
         Load vector data from JSONL.GZ files in a specified folder.
 
+        Files are streamed in chunks of chunk_size vectors that are written to the
+        document store and added to the indexes as they are read, so peak memory
+        stays close to the size of the final indexes. An untrained ANN index is
+        trained on the first train_size vectors before anything is added to it.
+
         Args:
             folder_path (str): Path to the folder containing JSONL.GZ files.
             vector_field (str): The key in the JSON containing vector data.
+            snapshot_dir (Optional[str]): If set, the trained indexes and the documents
+                are persisted under this folder, keyed by a hash of the source files.
+                Later loads of the same files restore the snapshot instead of
+                re-parsing and re-training, and workers loading the same snapshot
+                share its memory-mapped documents.
+            chunk_size (int): Number of vectors decoded and indexed at a time.
+            workers (int): Number of files decoded in parallel threads. Each thread
+                holds at most one file worth of chunks.
+        """
+        files = sorted(Path(folder_path).glob("*.jsonl.gz"))
+        self.close_documents()
+        self.index = None
+        self.index_ann = None
+
+        snapshot_path = None
+        if snapshot_dir:
+            snapshot_path = Path(snapshot_dir) / self.snapshot_key(files, vector_field)
+            if self.load_snapshot(snapshot_path):
+                return
+            snapshot_path.parent.mkdir(parents=True, exist_ok=True)
+            documents_dir = tempfile.mkdtemp(dir=snapshot_path.parent)
+        else:
+            documents_dir = tempfile.mkdtemp(prefix="shraga-knn-")
+            self._owns_documents_dir = True
+
+        self.documents = LocalDocumentStore(documents_dir)
+        untrained = []
+        untrained_count = 0
+        added_count = 0
+        for docs, vectors_array in self.iter_chunks(
+            files, vector_field, chunk_size, workers
+        ):
+            for doc in docs:
+                self.documents.append(doc)
+            self.normalize_vectors(vectors_array, vectors_array.shape[1])
+            if self.rescore_factor:
+                self.documents.append_vectors(vectors_array)
+            if self.index is None and self.index_ann is None:
+                self.create_indexes(vectors_array.shape[1])
+
+            if not self.is_trained():
+                # hold back chunks until there is enough data to train on
+                untrained.append(vectors_array)
+                untrained_count += len(vectors_array)
+                if untrained_count >= self.train_size:
+                    self.add_vectors(
+                        numpy.concatenate(untrained),
+                        numpy.arange(added_count, added_count + untrained_count),
+                    )
+                    added_count += untrained_count
+                    untrained = []
+                continue
+            self.add_vectors(
+                vectors_array,
+                numpy.arange(added_count, added_count + len(vectors_array)),
+            )
+            added_count += len(vectors_array)
+
+        if untrained:
+            self.add_vectors(
+                numpy.concatenate(untrained),
+                numpy.arange(added_count, added_count + untrained_count),
+            )
+        self.documents.commit()
+        self._reset_drift()
+
+        if snapshot_path:
+            self.save_snapshot(snapshot_path)
+
+    def iter_chunks(
+        self, files: List[Path], vector_field: str, chunk_size: int, workers: int = 1
+    ) -> Iterator[Tuple[List[Dict], numpy.ndarray]]:
+        """
+        Yield (documents, float32 vectors) chunks from the files, in file order.
+        With several workers, up to `workers` files are decoded ahead in threads.
+        """
+        if workers <= 1:
+            for file in files:
+                yield from self.read_chunks(file, vector_field, chunk_size)
+            return
+
+        def read_file(file):
+            return list(self.read_chunks(file, vector_field, chunk_size))
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            pending = deque()
+            for file in files:
+                pending.append(executor.submit(read_file, file))
+                if len(pending) >= workers:
+                    yield from pending.popleft().result()
+            while pending:
+                yield from pending.popleft().result()
+
+    @staticmethod
+    def read_chunks(
+        file: Path, vector_field: str, chunk_size: int
+    ) -> Iterator[Tuple[List[Dict], numpy.ndarray]]:
+        """Decode a JSONL.GZ file into chunks of documents and a float32 vector block."""
+        docs = []
+        block = None
+        with gzip.open(file, "rt", encoding="utf-8") as f:
+            for line in f:
+                json_line = json.loads(line.strip())
+                if vector_field not in json_line:
+                    continue
+                vector = json_line.pop(vector_field)
+                if block is None:
+                    block = numpy.empty((chunk_size, len(vector)), dtype=numpy.float32)
+                block[len(docs)] = vector
+                docs.append(json_line)
+                if len(docs) == chunk_size:
+                    yield docs, block
+                    docs = []
+                    block = numpy.empty_like(block)
+        if docs:
+            yield docs, block[: len(docs)]
+
+    def create_indexes(self, dim: int):
+        """
+        Create the configured, still empty, indexes.
+        Only the indexes that are going to be searched are created.
+        """
+        self.index = None
+        if self.exact_index:
+            self.index = self.shard_index(
+                lambda: faiss.IndexIDMap2(self.create_exact_shard(dim))
+            )
+        self.index_ann = None
+        if self.index_factory != "Flat":
+            self.index_ann = self.create_ann_index(dim)
+
+    def create_ann_index(self, dim: int):
+        return self.shard_index(lambda: self.create_ann_shard(dim))
+
+    def create_exact_shard(self, dim: int):
+        quantizer_type = STORAGE_TYPES[self.storage][0]
+        if quantizer_type is None:
+            return faiss.IndexFlatIP(dim)
+        return faiss.IndexScalarQuantizer(dim, quantizer_type, faiss.METRIC_INNER_PRODUCT)
+
+    def is_trained(self) -> bool:
+        return all(
+            index.is_trained for index in (self.index, self.index_ann) if index is not None
+        )
+
+    def shard_index(self, create_index):
+        """Create one index, or a ShardedIndex of shards indexes when sharding."""
+        if self.shards == 1:
+            return create_index()
+        return ShardedIndex([create_index() for _ in range(self.shards)], self.executor)
+
+    def create_ann_shard(self, dim: int):
+        index = faiss.index_factory(dim, self.index_factory, faiss.METRIC_INNER_PRODUCT)
+        try:
+            # IVF indexes store and remove external ids natively
+            faiss.extract_index_ivf(index)
+            return index
+        except RuntimeError:
+            return faiss.IndexIDMap2(index)
+
+    def add_vectors(self, vectors_array: numpy.ndarray, ids: numpy.ndarray):
+        """
+        Add normalized float32 vectors with their document positions as ids,
+        training the indexes on them first if they are not trained yet.
+        """
+        ids = numpy.asarray(ids, dtype=numpy.int64)
+        for index in (self.index_ann, self.index):
+            if index is None:
+                continue
+            if not index.is_trained:
+                index.train(vectors_array)
+            index.add_with_ids(vectors_array, ids)
+
+    def add_documents(self, docs: List[Dict], vector_field: str) -> List[int]:
+        """
+        Add documents to a loaded retriever without rebuilding the indexes.
+        A restored snapshot is never modified: its documents are first copied to a
+        private store, and the changes only live in this retriever.
+
+        Args:
+            docs (List[Dict]): Documents, each holding its vector under vector_field.
+            vector_field (str): The key in the documents containing vector data.
+
+        Returns:
+            List[int]: The ids assigned to the documents, usable with remove_ids.
+        """
+        if not docs:
+            return []
+        if self.documents is None:
+            self.documents = LocalDocumentStore(tempfile.mkdtemp(prefix="shraga-knn-"))
+            self._owns_documents_dir = True
+        else:
+            self.own_documents()
+
+        vectors = []
+        for doc in docs:
+            if vector_field not in doc:
+                raise ValueError(f"Document is missing vector field '{vector_field}'")
+            vectors.append(doc[vector_field])
+        vectors_array = numpy.array(vectors, dtype=numpy.float32)
+        self.normalize_vectors(vectors_array, vectors_array.shape[1])
+
+        ids = []
+        for doc in docs:
+            doc = {k: v for k, v in doc.items() if k != vector_field}
+            ids.append(self.documents.append(doc))
+        if self.rescore_factor:
+            self.documents.append_vectors(vectors_array)
+        self.documents.commit()
+
+        if self.index is None and self.index_ann is None:
+            self.create_indexes(vectors_array.shape[1])
+            self.add_vectors(vectors_array, ids)
+            self._reset_drift()
+            return ids
+
+        self.add_vectors(vectors_array, ids)
+        self._changed_count += len(ids)
+        self.maybe_retrain()
+        return ids
+
+    def own_documents(self):
+        """
+        Copy the documents of a shared snapshot to a private store before they are
+        modified, so snapshots stay read-only for every worker loading them.
+        """
+        if self.documents is None or self._owns_documents_dir:
+            return
+        private_path = Path(tempfile.mkdtemp(prefix="shraga-knn-"))
+        for name in (DOCUMENTS_FILE, OFFSETS_FILE, VECTORS_FILE):
+            if (self.documents.path / name).exists():
+                shutil.copyfile(self.documents.path / name, private_path / name)
+        self.documents.close()
+        self.documents = LocalDocumentStore(private_path)
+        self.documents.open()
+        self._owns_documents_dir = True
+
+    def remove_ids(self, ids: List[int]) -> int:
+        """
+        Remove documents from the indexes. Their entries stay in the document
+        store but are no longer returned by searches. Removals from a restored
+        snapshot are not written back to it.
+
+        Returns:
+            int: The number of vectors removed from the search index.
+        """
+        selector = faiss.IDSelectorBatch(numpy.asarray(ids, dtype=numpy.int64))
+        removed = 0
+        if self.index_ann is not None:
+            if hasattr(self._unwrap(self.index_ann), "hnsw"):
+                raise ValueError(
+                    f"Index '{self.index_factory}' does not support removing vectors"
+                )
+            removed = self.index_ann.remove_ids(selector)
+        if self.index is not None:
+            removed = self.index.remove_ids(selector)
+        self._changed_count += removed
+        self.maybe_retrain()
+        return removed
+
+    def maybe_retrain(self) -> bool:
         """
-        files = Path(folder_path).glob("*.jsonl.gz")
+        Retrain the ANN index from the exact index once the share of vectors
+        changed since the last training crosses retrain_threshold.
+
+        Returns:
+            bool: True if the ANN index was retrained.
+        """
+        if self.index_ann is None or not self.index_ann.is_trained:
+            return False
+        if self._changed_count <= self.retrain_threshold * max(self._trained_count, 1):
+            return False
+        if not self._is_ivf(self.index_ann):
+            # only IVF quantizers depend on the data they were trained on
+            return False
+        if self.index is None:
+            logger.warning(
+                "ANN index drifted past the retrain threshold but cannot be "
+                "retrained without the exact index"
+            )
+            return False
+
+        vectors_array, ids = self._reconstruct_all(self.index)
+        full_vectors = self.get_full_vectors()
+        if full_vectors is not None:
+            # train on the original vectors rather than their quantized copies
+            vectors_array = numpy.asarray(full_vectors[ids])
+        index_ann = self.create_ann_index(vectors_array.shape[1])
+        if not index_ann.is_trained:
+            sample = vectors_array
+            if len(sample) > self.train_size:
+                rng = numpy.random.default_rng(0)
+                sample = sample[rng.choice(len(sample), self.train_size, replace=False)]
+            index_ann.train(sample)
+        index_ann.add_with_ids(vectors_array, ids)
+        self.index_ann = index_ann
+        self._reset_drift()
+        return True
+
+    def _reset_drift(self):
+        self._trained_count = self.index_ann.ntotal if self.index_ann is not None else 0
+        self._changed_count = 0
+
+    @staticmethod
+    def _reconstruct_all(index) -> Tuple[numpy.ndarray, numpy.ndarray]:
+        """The vectors and ids stored in an exact (IndexIDMap2) index."""
+        if isinstance(index, ShardedIndex):
+            parts = [LocalKnnRetriever._reconstruct_all(shard) for shard in index.shards]
+            return (
+                numpy.concatenate([vectors for vectors, _ids in parts]),
+                numpy.concatenate([ids for _vectors, ids in parts]),
+            )
+        base = faiss.downcast_index(index.index)
+        return base.reconstruct_n(0, base.ntotal), faiss.vector_to_array(index.id_map)
+
+    @staticmethod
+    def _is_ivf(index) -> bool:
+        if isinstance(index, ShardedIndex):
+            index = index.shards[0]
+        try:
+            faiss.extract_index_ivf(index)
+            return True
+        except RuntimeError:
+            return False
+
+    @staticmethod
+    def _unwrap(index):
+        if isinstance(index, ShardedIndex):
+            index = index.shards[0]
+        if isinstance(index, faiss.IndexIDMap):
+            return faiss.downcast_index(index.index)
+        return index
+
+    def snapshot_key(self, files: List[Path], vector_field: str) -> str:
+        """
+        Hash the source files (name, size and modification time) together with the
+        settings that affect the built indexes.
+        """
+        h = hashlib.sha256()
+        h.update(
+            f"v{SNAPSHOT_VERSION}|{vector_field}|{self.index_factory}|"
+            f"{self.exact_index}|{self.train_size}|{self.shards}|{self.storage}|"
+            f"{bool(self.rescore_factor)}".encode("utf-8")
+        )
         for file in files:
-            with gzip.open(file, "rt", encoding="utf-8") as f:
-                for line in f:
-                    json_line = json.loads(line.strip())
-                    if vector_field in json_line:
-                        vector = json_line[vector_field]
-                        self.vectors.append(vector)
-                        self.jsons.append(json_line)
-
-        if self.vectors:
-            vectors_array = faiss.vector_to_array(self.vectors)
-            dim = len(self.vectors[0])
-            self.normalize_vectors(vectors_array, dim)
-
-            self.index = faiss.IndexFlatIP(dim)
-            quantizer = faiss.IndexFlatIP(dim)
-            self.index_ivf = faiss.IndexIVFFlat(quantizer, dim, self.nlist)
-            self.index_ivf.train(vectors_array)
-            self.index_ivf.add(vectors_array)
-            self.index.add(vectors_array)
+            stat = file.stat()
+            h.update(f"|{file.name}:{stat.st_size}:{stat.st_mtime_ns}".encode("utf-8"))
+        return h.hexdigest()
+
+    def save_snapshot(self, snapshot_path: Path):
+        """
+        Write the indexes next to the document store and move the folder to
+        snapshot_path. The store is built in a temporary folder and only renamed
+        once complete, so concurrent workers never see a partial snapshot.
+        """
+        snapshot_path = Path(snapshot_path)
+        tmp_path = self.documents.path
+        if self.index is not None:
+            self.write_index(self.index, tmp_path / SNAPSHOT_INDEX_FILE)
+        if self.index_ann is not None:
+            self.write_index(self.index_ann, tmp_path / SNAPSHOT_ANN_INDEX_FILE)
+        self.documents.close()
+        try:
+            os.rename(tmp_path, snapshot_path)
+        except OSError:
+            # another worker may have written the same snapshot in the meantime
+            shutil.rmtree(tmp_path, ignore_errors=True)
+            if not snapshot_path.exists():
+                raise
+        self.documents = LocalDocumentStore(snapshot_path)
+        self.documents.open()
+
+    def load_snapshot(self, snapshot_path: Path) -> bool:
+        """
+        Restore the indexes from snapshot_path. Documents are not decoded up front,
+        they are read from the memory-mapped store when a search returns them.
+
+        Returns:
+            bool: False if there is no snapshot at snapshot_path.
+        """
+        documents = LocalDocumentStore(snapshot_path)
+        if not documents.exists():
+            return False
+
+        self.close_documents()
+        documents.open()
+        self.documents = documents
+        self.index = self.read_index(documents.path / SNAPSHOT_INDEX_FILE)
+        self.index_ann = self.read_index(documents.path / SNAPSHOT_ANN_INDEX_FILE)
+        self._reset_drift()
+        return True
+
+    @staticmethod
+    def write_index(index, path: Path):
+        """Write an index to path, or each shard of a ShardedIndex to path.<shard>."""
+        if isinstance(index, ShardedIndex):
+            for i, shard in enumerate(index.shards):
+                faiss.write_index(shard, f"{path}.{i}")
+        else:
+            faiss.write_index(index, str(path))
+
+    def read_index(self, path: Path):
+        """Read an index written by write_index, None if there is none."""
+        if self.shards == 1:
+            return faiss.read_index(str(path)) if path.exists() else None
+        shard_paths = [Path(f"{path}.{i}") for i in range(self.shards)]
+        if not shard_paths[0].exists():
+            return None
+        return ShardedIndex(
+            [faiss.read_index(str(shard_path)) for shard_path in shard_paths],
+            self.executor,
+        )
+
+    def close(self):
+        """Release the document store and stop the shard search threads."""
+        self.close_documents()
+        if self.executor is not None:
+            self.executor.shutdown(wait=True)
+            self.executor = None
+
+    def close_documents(self):
+        """Unmap the document store and remove it if it is not a snapshot."""
+        if self.documents is not None:
+            self.documents.close()
+            if self._owns_documents_dir:
+                shutil.rmtree(self.documents.path, ignore_errors=True)
+        self.documents = None
+        self._owns_documents_dir = False
 
     def normalize_vectors(self, vectors_array, dim):
         """Normalize vectors to unit length for cosine similarity computation"""
@@ -71,22 +583,178 @@ class LocalKnnRetriever(BaseSearchRetriever):
         Returns:
             List[Dict]: List of matching json objects.
         """
-        dim = len(query_vector)
-        faiss.normalize_L2(numpy.array(query_vector))
+        return self.knn_search_batch([query_vector], top_k, use_ann)[0]
 
-        if use_ann:
-            assert self.index_ivf.is_trained, "IVF index not trained."
-            self.index_ivf.nprobe = self.nprobe
-            distances, indices = self.index_ivf.search(
-                numpy.array([query_vector]), top_k
-            )
+    def knn_search_batch(
+        self,
+        query_vectors: Union[List[List[float]], numpy.ndarray],
+        top_k: int,
+        use_ann: Optional[bool] = False,
+    ) -> List[List[Dict]]:
+        """
+        Perform KNN search for several queries with a single index call.
+
+        Args:
+            query_vectors (Union[List[List[float]], numpy.ndarray]): (n, dim) matrix of query vectors.
+            top_k (int): Number of top results to return per query.
+            use_ann (Optional[bool]): If True, use ANN search; otherwise, use exact search.
+
+        Returns:
+            List[List[Dict]]: Matching json objects for each query, in query order.
+        """
+        # always copy, normalize_L2 works in place
+        query_array = numpy.array(query_vectors, dtype=numpy.float32, ndmin=2)
+        if query_array.size == 0:
+            return []
+        faiss.normalize_L2(query_array)
+
+        distances, indices = self.search_vectors(query_array, top_k, use_ann)
+        return [[self.documents.get(i) for i in row if i != -1] for row in indices]
+
+    def search_vectors(
+        self, query_array: numpy.ndarray, top_k: int, use_ann: Optional[bool] = False
+    ) -> Tuple[numpy.ndarray, numpy.ndarray]:
+        """
+        Search the indexes with a matrix of normalized float32 query vectors.
+
+        Returns:
+            Tuple[numpy.ndarray, numpy.ndarray]: (n, top_k) similarities and document
+                positions, -1 where there are fewer than top_k results.
+        """
+        if (use_ann and self.index_ann is not None) or self.index is None:
+            index = self.index_ann
+            assert index.is_trained, "ANN index not trained."
+            self.configure_ann_search(index)
         else:
-            distances, indices = self.index.search(numpy.array([query_vector]), top_k)
+            index = self.index
+        if not self.rescore_factor:
+            return index.search(query_array, top_k)
+        distances, ids = index.search(query_array, top_k * self.rescore_factor)
+        return self.rescore(query_array, distances, ids, top_k)
+
+    def get_full_vectors(self) -> Optional[numpy.ndarray]:
+        """The full-precision vectors by document position, if they are kept."""
+        return self.documents.vectors if self.documents is not None else None
+
+    def get_vectors(self, ids: numpy.ndarray) -> numpy.ndarray:
+        """
+        The vectors of documents, full-precision when they are kept, otherwise
+        reconstructed from the exact index, or the ANN index without it.
+        """
+        full_vectors = self.get_full_vectors()
+        if full_vectors is not None:
+            return numpy.asarray(full_vectors[ids])
+        index = self.index if self.index is not None else self.index_ann
+        try:
+            return numpy.stack([index.reconstruct(int(i)) for i in ids])
+        except RuntimeError as e:
+            raise ValueError(
+                f"Cannot read vectors back from index '{self.index_factory}', "
+                "keep the exact index or set rescore_factor"
+            ) from e
 
-        return [self.jsons[i] for i in indices[0] if i != -1]
+    def rescore(
+        self,
+        query_array: numpy.ndarray,
+        distances: numpy.ndarray,
+        ids: numpy.ndarray,
+        top_k: int,
+    ) -> Tuple[numpy.ndarray, numpy.ndarray]:
+        """Rank candidate ids by the similarity of their full-precision vectors."""
+        vectors = self.get_full_vectors()
+        if vectors is None:
+            return distances[:, :top_k], ids[:, :top_k]
+        found = ids != -1
+        candidates = numpy.asarray(vectors[numpy.where(found, ids, 0)])
+        scores = numpy.einsum("qcd,qd->qc", candidates, query_array)
+        scores[~found] = -numpy.inf
+        order = numpy.argsort(-scores, axis=1, kind="stable")[:, :top_k]
+        return (
+            numpy.take_along_axis(scores, order, axis=1),
+            numpy.take_along_axis(ids, order, axis=1),
+        )
+
+    def configure_ann_search(self, index):
+        """Apply the query-time parameters of IVF (nprobe) and HNSW (efSearch) indexes."""
+        if isinstance(index, ShardedIndex):
+            for shard in index.shards:
+                self.configure_ann_search(shard)
+            return
+        try:
+            faiss.extract_index_ivf(index).nprobe = self.nprobe
+        except RuntimeError:
+            pass
+        hnsw = getattr(self._unwrap(faiss.downcast_index(index)), "hnsw", None)
+        if hnsw is not None:
+            hnsw.efSearch = self.ef_search
+
+    @staticmethod
+    def get_client(shraga_config, extra_configs):
+        return None
+
+    async def get_indices_list(self):
+        return []
+
+    async def execute_vector_search(
+        self,
+        field_name: str,
+        query_vector: List[float],
+        k: int = 10,
+        index_name: Optional[str] = None,
+    ) -> List[Dict]:
+        return self.knn_search(query_vector, k)
+
+    async def execute_text_search(
+        self, text: str, k: int = 10, index_name: Optional[str] = None
+    ) -> List[Dict]:
+        raise NotImplementedError("LocalKnnRetriever only supports vector search")
+
+    async def execute_hybrid_search(
+        self,
+        text: str,
+        query_vector: List[float],
+        k: int = 10,
+        weights: Optional[Sequence[float]] = None,
+        **kwargs,
+    ) -> List[Dict]:
+        raise NotImplementedError("LocalKnnRetriever only supports vector search")
+
+    async def execute_mmr_search(
+        self,
+        field_name: str,
+        query_vector: List[float],
+        k: int = 10,
+        fetch_k: int = 50,
+        lambda_mult: float = DEFAULT_LAMBDA,
+        index_name: Optional[str] = None,
+    ) -> List[RetrievalResult]:
+        """
+        Vector search for fetch_k candidates, diversified down to k results with
+        maximal marginal relevance. Documents are stored without their vectors,
+        so the candidate vectors are read back with get_vectors.
+        """
+        query_array = numpy.array(query_vector, dtype=numpy.float32, ndmin=2)
+        faiss.normalize_L2(query_array)
+        _distances, ids = self.search_vectors(query_array, max(fetch_k, k))
+        ids = ids[0][ids[0] != -1]
+        if len(ids) == 0:
+            return []
+        selected = maximal_marginal_relevance(
+            query_array[0], self.get_vectors(ids), k, lambda_mult
+        )
+        return [hit_to_retrieval_result(self.documents.get(int(ids[i]))) for i in selected]
+
+    def execute_with_timeout(self, body: dict, index_name: str, timeout):
+        raise NotImplementedError("LocalKnnRetriever does not support raw queries")
+
+    async def execute_raw_search(
+        self, raw_query: dict, index_name: Optional[str] = None
+    ) -> List[Dict]:
+        raise NotImplementedError("LocalKnnRetriever does not support raw queries")
 
 
 # Usage
 # knn_retriever = LocalKnnRetriever()
-# knn_retriever.load_data("path_to_data_folder", "vector_field_name")
+# knn_retriever.load_data("path_to_data_folder", "vector_field_name", snapshot_dir="path_to_snapshots")
 # results = knn_retriever.knn_search(query_vector=[0.1, 0.2, 0.3], top_k=5, use_ann=True)
+# batch_results = knn_retriever.knn_search_batch([[0.1, 0.2, 0.3], [0.3, 0.2, 0.1]], top_k=5)
@@ -0,0 +1,88 @@
+import heapq
+from concurrent.futures import Executor
+from itertools import islice
+from typing import List, Optional, Sequence, Tuple
+
+import faiss
+import numpy
+
+
+def merge_top_k(
+    results: Sequence[Tuple[numpy.ndarray, numpy.ndarray]], top_k: int
+) -> Tuple[numpy.ndarray, numpy.ndarray]:
+    """
+    Merge the (similarities, ids) results of several shards into the global top_k.
+    Each shard row is sorted best first, so a heap merge of the rows stops after
+    top_k entries instead of sorting every candidate.
+    """
+    n_queries = results[0][0].shape[0]
+    distances = numpy.full((n_queries, top_k), -numpy.inf, dtype=numpy.float32)
+    ids = numpy.full((n_queries, top_k), -1, dtype=numpy.int64)
+    for q in range(n_queries):
+        rows = [zip(shard_distances[q], shard_ids[q]) for shard_distances, shard_ids in results]
+        merged = heapq.merge(*rows, key=lambda pair: -pair[0])
+        found = (pair for pair in merged if pair[1] != -1)
+        for j, (distance, doc_id) in enumerate(islice(found, top_k)):
+            distances[q, j] = distance
+            ids[q, j] = doc_id
+    return distances, ids
+
+
+class ShardedIndex:
+    """
+    A Faiss index partitioned by id (id % number of shards) into sub-indexes that
+    are searched in parallel on a thread pool. Faiss releases the GIL while
+    searching, so the shards run on separate cores.
+
+    Implements the part of the Faiss index interface that LocalKnnRetriever uses.
+    """
+
+    def __init__(self, shards: List, executor: Optional[Executor] = None):
+        self.shards = shards
+        self.executor = executor
+
+    @property
+    def ntotal(self) -> int:
+        return sum(shard.ntotal for shard in self.shards)
+
+    @property
+    def is_trained(self) -> bool:
+        return all(shard.is_trained for shard in self.shards)
+
+    def train(self, vectors_array: numpy.ndarray):
+        """
+        Train the first shard and copy it to the empty shards, so that every shard
+        shares the same quantizer instead of each training on a fraction of the data.
+        """
+        self.shards[0].train(vectors_array)
+        for i in range(1, len(self.shards)):
+            if self.shards[i].ntotal == 0:
+                self.shards[i] = faiss.clone_index(self.shards[0])
+            else:
+                self.shards[i].train(vectors_array)
+
+    def add_with_ids(self, vectors_array: numpy.ndarray, ids: numpy.ndarray):
+        ids = numpy.asarray(ids, dtype=numpy.int64)
+        shard_of = ids % len(self.shards)
+        for i, shard in enumerate(self.shards):
+            mask = shard_of == i
+            if mask.any():
+                shard.add_with_ids(vectors_array[mask], ids[mask])
+
+    def remove_ids(self, selector) -> int:
+        return sum(shard.remove_ids(selector) for shard in self.shards)
+
+    def reconstruct(self, key: int) -> numpy.ndarray:
+        return self.shards[key % len(self.shards)].reconstruct(key)
+
+    def search(
+        self, query_array: numpy.ndarray, top_k: int
+    ) -> Tuple[numpy.ndarray, numpy.ndarray]:
+        def search_shard(shard):
+            return shard.search(query_array, top_k)
+
+        if self.executor is None:
+            results = [search_shard(shard) for shard in self.shards]
+        else:
+            results = list(self.executor.map(search_shard, self.shards))
+        return merge_top_k(results, top_k)
@@ -0,0 +1,115 @@
+from fnmatch import fnmatch
+from typing import Callable, Dict, List, Optional, Sequence, Union
+
+import numpy
+
+from shraga_common.models import RetrievalResult
+
+DEFAULT_LAMBDA = 0.5
+
+
+def maximal_marginal_relevance(
+    query_vector: Union[Sequence[float], numpy.ndarray],
+    candidate_vectors: Union[Sequence[Sequence[float]], numpy.ndarray],
+    k: int = 10,
+    lambda_mult: float = DEFAULT_LAMBDA,
+) -> List[int]:
+    """
+    Greedily select k candidates that are relevant to the query but not to the
+    candidates already selected, by cosine similarity.
+
+    Each step picks the candidate maximizing
+    lambda_mult * sim(query, c) - (1 - lambda_mult) * max(sim(c, selected)),
+    so lambda_mult=1 keeps the relevance order and lower values diversify more.
+
+    Returns:
+        List[int]: Positions of the selected candidates, in selection order.
+    """
+    candidates = numpy.array(candidate_vectors, dtype=numpy.float32, ndmin=2)
+    if candidates.size == 0 or k <= 0:
+        return []
+    query = numpy.asarray(query_vector, dtype=numpy.float32).ravel()
+    candidates /= numpy.maximum(numpy.linalg.norm(candidates, axis=1, keepdims=True), 1e-12)
+    query = query / max(float(numpy.linalg.norm(query)), 1e-12)
+
+    relevance = candidates @ query
+    similarity = candidates @ candidates.T
+    redundancy = numpy.full(len(candidates), -numpy.inf, dtype=numpy.float32)
+    available = numpy.ones(len(candidates), dtype=bool)
+    selected = []
+    for _ in range(min(k, len(candidates))):
+        if selected:
+            scores = lambda_mult * relevance - (1 - lambda_mult) * redundancy
+        else:
+            scores = relevance.copy()
+        scores[~available] = -numpy.inf
+        best = int(numpy.argmax(scores))
+        selected.append(best)
+        available[best] = False
+        redundancy = numpy.maximum(redundancy, similarity[best])
+    return selected
+
+
+def hit_to_retrieval_result(hit: Dict) -> RetrievalResult:
+    """Map a search hit, or a plain document, to a RetrievalResult."""
+    source = hit.get("_source", hit)
+    return RetrievalResult(
+        id=str(hit.get("_id", source.get("id"))),
+        date=source.get("date"),
+        title=source.get("title") or "Result",
+        link=source.get("link") or source.get("url"),
+        description=source.get("description")
+        or source.get("text")
+        or source.get("content"),
+        score=hit.get("_score"),
+        extra=source,
+    )
+
+
+def mmr_rerank(
+    query_vector: Sequence[float],
+    hits: List[Dict],
+    k: int = 10,
+    lambda_mult: float = DEFAULT_LAMBDA,
+    embeddings: Optional[Sequence[Sequence[float]]] = None,
+    vector_field: Optional[str] = None,
+    exclude_fields: Sequence[str] = (),
+    to_result: Callable[[Dict], RetrievalResult] = hit_to_retrieval_result,
+) -> List[RetrievalResult]:
+    """
+    Re-rank the hits of a vector search with maximal marginal relevance.
+
+    Args:
+        query_vector (Sequence[float]): The query vector of the search.
+        hits (List[Dict]): Candidate hits, best first.
+        k (int): Number of results to return.
+        lambda_mult (float): Trade-off between relevance (1) and diversity (0).
+        embeddings (Optional[Sequence[Sequence[float]]]): Candidate vectors, one per
+            hit. Read from vector_field of each hit's _source when not given.
+        vector_field (Optional[str]): The source field holding each hit's vector.
+        exclude_fields (Sequence[str]): Field patterns removed from the sources before
+            they are returned, e.g. the vector fields fetched for the re-ranking.
+        to_result (Callable[[Dict], RetrievalResult]): Maps a hit to a result.
+
+    Returns:
+        List[RetrievalResult]: Up to k diversified results.
+    """
+    if embeddings is None:
+        if vector_field is None:
+            raise ValueError("Either embeddings or vector_field is required")
+        hits = [hit for hit in hits if vector_field in hit.get("_source", hit)]
+        embeddings = [hit.get("_source", hit)[vector_field] for hit in hits]
+        exclude_fields = [*exclude_fields, vector_field]
+
+    results = []
+    for i in maximal_marginal_relevance(query_vector, embeddings, k, lambda_mult):
+        hit = hits[i]
+        if exclude_fields:
+            source = {
+                key: value
+                for key, value in hit.get("_source", hit).items()
+                if not any(fnmatch(key, pattern) for pattern in exclude_fields)
+            }
+            hit = {**hit, "_source": source} if "_source" in hit else source
+        results.append(to_result(hit))
+    return results
@@ -1,31 +1,89 @@
 import asyncio
-from typing import Dict, List, Optional
+import logging
+from typing import Dict, List, Optional, Sequence, Tuple
 
 import boto3
-from opensearchpy import AWSV4SignerAuth, OpenSearch, RequestsHttpConnection
-from pydash import _
+from opensearchpy import (AIOHttpConnection, AsyncOpenSearch,
+                          AWSV4SignerAsyncAuth, AWSV4SignerAuth, OpenSearch,
+                          RequestsHttpConnection)
 
 from shraga_common import ShragaConfig
 
 from .base_search_retriever import BaseSearchRetriever
+from .client_registry import client_registry
+from .collapse import build_collapse
 from .common import RetrieverConfig
+from .search_cache import SearchCache
+
+logger = logging.getLogger(__name__)
+
+
+class KeepAliveAIOHttpConnection(AIOHttpConnection):
+    """
+    AIOHttpConnection with a configurable keep-alive for idle pooled connections.
+
+    opensearch-py (written against 2.6 to 2.8) builds its aiohttp session in
+    _create_aiohttp_session without exposing the connector's keepalive_timeout,
+    so it is set on the connector of the session the library creates.
+    """
+
+    def __init__(self, *args, keepalive_timeout: float = 15.0, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.keepalive_timeout = keepalive_timeout
+
+    async def _create_aiohttp_session(self):
+        await super()._create_aiohttp_session()
+        connector = self.session.connector
+        # aiohttp reads it whenever a connection is released or cleaned up
+        if hasattr(connector, "_keepalive_timeout"):
+            connector._keepalive_timeout = self.keepalive_timeout
+        else:
+            logger.warning(
+                "Cannot set keepalive_timeout on %s, using the aiohttp default",
+                type(connector).__name__,
+            )
 
 
 class OpenSearchRetriever(BaseSearchRetriever):
     """
     OpenSearchRetriever class
+
+    With use_async enabled searches go through AsyncOpenSearch over a pooled
+    aiohttp transport instead of a thread-pool executor.
     """
 
+    # OpenSearch has no _shard_doc tiebreaker, and _doc alone is not unique across
+    # shards. Pass a sort on a unique keyword field to scan without _id field data.
+    SCAN_SORT = [{"_id": "asc"}]
+
     def __init__(self, shraga_config: ShragaConfig):
         super().__init__()
         self.config = shraga_config
         # Retrieve configurations from environment variables
         config = RetrieverConfig(**self.config.get("retrievers.opensearch"))
-        self.client = OpenSearchRetriever.get_client(shraga_config, config)
+        self.client = client_registry.get(
+            shraga_config, config, OpenSearchRetriever.get_client
+        )
+        self.async_client = (
+            client_registry.get(
+                shraga_config, config, OpenSearchRetriever.get_async_client, is_async=True
+            )
+            if config.use_async
+            else None
+        )
+        self.cache = SearchCache.from_config(config, shraga_config)
+        self.native_hybrid = config.native_hybrid
+        self.collapse = build_collapse(config)
+        self.source_includes = config.source_includes
+        self.source_excludes = config.source_excludes
+        self.docvalue_fields = config.docvalue_fields
+        self.request_timeout = config.request_timeout
         self.index_name = config.index
 
     @staticmethod
-    def get_client(shraga_config, extra_configs: RetrieverConfig):
+    def get_connection_params(
+        shraga_config, extra_configs: RetrieverConfig, use_async: bool = False
+    ) -> dict:
         host = extra_configs.host
         port = extra_configs.port
         use_ssl = True
@@ -41,18 +99,40 @@ class OpenSearchRetriever(BaseSearchRetriever):
         if auth_method == "aws":
             credentials = boto3.Session().get_credentials()
             region = shraga_config.get("aws.region") or "us-east-1"
-            auth = AWSV4SignerAuth(credentials, region, "es")
+            signer = AWSV4SignerAsyncAuth if use_async else AWSV4SignerAuth
+            auth = signer(credentials, region, "es")
         else:
             http_auth_user = extra_configs.user
             http_auth_password = extra_configs.password
             auth = (http_auth_user, http_auth_password)
+            if use_async and http_auth_user is None:
+                # AIOHttpConnection joins the tuple into a header string
+                auth = None
 
-        return OpenSearch(
+        return dict(
             hosts=[{"host": host, "port": port}] if port else [host],
             http_auth=auth,
             use_ssl=use_ssl,
             verify_certs=verify_certs,
+        )
+
+    @staticmethod
+    def get_client(shraga_config, extra_configs: RetrieverConfig):
+        return OpenSearch(
+            **OpenSearchRetriever.get_connection_params(shraga_config, extra_configs),
             connection_class=RequestsHttpConnection,
+            pool_maxsize=extra_configs.pool_maxsize,
+        )
+
+    @staticmethod
+    def get_async_client(shraga_config, extra_configs: RetrieverConfig):
+        return AsyncOpenSearch(
+            **OpenSearchRetriever.get_connection_params(
+                shraga_config, extra_configs, use_async=True
+            ),
+            connection_class=KeepAliveAIOHttpConnection,
+            maxsize=extra_configs.pool_maxsize,
+            keepalive_timeout=extra_configs.keepalive_timeout,
         )
 
     async def get_indices_list(self):
@@ -65,16 +145,17 @@ class OpenSearchRetriever(BaseSearchRetriever):
         k: int = 10,
         index_name: Optional[str] = None,
     ) -> List[Dict]:
+        query = self.build_vector_query(field_name, query_vector, k)
+        return self.collapse_results(await self.execute_raw_search(query, index_name))
+
+    def build_vector_query(
+        self, field_name: str, query_vector: List[float], k: int = 10
+    ) -> dict:
         query = {
             "size": k,
-            "_source": {"excludes": ["vector_*", field_name]},
+            "query": {"knn": {field_name: {"vector": query_vector, "k": k}}},
         }
-
-        query_knn = {"knn": {field_name: {"vector": query_vector, "k": k}}}
-
-        query["query"] = query_knn
-
-        return await self.execute_raw_search(query, index_name)
+        return self.apply_collapse(self.apply_source_filter(query, [field_name]))
 
     async def execute_text_search(
         self,
@@ -82,28 +163,121 @@ class OpenSearchRetriever(BaseSearchRetriever):
         k: int = 10,
         index_name: Optional[str] = None,
     ) -> List[Dict]:
+        query = self.build_text_query(text, k)
+        return self.collapse_results(await self.execute_raw_search(query, index_name))
+
+    def build_text_query(self, text: str, k: int = 10) -> dict:
         query = {"size": k, "query": {"match": {"content": text}}}
-        return await self.execute_raw_search(query, index_name)
+        return self.apply_collapse(self.apply_source_filter(query))
+
+    def build_hybrid_query(
+        self,
+        text: str,
+        query_vector: List[float],
+        field_name: str,
+        k: int,
+        weights: Optional[Sequence[float]],
+        rank_constant: int,
+        rank_window_size: int,
+    ) -> Optional[dict]:
+        # hybrid query with a temporary RRF search pipeline, OpenSearch 2.19+
+        if not self.native_hybrid:
+            return None
+        combination = {"technique": "rrf", "rank_constant": rank_constant}
+        if weights is not None:
+            combination["parameters"] = {"weights": list(weights)}
+        vector_query = self.build_vector_query(field_name, query_vector, rank_window_size)
+        query = {
+            "size": k,
+            "query": {
+                "hybrid": {
+                    "queries": [
+                        self.build_text_query(text, rank_window_size)["query"],
+                        vector_query["query"],
+                    ],
+                    "pagination_depth": rank_window_size,
+                }
+            },
+            "search_pipeline": {
+                "phase_results_processors": [
+                    {"score-ranker-processor": {"combination": combination}}
+                ]
+            },
+        }
+        return self.apply_source_filter(query, [field_name])
 
     def execute_with_timeout(self, body: dict, index_name: str, timeout):
-        return self.client.search(body, index_name or self.index_name)
+        return self.client.search(
+            body=body, index=index_name or self.index_name, request_timeout=timeout
+        )
 
     async def execute_empty_query(self, index_name: Optional[str] = None):
-        return await self.execute_raw_search(
-            {"query": {"match_all": {}}, "size": 0}, index_name
-        )
+        query = self.apply_source_filter({"query": {"match_all": {}}, "size": 0})
+        return await self.execute_raw_search(query, index_name)
 
     async def execute_raw_search(
         self, raw_query: dict, index_name: Optional[str] = None
     ) -> List[Dict]:
-        loop = asyncio.get_event_loop()
-        response = await loop.run_in_executor(
-            None,
-            self.execute_with_timeout,
-            raw_query,
-            index_name or self.index_name,
-            300,
+        index_name = index_name or self.index_name
+        return await self.cached_search(
+            index_name, raw_query, lambda: self.fetch_hits(raw_query, index_name)
         )
+
+    async def fetch_hits(
+        self, raw_query: dict, index_name: str
+    ) -> Tuple[List[Dict], bool]:
+        timeout = self.get_request_timeout()
+        body = self.with_engine_timeout(raw_query, timeout)
+        if self.async_client:
+            response = await self.async_client.search(
+                body=body, index=index_name, request_timeout=timeout
+            )
+        else:
+            loop = asyncio.get_event_loop()
+            response = await loop.run_in_executor(
+                None,
+                self.execute_with_timeout,
+                body,
+                index_name,
+                timeout,
+            )
         # TODO validate search response
-        hits = _.get(response, "hits.hits") or []
-        return hits
+        return self.get_response_hits(response)
+
+    async def open_point_in_time(self, index_name: str, keep_alive: str) -> str:
+        response = await self.call_client(
+            "create_pit", index=index_name, params={"keep_alive": keep_alive}
+        )
+        return response["pit_id"]
+
+    async def close_point_in_time(self, pit_id: str):
+        await self.call_client("delete_pit", body={"pit_id": [pit_id]})
+
+    def execute_msearch(self, body: List[dict], timeout: Optional[float] = None):
+        return self.client.msearch(body, request_timeout=timeout)
+
+    async def execute_raw_searches(
+        self, queries: List[dict], index_name: Optional[str] = None
+    ) -> List[List[Dict]]:
+        if not queries:
+            return []
+        index_name = index_name or self.index_name
+        return await self.cached_searches(
+            index_name, queries, lambda q: self.fetch_msearch_hits(q, index_name)
+        )
+
+    async def fetch_msearch_hits(
+        self, queries: List[dict], index_name: str
+    ) -> List[Optional[Tuple[List[Dict], bool]]]:
+        timeout = self.get_request_timeout()
+        body = self.build_msearch_body(
+            [self.with_engine_timeout(query, timeout) for query in queries], index_name
+        )
+        if self.async_client:
+            response = await self.async_client.msearch(body=body, request_timeout=timeout)
+        else:
+            loop = asyncio.get_event_loop()
+            response = await loop.run_in_executor(
+                None, self.execute_msearch, body, timeout
+            )
+        return self.get_msearch_hits(response)
@@ -0,0 +1,125 @@
+import hashlib
+import json
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from threading import Lock
+from typing import Dict, List, Optional, Tuple
+
+from .client_registry import ClientRegistry
+from .common import RetrieverConfig
+
+
+class SearchCacheBackend(ABC):
+    """
+    Storage for serialized search results. Implement this to share the cache
+    between processes, e.g. on top of Redis or memcached.
+    """
+
+    @abstractmethod
+    async def get(self, key: str) -> Optional[str]:
+        pass
+
+    @abstractmethod
+    async def set(self, key: str, value: str, ttl: float):
+        pass
+
+
+class InMemorySearchCacheBackend(SearchCacheBackend):
+    """In-process LRU backend with per-entry expiry."""
+
+    def __init__(self, max_size: int = 1024):
+        self.max_size = max_size
+        self._entries: OrderedDict[str, Tuple[float, str]] = OrderedDict()
+        self._lock = Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    async def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    async def set(self, key: str, value: str, ttl: float):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+
+class SearchCache:
+    """
+    Cache of search hits keyed by a canonical hash of (index, query body).
+
+    Hits are stored serialized, so callers that mutate the returned documents
+    never alter the cached copy.
+    """
+
+    _shared: Dict[tuple, "SearchCache"] = {}
+    _shared_lock = Lock()
+
+    def __init__(self, backend: Optional[SearchCacheBackend] = None, ttl: float = 60):
+        self.backend = backend or InMemorySearchCacheBackend()
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def from_config(
+        cls, config: RetrieverConfig, shraga_config=None
+    ) -> Optional["SearchCache"]:
+        """
+        Get the in-process cache for a retriever config, shared by every retriever
+        connecting with the same cluster and credentials, so that principals with
+        different document or index permissions never see each other's results.
+        Returns None if caching is disabled.
+        """
+        if not config.cache_ttl:
+            return None
+        key = ClientRegistry.make_key(shraga_config, config) + (
+            config.cache_ttl,
+            config.cache_max_size,
+        )
+        with cls._shared_lock:
+            if key not in cls._shared:
+                cls._shared[key] = cls(
+                    InMemorySearchCacheBackend(config.cache_max_size), config.cache_ttl
+                )
+            return cls._shared[key]
+
+    @staticmethod
+    def make_key(index_name: Optional[str], query: dict) -> str:
+        canonical = json.dumps(
+            [index_name, query], sort_keys=True, separators=(",", ":"), default=str
+        )
+        return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+    async def get(self, index_name: Optional[str], query: dict) -> Optional[List[Dict]]:
+        value = await self.backend.get(self.make_key(index_name, query))
+        if value is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return json.loads(value)
+
+    async def set(self, index_name: Optional[str], query: dict, hits: List[Dict]):
+        await self.backend.set(
+            self.make_key(index_name, query), json.dumps(hits), self.ttl
+        )
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
@@ -0,0 +1,57 @@
+import asyncio
+import unittest
+from unittest.mock import AsyncMock, MagicMock
+
+from .client_registry import ClientRegistry
+from .common import RetrieverConfig
+
+
+class TestClientRegistry(unittest.TestCase):
+
+    def setUp(self):
+        self.registry = ClientRegistry(health_check_interval=30)
+        self.factory = MagicMock(side_effect=lambda shraga_config, config: MagicMock())
+        self.config = RetrieverConfig(type="opensearch", host="localhost")
+
+    def test_clients_are_shared_per_config(self):
+        client = self.registry.get(None, self.config, self.factory)
+        self.assertIs(self.registry.get(None, self.config.model_copy(), self.factory), client)
+        # search-only settings do not require a new connection
+        cached = self.config.model_copy(update={"cache_ttl": 10})
+        self.assertIs(self.registry.get(None, cached, self.factory), client)
+
+        other = self.config.model_copy(update={"host": "other"})
+        self.assertIsNot(self.registry.get(None, other, self.factory), client)
+        self.assertEqual(self.factory.call_count, 2)
+
+    def test_failed_ping_keeps_client(self):
+        client = self.registry.get(None, self.config, self.factory)
+        client.ping.side_effect = ConnectionError()
+        health = asyncio.run(self.registry.health_check())
+        self.assertEqual(health, {"opensearch://localhost:9200 (sync)": False})
+        # the pool reconnects on its own, retrievers keep using the same client
+        self.assertIs(self.registry.get(None, self.config, self.factory), client)
+        client.close.assert_not_called()
+
+    def test_async_clients_are_registered_apart(self):
+        client = self.registry.get(None, self.config, self.factory)
+        async_client = AsyncMock()
+        async_factory = MagicMock(return_value=async_client)
+        self.assertIs(
+            self.registry.get(None, self.config, async_factory, is_async=True), async_client
+        )
+        self.assertIs(
+            self.registry.get(None, self.config, async_factory, is_async=True), async_client
+        )
+        async_factory.assert_called_once()
+
+        asyncio.run(self.registry.aclose())
+        client.close.assert_called_once()
+        async_client.close.assert_awaited_once()
+        self.assertEqual(len(self.registry), 0)
+
+    def test_close(self):
+        client = self.registry.get(None, self.config, self.factory)
+        self.registry.close()
+        client.close.assert_called_once()
+        self.assertEqual(len(self.registry), 0)
@@ -0,0 +1,44 @@
+import unittest
+
+from .collapse import build_collapse, collapse_hits, merge_inner_hits_results
+from .common import RetrieverConfig
+
+
+def _chunk(chunk_id: str, system_id: str, score: float = 1.0):
+    return {
+        "_id": chunk_id,
+        "_index": "idx",
+        "_score": score,
+        "_source": {"id": "doc", "system_id": system_id, "text": f"text {chunk_id}"},
+    }
+
+
+class TestCollapse(unittest.TestCase):
+
+    def test_merge_inner_hits(self):
+        orig_doc = _chunk("c2", "s2", score=3.0)
+        inner_hits = [_chunk("c3", "s3"), _chunk("c1", "s1"), _chunk("c2", "s2"), _chunk("c4", "s3")]
+        merged = merge_inner_hits_results(inner_hits, orig_doc)
+        self.assertEqual(merged["text"], "text c1\ntext c2\ntext c3")
+        self.assertEqual(merged["_id"], "doc")
+        self.assertEqual(merged["_score"], 3.0)
+        self.assertEqual(merged["system_id"], "s1 - s3 (s2)")
+        self.assertEqual(merged["chunk_text_length"], len(merged["text"]))
+        # the caller's list is left untouched
+        self.assertEqual(len(inner_hits), 4)
+
+    def test_collapse_hits(self):
+        hit = _chunk("c2", "s2")
+        hit["inner_hits"] = {"chunks": {"hits": {"hits": [_chunk("c1", "s1"), _chunk("c2", "s2")]}}}
+        merged = collapse_hits([hit, _chunk("c9", "s9")])
+        self.assertEqual([doc["text"] for doc in merged], ["text c1\ntext c2", "text c9"])
+
+    def test_build_collapse(self):
+        config = RetrieverConfig(type="opensearch", host="localhost")
+        self.assertIsNone(build_collapse(config))
+        config.collapse_field = "id"
+        config.collapse_inner_hits = 5
+        collapse = build_collapse(config)
+        self.assertEqual(collapse["field"], "id")
+        self.assertEqual(collapse["inner_hits"]["name"], "chunks")
+        self.assertEqual(collapse["inner_hits"]["size"], 5)
@@ -0,0 +1,153 @@
+import asyncio
+import json
+import time
+import unittest
+from contextlib import aclosing
+from unittest.mock import MagicMock
+
+from aiohttp import web
+
+from .client_registry import client_registry
+from .elasticsearch import ElasticsearchRetriever
+
+SEARCH_DELAY = 0.2
+
+
+class TestElasticsearchRetriever(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        # a stub cluster that answers every search after a fixed delay
+        async def search(request):
+            body = await request.json()
+            await asyncio.sleep(SEARCH_DELAY)
+            return web.json_response(
+                {"hits": {"hits": [{"_id": str(body["id"])}]}},
+                headers={"X-Elastic-Product": "Elasticsearch"},
+            )
+
+        async def msearch(request):
+            self.msearch_calls += 1
+            lines = [json.loads(line) for line in (await request.text()).splitlines()]
+            responses = []
+            for header, body in zip(lines[::2], lines[1::2]):
+                if body.get("fail"):
+                    responses.append({"error": {"type": "parsing_exception"}, "status": 400})
+                else:
+                    responses.append(
+                        {"hits": {"hits": [{"_id": str(body["id"]), "_index": header["index"]}]}}
+                    )
+            return web.json_response(
+                {"responses": responses}, headers={"X-Elastic-Product": "Elasticsearch"}
+            )
+
+        self.msearch_calls = 0
+        app = web.Application()
+        app.router.add_route("*", "/{index}/_search", search)
+        app.router.add_route("*", "/_msearch", msearch)
+        self.runner = web.AppRunner(app)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, "127.0.0.1", 0)
+        await site.start()
+        self.port = site._server.sockets[0].getsockname()[1]
+
+    async def asyncTearDown(self):
+        await self.runner.cleanup()
+
+    def _retriever(self, **extra_config):
+        shraga_config = MagicMock()
+        shraga_config.get.return_value = {
+            "type": "elasticsearch",
+            "host": "127.0.0.1",
+            "port": self.port,
+            "index": "test-index",
+            "use_ssl": False,
+            **extra_config,
+        }
+        return ElasticsearchRetriever(shraga_config)
+
+    async def _run_concurrent_searches(self, retriever, count: int):
+        start = time.perf_counter()
+        results = await asyncio.gather(
+            *[retriever.execute_raw_search({"id": i}) for i in range(count)]
+        )
+        elapsed = time.perf_counter() - start
+        self.assertEqual(results, [[{"_id": str(i)}] for i in range(count)])
+        return elapsed
+
+    async def test_async_searches_overlap(self):
+        retriever = self._retriever(use_async=True, pool_maxsize=10)
+        self.assertIsNotNone(retriever.async_client)
+        try:
+            elapsed = await self._run_concurrent_searches(retriever, 5)
+        finally:
+            await client_registry.aclose()
+        self.assertLess(elapsed, SEARCH_DELAY * 3)
+
+    async def test_sync_searches_do_not_block_the_loop(self):
+        retriever = self._retriever()
+        self.assertIsNone(retriever.async_client)
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                ticks += 1
+                await asyncio.sleep(0.01)
+
+        ticker_task = asyncio.create_task(ticker())
+        try:
+            await self._run_concurrent_searches(retriever, 2)
+        finally:
+            ticker_task.cancel()
+        self.assertGreater(ticks, 5)
+
+    async def test_raw_searches_use_one_msearch(self):
+        for use_async in (True, False):
+            self.msearch_calls = 0
+            retriever = self._retriever(use_async=use_async)
+            try:
+                results = await retriever.execute_raw_searches(
+                    [{"id": 1}, {"fail": True}, {"id": 3}]
+                )
+            finally:
+                await client_registry.aclose()
+            self.assertEqual(self.msearch_calls, 1)
+            self.assertEqual(
+                results,
+                [
+                    [{"_id": "1", "_index": "test-index"}],
+                    [],
+                    [{"_id": "3", "_index": "test-index"}],
+                ],
+            )
+
+    async def test_queries_exclude_vectors(self):
+        retriever = self._retriever(docvalue_fields=["date"])
+        for query in (
+            retriever.build_text_query("query"),
+            retriever.build_vector_query("embedding", [0.1]),
+        ):
+            self.assertIn("vector_*", query["_source"]["excludes"])
+            self.assertEqual(query["docvalue_fields"], ["date"])
+        self.assertIn(
+            "embedding", retriever.build_vector_query("embedding", [0.1])["_source"]["excludes"]
+        )
+
+    async def test_scan_closes_point_in_time(self):
+        retriever = self._retriever()
+        retriever.client = MagicMock()
+        retriever.client.open_point_in_time.return_value = {"id": "pit"}
+        retriever.client.search.return_value = {
+            "hits": {"hits": [{"_id": "1", "sort": [1]}, {"_id": "2", "sort": [2]}]}
+        }
+        async with aclosing(retriever.scan({"query": {"term": {"a": 1}}}, page_size=2)) as hits:
+            async for hit in hits:
+                break
+
+        body = retriever.client.search.call_args.kwargs["body"]
+        self.assertEqual(body["sort"], [{"_shard_doc": "asc"}])
+        self.assertEqual(body["query"], {"term": {"a": 1}})
+        retriever.client.open_point_in_time.assert_called_once_with(
+            index="test-index", keep_alive="1m"
+        )
+        retriever.client.close_point_in_time.assert_called_once_with(id="pit")
@@ -0,0 +1,31 @@
+import unittest
+
+from .fusion import reciprocal_rank_fusion
+
+
+def _hits(*ids):
+    return [{"_id": i, "_index": "idx", "_score": 1.0} for i in ids]
+
+
+class TestReciprocalRankFusion(unittest.TestCase):
+
+    def test_fuses_ranks(self):
+        fused = reciprocal_rank_fusion([_hits("a", "b", "c"), _hits("c", "a")], k=3)
+        self.assertEqual([hit["_id"] for hit in fused], ["a", "c", "b"])
+        self.assertAlmostEqual(fused[0]["_score"], 1 / 61 + 1 / 62)
+        self.assertAlmostEqual(fused[2]["_score"], 1 / 62)
+
+    def test_weights(self):
+        fused = reciprocal_rank_fusion([_hits("a"), _hits("b")], weights=[1.0, 2.0])
+        self.assertEqual([hit["_id"] for hit in fused], ["b", "a"])
+
+    def test_limits_and_copies(self):
+        text_hits = _hits("a", "b", "c")
+        fused = reciprocal_rank_fusion([text_hits, []], k=2)
+        self.assertEqual(len(fused), 2)
+        self.assertEqual(text_hits[0]["_score"], 1.0)
+        self.assertEqual(reciprocal_rank_fusion([[], []]), [])
+
+    def test_weights_length_mismatch(self):
+        with self.assertRaises(ValueError):
+            reciprocal_rank_fusion([_hits("a"), _hits("b")], weights=[1.0])
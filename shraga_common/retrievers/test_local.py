@@ -0,0 +1,88 @@
+import gzip
+import io
+import json
+import os
+import tempfile
+import unittest
+from json import JSONDecodeError
+
+from .local import LocalRetriever, iter_json_items
+
+
+class TestIterJsonItems(unittest.TestCase):
+
+    def test_array_items(self):
+        items = [{"id": i, "text": "x" * i, "n": [1.5, None, True]} for i in range(50)]
+        f = io.StringIO(json.dumps(items, indent=2))
+        # a tiny buffer splits items, numbers and strings across reads
+        self.assertEqual(list(iter_json_items(f, buffer_size=7)), items)
+
+    def test_number_at_buffer_end(self):
+        self.assertEqual(list(iter_json_items(io.StringIO("[12345, 6]"), 3)), [12345, 6])
+
+    def test_empty_array_and_non_array(self):
+        self.assertEqual(list(iter_json_items(io.StringIO(" [ ] "))), [])
+        self.assertEqual(list(iter_json_items(io.StringIO('{"a": [1]}'))), [{"a": [1]}])
+
+    def test_malformed(self):
+        with self.assertRaises(JSONDecodeError):
+            list(iter_json_items(io.StringIO("[1 2]")))
+        with self.assertRaises(JSONDecodeError):
+            list(iter_json_items(io.StringIO('[{"a": 1}')))
+
+
+class TestGetDataFromFolder(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        self.path = self.folder.name
+        self.items = []
+        for i in range(4):
+            items = [{"file": i, "item": j} for j in range(25)]
+            self.items.extend(items)
+            with open(os.path.join(self.path, f"{i}.json"), "w") as f:
+                json.dump(items, f)
+            with gzip.open(os.path.join(self.path, f"{i}.jsonl.gz"), "wt") as f:
+                f.writelines(json.dumps(item) + "\n" for item in items)
+
+    def tearDown(self):
+        self.folder.cleanup()
+
+    def test_json_files(self):
+        data = list(LocalRetriever.get_data_from_folder(self.path))
+        self.assertEqual(len(data), 4)
+        self.assertEqual([item for content in data for item in content], self.items)
+
+        data = list(LocalRetriever.get_data_from_folder(self.path, stream=True))
+        self.assertEqual(data, self.items)
+
+    def test_jsonl_gz_files(self):
+        data = list(LocalRetriever.get_data_from_folder(self.path, file_type="jsonl.gz"))
+        self.assertEqual(data, self.items)
+
+    def test_parallel(self):
+        data = list(
+            LocalRetriever.get_data_from_folder(
+                self.path, workers=3, stream=True, batch_size=10
+            )
+        )
+        key = lambda item: (item["file"], item["item"])
+        self.assertEqual(sorted(data, key=key), self.items)
+
+    def test_parallel_close_early(self):
+        data = LocalRetriever.get_data_from_folder(
+            self.path, file_type="jsonl.gz", workers=2, batch_size=1
+        )
+        self.assertIn(next(data), self.items)
+        data.close()
+
+    def test_parallel_error(self):
+        with open(os.path.join(self.path, "2.json"), "w") as f:
+            f.write("not json")
+        # decode errors are reported and the file skipped, as in a single process
+        data = list(LocalRetriever.get_data_from_folder(self.path, workers=2, stream=True))
+        self.assertEqual(len(data), 75)
+
+
+if __name__ == "__main__":
+    unittest.main()
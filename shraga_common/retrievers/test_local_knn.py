@@ -0,0 +1,320 @@
+import asyncio
+import gzip
+import json
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import faiss
+import numpy
+
+from .local_knn import LocalKnnRetriever
+
+
+class TestLocalKnnRetriever(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.data_dir = os.path.join(self.tmp_dir.name, "data")
+        self.snapshot_dir = os.path.join(self.tmp_dir.name, "snapshots")
+        os.makedirs(self.data_dir)
+
+        rng = numpy.random.default_rng(42)
+        self.vectors = rng.normal(size=(300, 8)).astype(numpy.float32)
+        with gzip.open(
+            os.path.join(self.data_dir, "part-0.jsonl.gz"), "wt", encoding="utf-8"
+        ) as f:
+            for i, vector in enumerate(self.vectors):
+                f.write(
+                    json.dumps({"id": i, "text": f"doc {i}", "vec": vector.tolist()})
+                    + "\n"
+                )
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def _retriever(self):
+        retriever = LocalKnnRetriever(nlist=4, nprobe=4)
+        self.addCleanup(retriever.close)
+        return retriever
+
+    def test_knn_search(self):
+        retriever = self._retriever()
+        retriever.load_data(self.data_dir, "vec")
+        results = retriever.knn_search(self.vectors[7].tolist(), top_k=3)
+        self.assertEqual(len(results), 3)
+        self.assertEqual(results[0]["id"], 7)
+
+        results = retriever.knn_search(self.vectors[7].tolist(), top_k=3, use_ann=True)
+        self.assertEqual(results[0]["id"], 7)
+
+    def test_streaming_load(self):
+        expected = self._retriever()
+        expected.load_data(self.data_dir, "vec")
+        with gzip.open(
+            os.path.join(self.data_dir, "part-1.jsonl.gz"), "wt", encoding="utf-8"
+        ) as f:
+            f.write(json.dumps({"id": 300, "vec": self.vectors[0].tolist()}) + "\n")
+            f.write(json.dumps({"id": 301}) + "\n")
+
+        retriever = LocalKnnRetriever(nlist=4, nprobe=4, train_size=64)
+        self.addCleanup(retriever.close)
+        retriever.load_data(self.data_dir, "vec", chunk_size=32, workers=2)
+
+        self.assertEqual(retriever.index.ntotal, len(self.vectors) + 1)
+        self.assertEqual(retriever.index_ann.ntotal, len(self.vectors) + 1)
+        self.assertEqual(len(retriever.documents), len(self.vectors) + 1)
+        self.assertEqual(retriever.documents.get(300), {"id": 300})
+        numpy.testing.assert_array_equal(
+            retriever.index.reconstruct_n(0, len(self.vectors)),
+            expected.index.reconstruct_n(0, len(self.vectors)),
+        )
+
+    def test_add_and_remove_documents(self):
+        retriever = LocalKnnRetriever(nlist=4, nprobe=4, retrain_threshold=0.5)
+        self.addCleanup(retriever.close)
+        retriever.load_data(self.data_dir, "vec")
+        ann_index = retriever.index_ann
+
+        new_vector = numpy.ones(8, dtype=numpy.float32)
+        ids = retriever.add_documents(
+            [{"id": "new", "vec": new_vector.tolist()}], "vec"
+        )
+        self.assertEqual(ids, [len(self.vectors)])
+        for use_ann in (False, True):
+            results = retriever.knn_search(new_vector.tolist(), 1, use_ann=use_ann)
+            self.assertEqual(results, [{"id": "new"}])
+
+        self.assertEqual(retriever.remove_ids([7]), 1)
+        for use_ann in (False, True):
+            results = retriever.knn_search(self.vectors[7].tolist(), 5, use_ann=use_ann)
+            self.assertNotIn(7, [r["id"] for r in results])
+        # small deltas reuse the trained quantizer
+        self.assertIs(retriever.index_ann, ann_index)
+
+        retriever.remove_ids(list(range(200)))
+        self.assertIsNot(retriever.index_ann, ann_index)
+        self.assertEqual(retriever.index_ann.ntotal, retriever.index.ntotal)
+        self.assertEqual(retriever.index.ntotal, len(self.vectors) + 1 - 200)
+        results = retriever.knn_search(self.vectors[250].tolist(), 1, use_ann=True)
+        self.assertEqual(results[0]["id"], 250)
+
+    def test_remove_from_hnsw_is_rejected(self):
+        retriever = LocalKnnRetriever(index_factory="HNSW16")
+        self.addCleanup(retriever.close)
+        retriever.load_data(self.data_dir, "vec")
+        with self.assertRaises(ValueError):
+            retriever.remove_ids([1])
+
+    def test_index_factory(self):
+        for index_factory, exact_index in (
+            ("HNSW16", False),
+            ("IVF4,SQ8", True),
+            ("IVF4,PQ4x4", False),
+            ("Flat", True),
+        ):
+            retriever = LocalKnnRetriever(
+                nprobe=4, index_factory=index_factory, exact_index=exact_index
+            )
+            self.addCleanup(retriever.close)
+            retriever.load_data(self.data_dir, "vec")
+            self.assertEqual(retriever.index is not None, exact_index)
+            self.assertEqual(retriever.index_ann is not None, index_factory != "Flat")
+            for use_ann in (False, True):
+                results = retriever.knn_search(
+                    self.vectors[9].tolist(), top_k=3, use_ann=use_ann
+                )
+                self.assertEqual(len(results), 3)
+                if index_factory != "IVF4,PQ4x4":
+                    self.assertEqual(results[0]["id"], 9)
+
+        with self.assertRaises(ValueError):
+            LocalKnnRetriever(index_factory="Flat", exact_index=False)
+
+    def test_knn_search_batch(self):
+        retriever = self._retriever()
+        retriever.load_data(self.data_dir, "vec")
+        queries = self.vectors[[3, 50, 120]]
+
+        for use_ann in (False, True):
+            batch = retriever.knn_search_batch(queries, top_k=4, use_ann=use_ann)
+            self.assertEqual(
+                batch,
+                [retriever.knn_search(q.tolist(), 4, use_ann=use_ann) for q in queries],
+            )
+        self.assertEqual([r[0]["id"] for r in batch], [3, 50, 120])
+        # the caller's matrix is not normalized in place
+        numpy.testing.assert_array_equal(queries, self.vectors[[3, 50, 120]])
+        self.assertEqual(retriever.knn_search_batch([], top_k=4), [])
+
+    def test_documents_are_stored_without_vectors(self):
+        retriever = self._retriever()
+        retriever.load_data(self.data_dir, "vec")
+        self.assertEqual(len(retriever.documents), len(self.vectors))
+        self.assertEqual(retriever.documents.get(5), {"id": 5, "text": "doc 5"})
+
+        documents_dir = retriever.documents.path
+        retriever.close()
+        self.assertFalse(documents_dir.exists())
+
+    def test_sharded_search(self):
+        expected = self._retriever()
+        expected.load_data(self.data_dir, "vec")
+        retriever = LocalKnnRetriever(nlist=4, nprobe=4, shards=3, search_threads=2)
+        self.addCleanup(retriever.close)
+        retriever.load_data(self.data_dir, "vec", snapshot_dir=self.snapshot_dir)
+
+        self.assertEqual(len(retriever.index.shards), 3)
+        self.assertEqual(retriever.index.ntotal, len(self.vectors))
+        self.assertEqual(retriever.index.shards[0].ntotal, 100)
+        queries = self.vectors[:20]
+        self.assertEqual(
+            retriever.knn_search_batch(queries, top_k=5),
+            expected.knn_search_batch(queries, top_k=5),
+        )
+        self.assertEqual(
+            retriever.knn_search(self.vectors[7].tolist(), top_k=3, use_ann=True)[0]["id"], 7
+        )
+
+        retriever.remove_ids([7])
+        self.assertEqual(retriever.index.ntotal, len(self.vectors) - 1)
+        self.assertNotEqual(retriever.knn_search(self.vectors[7].tolist(), top_k=1)[0]["id"], 7)
+
+        restored = LocalKnnRetriever(nlist=4, nprobe=4, shards=3)
+        self.addCleanup(restored.close)
+        restored.load_data(self.data_dir, "vec", snapshot_dir=self.snapshot_dir)
+        self.assertEqual(len(restored.index_ann.shards), 3)
+        self.assertEqual(
+            restored.knn_search_batch(queries, top_k=5),
+            expected.knn_search_batch(queries, top_k=5),
+        )
+
+        executor = restored.executor
+        restored.close()
+        self.assertIsNone(restored.executor)
+        self.assertTrue(executor._shutdown)
+
+    def test_quantized_storage(self):
+        expected = self._retriever()
+        expected.load_data(self.data_dir, "vec")
+        float32_size = faiss.downcast_index(expected.index.index).code_size
+
+        for storage, ratio in (("float16", 2), ("int8", 4)):
+            retriever = LocalKnnRetriever(nlist=4, nprobe=4, storage=storage)
+            self.addCleanup(retriever.close)
+            retriever.load_data(self.data_dir, "vec")
+            self.assertTrue(retriever.index_factory.startswith("IVF4,SQ"))
+            self.assertEqual(
+                retriever.knn_search(self.vectors[7].tolist(), top_k=1)[0]["id"], 7
+            )
+            self.assertIsNone(retriever.documents.vectors)
+            self.assertEqual(
+                faiss.downcast_index(retriever.index.index).code_size, float32_size / ratio
+            )
+
+    def test_rescoring(self):
+        expected = self._retriever()
+        expected.load_data(self.data_dir, "vec")
+        retriever = LocalKnnRetriever(
+            nlist=4, nprobe=4, storage="int8", rescore_factor=4, train_size=64
+        )
+        self.addCleanup(retriever.close)
+        retriever.load_data(self.data_dir, "vec", chunk_size=50, snapshot_dir=self.snapshot_dir)
+
+        self.assertEqual(retriever.documents.vectors.shape, self.vectors.shape)
+        queries = self.vectors[:20]
+        self.assertEqual(
+            retriever.knn_search_batch(queries, top_k=5),
+            expected.knn_search_batch(queries, top_k=5),
+        )
+
+        restored = LocalKnnRetriever(
+            nlist=4, nprobe=4, storage="int8", rescore_factor=4, train_size=64
+        )
+        self.addCleanup(restored.close)
+        restored.load_data(self.data_dir, "vec", snapshot_dir=self.snapshot_dir)
+        self.assertEqual(
+            restored.knn_search_batch(queries, top_k=5),
+            expected.knn_search_batch(queries, top_k=5),
+        )
+        new_vector = numpy.ones(8, dtype=numpy.float32)
+        ids = restored.add_documents([{"id": "new", "vec": new_vector.tolist()}], "vec")
+        self.assertEqual(len(restored.documents.vectors), len(self.vectors) + 1)
+        self.assertEqual(restored.knn_search(new_vector.tolist(), top_k=1)[0]["id"], "new")
+        self.assertEqual(ids, [len(self.vectors)])
+
+        # the snapshot itself is left untouched
+        reloaded = LocalKnnRetriever(
+            nlist=4, nprobe=4, storage="int8", rescore_factor=4, train_size=64
+        )
+        self.addCleanup(reloaded.close)
+        reloaded.load_data(self.data_dir, "vec", snapshot_dir=self.snapshot_dir)
+        self.assertEqual(len(reloaded.documents), len(self.vectors))
+        self.assertEqual(len(reloaded.documents.vectors), len(self.vectors))
+        self.assertEqual(reloaded.index.ntotal, len(self.vectors))
+        self.assertNotEqual(restored.documents.path, reloaded.documents.path)
+
+    def test_mmr_search(self):
+        copies = [
+            {"id": f"copy-{i}", "vec": self.vectors[7].tolist()} for i in range(3)
+        ]
+        for retriever in (
+            self._retriever(),
+            LocalKnnRetriever(nlist=4, nprobe=4, shards=2, storage="int8", rescore_factor=2),
+            LocalKnnRetriever(index_factory="HNSW8", exact_index=False),
+        ):
+            self.addCleanup(retriever.close)
+            retriever.load_data(self.data_dir, "vec")
+            retriever.add_documents(copies, "vec")
+            query = self.vectors[7].tolist()
+            nearest = [doc["id"] for doc in retriever.knn_search(query, top_k=3)]
+            self.assertEqual(len({7, "copy-0", "copy-1", "copy-2"} & set(nearest)), 3)
+
+            results = asyncio.run(
+                retriever.execute_mmr_search("vec", query, k=3, fetch_k=20, lambda_mult=0.3)
+            )
+            ids = [result.extra["id"] for result in results]
+            self.assertEqual(len(ids), 3)
+            # only one of the identical vectors is kept
+            self.assertEqual(len({7, "copy-0", "copy-1", "copy-2"} & set(ids)), 1)
+
+        retriever = LocalKnnRetriever(nlist=4, nprobe=4, exact_index=False)
+        self.addCleanup(retriever.close)
+        retriever.load_data(self.data_dir, "vec")
+        with self.assertRaises(ValueError):
+            asyncio.run(retriever.execute_mmr_search("vec", query, k=3))
+        with self.assertRaisesRegex(NotImplementedError, "only supports vector search"):
+            asyncio.run(retriever.execute_hybrid_search("doc", query, field_name="vec"))
+
+    def test_snapshot_roundtrip(self):
+        retriever = self._retriever()
+        retriever.load_data(self.data_dir, "vec", snapshot_dir=self.snapshot_dir)
+        expected = retriever.knn_search(self.vectors[11].tolist(), top_k=5)
+        self.assertEqual(len(os.listdir(self.snapshot_dir)), 1)
+
+        restored = self._retriever()
+        with patch("shraga_common.retrievers.local_knn.json.loads") as loads:
+            restored.load_data(self.data_dir, "vec", snapshot_dir=self.snapshot_dir)
+            # nothing is decoded until a search returns hits
+            loads.assert_not_called()
+
+        self.assertEqual(restored.index.ntotal, len(self.vectors))
+        self.assertTrue(restored.index_ann.is_trained)
+        self.assertEqual(
+            restored.knn_search(self.vectors[11].tolist(), top_k=5), expected
+        )
+
+    def test_snapshot_invalidated_on_source_change(self):
+        retriever = self._retriever()
+        retriever.load_data(self.data_dir, "vec", snapshot_dir=self.snapshot_dir)
+
+        with gzip.open(
+            os.path.join(self.data_dir, "part-1.jsonl.gz"), "wt", encoding="utf-8"
+        ) as f:
+            f.write(json.dumps({"id": 300, "vec": [1.0] * 8}) + "\n")
+
+        retriever = self._retriever()
+        retriever.load_data(self.data_dir, "vec", snapshot_dir=self.snapshot_dir)
+        self.assertEqual(len(os.listdir(self.snapshot_dir)), 2)
+        self.assertEqual(retriever.index.ntotal, len(self.vectors) + 1)
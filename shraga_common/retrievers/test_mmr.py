@@ -0,0 +1,50 @@
+import unittest
+
+import numpy
+
+from .mmr import maximal_marginal_relevance, mmr_rerank
+
+
+class TestMaximalMarginalRelevance(unittest.TestCase):
+
+    def setUp(self):
+        self.query = [1.0, 0.0]
+        # two near-duplicates closest to the query, and a less relevant distinct one
+        self.vectors = [[1.0, 0.1], [1.0, 0.11], [0.7, -0.7]]
+
+    def test_diversifies(self):
+        self.assertEqual(maximal_marginal_relevance(self.query, self.vectors, k=2), [0, 2])
+
+    def test_lambda_one_keeps_relevance_order(self):
+        self.assertEqual(
+            maximal_marginal_relevance(self.query, self.vectors, k=3, lambda_mult=1.0),
+            [0, 1, 2],
+        )
+
+    def test_edge_cases(self):
+        self.assertEqual(maximal_marginal_relevance(self.query, [], k=3), [])
+        self.assertEqual(len(maximal_marginal_relevance(self.query, self.vectors, k=10)), 3)
+        vectors = numpy.random.default_rng(0).normal(size=(50, 8))
+        selected = maximal_marginal_relevance(vectors[0], vectors, k=10)
+        self.assertEqual(selected[0], 0)
+        self.assertEqual(len(set(selected)), 10)
+
+    def test_mmr_rerank(self):
+        hits = [
+            {
+                "_id": str(i),
+                "_score": 1.0 - i / 10,
+                "_source": {"title": f"doc {i}", "text": "text", "vec": vector, "vector_x": [0]},
+            }
+            for i, vector in enumerate(self.vectors)
+        ]
+        results = mmr_rerank(
+            self.query, hits, k=2, vector_field="vec", exclude_fields=["vector_*"]
+        )
+        self.assertEqual([result.id for result in results], ["0", "2"])
+        self.assertEqual(results[1].title, "doc 2")
+        self.assertEqual(results[1].score, 0.8)
+        self.assertEqual(results[1].extra, {"title": "doc 2", "text": "text"})
+
+        results = mmr_rerank(self.query, [{"id": 1}, {"id": 2}], k=1, embeddings=[[0, 1], [1, 0]])
+        self.assertEqual(results[0].id, "2")
@@ -0,0 +1,322 @@
+import asyncio
+import unittest
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from shraga_common.utils.deadline import deadline
+
+from .client_registry import client_registry
+from .opensearch import KeepAliveAIOHttpConnection, OpenSearchRetriever
+
+
+class TestOpenSearchRetriever(unittest.IsolatedAsyncioTestCase):
+
+    def _retriever(self, **extra_config):
+        shraga_config = MagicMock()
+        shraga_config.get.return_value = {
+            "type": "opensearch",
+            "host": "localhost",
+            "index": "test-index",
+            "use_ssl": False,
+            **extra_config,
+        }
+        return OpenSearchRetriever(shraga_config)
+
+    async def test_async_client_config(self):
+        retriever = self._retriever(use_async=True, pool_maxsize=32, keepalive_timeout=5)
+        transport = retriever.async_client.transport
+        await transport._async_init()
+        connection = transport.connection_pool.connections[0]
+        self.assertIsInstance(connection, KeepAliveAIOHttpConnection)
+        self.assertEqual(connection._limit, 32)
+        self.assertEqual(connection.keepalive_timeout, 5)
+        # fails if opensearch-py stops creating its session this way
+        await connection._create_aiohttp_session()
+        self.assertEqual(connection.session.connector._keepalive_timeout, 5)
+        await client_registry.aclose()
+
+    async def test_async_searches_do_not_use_executor(self):
+        retriever = self._retriever(use_async=True)
+        in_flight = 0
+        max_in_flight = 0
+
+        async def search(body, index, request_timeout):
+            nonlocal in_flight, max_in_flight
+            in_flight += 1
+            max_in_flight = max(max_in_flight, in_flight)
+            await asyncio.sleep(0.01)
+            in_flight -= 1
+            return {"hits": {"hits": [{"_id": body["id"], "_index": index}]}}
+
+        retriever.async_client = MagicMock()
+        retriever.async_client.search = AsyncMock(side_effect=search)
+        loop = asyncio.get_running_loop()
+        with patch.object(loop, "run_in_executor") as run_in_executor:
+            results = await asyncio.gather(
+                *[retriever.execute_raw_search({"id": i}) for i in range(5)]
+            )
+            run_in_executor.assert_not_called()
+
+        self.assertEqual(
+            results, [[{"_id": i, "_index": "test-index"}] for i in range(5)]
+        )
+        self.assertEqual(max_in_flight, 5)
+
+    async def test_sync_mode_uses_executor(self):
+        retriever = self._retriever()
+        self.assertIsNone(retriever.async_client)
+        retriever.client = MagicMock()
+        retriever.client.search.return_value = {"hits": {"hits": [{"_id": "1"}]}}
+        self.assertEqual(await retriever.execute_raw_search({}), [{"_id": "1"}])
+        retriever.client.search.assert_called_once_with(
+            body={"timeout": "240000ms"}, index="test-index", request_timeout=300
+        )
+
+    async def test_raw_searches_use_one_msearch(self):
+        retriever = self._retriever()
+        retriever.client = MagicMock()
+        retriever.client.msearch.return_value = {
+            "responses": [
+                {"hits": {"hits": [{"_id": "1"}]}},
+                {"error": {"type": "search_phase_execution_exception"}, "status": 400},
+            ]
+        }
+        results = await retriever.execute_raw_searches([{"a": 1}, {"b": 2}])
+        self.assertEqual(results, [[{"_id": "1"}], []])
+        retriever.client.msearch.assert_called_once_with(
+            [
+                {"index": "test-index"},
+                {"a": 1, "timeout": "240000ms"},
+                {"index": "test-index"},
+                {"b": 2, "timeout": "240000ms"},
+            ],
+            request_timeout=300,
+        )
+        retriever.client.search.assert_not_called()
+
+    async def test_search_cache(self):
+        retriever = self._retriever(cache_ttl=60, host="cache-test")
+        self.assertIs(retriever.cache, self._retriever(cache_ttl=60, host="cache-test").cache)
+        retriever.client = MagicMock()
+        retriever.client.search.return_value = {"hits": {"hits": [{"_id": "1"}]}}
+
+        for _ in range(2):
+            self.assertEqual(await retriever.execute_raw_search({"a": 1}), [{"_id": "1"}])
+        retriever.client.search.assert_called_once()
+
+        retriever.client.msearch.return_value = {
+            "responses": [
+                {"hits": {"hits": [{"_id": "2"}]}},
+                {"error": {"type": "search_phase_execution_exception"}, "status": 400},
+            ]
+        }
+        results = await retriever.execute_raw_searches([{"a": 1}, {"b": 2}, {"c": 3}])
+        self.assertEqual(results, [[{"_id": "1"}], [{"_id": "2"}], []])
+        # only the queries missing from the cache are sent
+        retriever.client.msearch.assert_called_once_with(
+            [
+                {"index": "test-index"},
+                {"b": 2, "timeout": "240000ms"},
+                {"index": "test-index"},
+                {"c": 3, "timeout": "240000ms"},
+            ],
+            request_timeout=300,
+        )
+        self.assertEqual(retriever.cache.stats()["hits"], 2)
+
+    async def test_timed_out_searches_are_not_cached(self):
+        retriever = self._retriever(cache_ttl=60, host="timeout-cache-test")
+        retriever.client = MagicMock()
+        retriever.client.search.return_value = {
+            "timed_out": True,
+            "hits": {"hits": [{"_id": "partial"}]},
+        }
+        self.assertEqual(await retriever.execute_raw_search({"a": 1}), [{"_id": "partial"}])
+        retriever.client.search.return_value = {"hits": {"hits": [{"_id": "1"}]}}
+        self.assertEqual(await retriever.execute_raw_search({"a": 1}), [{"_id": "1"}])
+        self.assertEqual(retriever.client.search.call_count, 2)
+
+        retriever.client.msearch.return_value = {
+            "responses": [{"timed_out": True, "hits": {"hits": [{"_id": "partial"}]}}]
+        }
+        self.assertEqual(
+            await retriever.execute_raw_searches([{"b": 2}]), [[{"_id": "partial"}]]
+        )
+        self.assertIsNone(await retriever.cache.get("test-index", {"b": 2}))
+
+    async def test_hybrid_search_fuses_one_msearch(self):
+        retriever = self._retriever()
+        retriever.client = MagicMock()
+        retriever.client.msearch.return_value = {
+            "responses": [
+                {"hits": {"hits": [{"_id": "a"}, {"_id": "b"}]}},
+                {"hits": {"hits": [{"_id": "b"}, {"_id": "c"}]}},
+            ]
+        }
+        hits = await retriever.execute_hybrid_search(
+            "query", [0.1, 0.2], k=2, field_name="vector_x"
+        )
+        self.assertEqual([hit["_id"] for hit in hits], ["b", "a"])
+        retriever.client.msearch.assert_called_once()
+        retriever.client.search.assert_not_called()
+
+    async def test_native_hybrid_search(self):
+        retriever = self._retriever(native_hybrid=True)
+        retriever.client = MagicMock()
+        retriever.client.search.return_value = {"hits": {"hits": [{"_id": "a"}]}}
+        hits = await retriever.execute_hybrid_search(
+            "query", [0.1], k=5, weights=[0.3, 0.7], field_name="vector_x"
+        )
+        self.assertEqual(hits, [{"_id": "a"}])
+        body = retriever.client.search.call_args.kwargs["body"]
+        self.assertEqual(len(body["query"]["hybrid"]["queries"]), 2)
+        combination = body["search_pipeline"]["phase_results_processors"][0][
+            "score-ranker-processor"
+        ]["combination"]
+        self.assertEqual(combination["technique"], "rrf")
+        self.assertEqual(combination["parameters"], {"weights": [0.3, 0.7]})
+        retriever.client.msearch.assert_not_called()
+
+    async def test_collapse_mode(self):
+        retriever = self._retriever(collapse_field="id", collapse_inner_hits=3)
+        retriever.client = MagicMock()
+        retriever.client.search.return_value = {
+            "hits": {
+                "hits": [
+                    {
+                        "_id": "c2",
+                        "_score": 2.0,
+                        "_source": {"id": "doc", "system_id": "s2", "text": "two"},
+                        "inner_hits": {
+                            "chunks": {
+                                "hits": {
+                                    "hits": [
+                                        {"_id": "c1", "_source": {"system_id": "s1", "text": "one"}}
+                                    ]
+                                }
+                            }
+                        },
+                    }
+                ]
+            }
+        }
+        hits = await retriever.execute_text_search("query", k=5)
+        body = retriever.client.search.call_args.kwargs["body"]
+        self.assertEqual(body["collapse"]["field"], "id")
+        self.assertEqual(body["collapse"]["inner_hits"]["size"], 3)
+        self.assertEqual(len(hits), 1)
+        self.assertEqual(hits[0]["_id"], "doc")
+        self.assertEqual(hits[0]["text"], "one\ntwo")
+
+    def test_source_filtering(self):
+        retriever = self._retriever()
+        self.assertEqual(
+            retriever.build_text_query("query")["_source"], {"excludes": ["vector_*"]}
+        )
+        self.assertEqual(
+            retriever.build_vector_query("embedding", [0.1])["_source"],
+            {"excludes": ["vector_*", "embedding"]},
+        )
+
+        retriever = self._retriever(
+            source_includes=["title", "text"],
+            source_excludes=[],
+            docvalue_fields=["date"],
+            collapse_field="id",
+        )
+        query = retriever.build_text_query("query")
+        self.assertEqual(query["_source"], {"includes": ["title", "text"]})
+        self.assertEqual(query["docvalue_fields"], ["date"])
+        self.assertEqual(
+            query["collapse"]["inner_hits"]["_source"], {"includes": ["title", "text"]}
+        )
+
+    async def test_scan(self):
+        retriever = self._retriever()
+        retriever.client = MagicMock()
+        retriever.client.create_pit.return_value = {"pit_id": "pit-1"}
+        pages = [
+            [{"_id": "1", "sort": ["1"]}, {"_id": "2", "sort": ["2"]}],
+            [{"_id": "3", "sort": ["3"]}],
+        ]
+        bodies = []
+
+        def search(body):
+            bodies.append(dict(body))
+            return {"pit_id": "pit-2", "hits": {"hits": pages[len(bodies) - 1]}}
+
+        retriever.client.search.side_effect = search
+        hits = [hit async for hit in retriever.scan(page_size=2)]
+
+        self.assertEqual([hit["_id"] for hit in hits], ["1", "2", "3"])
+        retriever.client.create_pit.assert_called_once_with(
+            index="test-index", params={"keep_alive": "1m"}
+        )
+        self.assertEqual(bodies[0]["pit"], {"id": "pit-1", "keep_alive": "1m"})
+        self.assertNotIn("search_after", bodies[0])
+        self.assertEqual(bodies[1]["pit"]["id"], "pit-2")
+        self.assertEqual(bodies[1]["search_after"], ["2"])
+        self.assertEqual(bodies[1]["size"], 2)
+        retriever.client.delete_pit.assert_called_once_with(body={"pit_id": ["pit-2"]})
+
+    async def test_deadline(self):
+        retriever = self._retriever(request_timeout=30)
+        retriever.client = MagicMock()
+        retriever.client.search.return_value = {"timed_out": True, "hits": {"hits": []}}
+        with deadline(2):
+            await retriever.execute_raw_search({})
+        kwargs = retriever.client.search.call_args.kwargs
+        self.assertLessEqual(kwargs["request_timeout"], 2)
+        self.assertLessEqual(int(kwargs["body"]["timeout"][:-2]), 1600)
+
+        with deadline(0):
+            with self.assertRaises(TimeoutError):
+                await retriever.execute_raw_search({"other": 1})
+
+    async def test_mmr_search(self):
+        retriever = self._retriever()
+        retriever.client = MagicMock()
+        retriever.client.search.return_value = {
+            "hits": {
+                "hits": [
+                    {"_id": "a", "_score": 0.9, "_source": {"vector_x": [1.0, 0.1]}},
+                    {"_id": "b", "_score": 0.8, "_source": {"vector_x": [1.0, 0.11]}},
+                    {"_id": "c", "_score": 0.5, "_source": {"vector_x": [0.7, -0.7]}},
+                ]
+            }
+        }
+        results = await retriever.execute_mmr_search("vector_x", [1.0, 0.0], k=2, fetch_k=3)
+        self.assertEqual([result.id for result in results], ["a", "c"])
+        self.assertEqual(results[0].extra, {})
+        body = retriever.client.search.call_args.kwargs["body"]
+        self.assertNotIn("_source", body)
+        self.assertEqual(body["size"], 3)
+
+    async def test_mmr_search_with_collapse(self):
+        retriever = self._retriever(collapse_field="id")
+        retriever.client = MagicMock()
+
+        def hit(doc_id, vector):
+            return {
+                "_id": f"{doc_id}-1",
+                "_score": 1.0,
+                "_source": {"id": doc_id, "system_id": "1", "text": doc_id, "vector_x": vector},
+                "inner_hits": {
+                    "chunks": {
+                        "hits": {
+                            "hits": [
+                                {"_id": f"{doc_id}-0", "_source": {"system_id": "0", "text": "chunk"}}
+                            ]
+                        }
+                    }
+                },
+            }
+
+        retriever.client.search.return_value = {
+            "hits": {
+                "hits": [hit("a", [1.0, 0.1]), hit("b", [1.0, 0.11]), hit("c", [0.7, -0.7])]
+            }
+        }
+        results = await retriever.execute_mmr_search("vector_x", [1.0, 0.0], k=2, fetch_k=3)
+        self.assertEqual([result.id for result in results], ["a", "c"])
+        self.assertEqual(results[0].extra["text"], "chunk\na")
+        self.assertNotIn("vector_x", results[0].extra)
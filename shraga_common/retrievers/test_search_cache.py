@@ -0,0 +1,55 @@
+import unittest
+from unittest.mock import patch
+
+from .common import RetrieverConfig
+from .search_cache import InMemorySearchCacheBackend, SearchCache
+
+
+class TestSearchCache(unittest.IsolatedAsyncioTestCase):
+
+    async def test_key_is_canonical(self):
+        self.assertEqual(
+            SearchCache.make_key("idx", {"size": 1, "query": {"match_all": {}}}),
+            SearchCache.make_key("idx", {"query": {"match_all": {}}, "size": 1}),
+        )
+        self.assertNotEqual(
+            SearchCache.make_key("idx", {"size": 1}),
+            SearchCache.make_key("other", {"size": 1}),
+        )
+
+    async def test_hits_misses_and_copies(self):
+        cache = SearchCache(ttl=60)
+        self.assertIsNone(await cache.get("idx", {"q": 1}))
+        await cache.set("idx", {"q": 1}, [{"_id": "1"}])
+
+        hits = await cache.get("idx", {"q": 1})
+        self.assertEqual(hits, [{"_id": "1"}])
+        hits[0]["_id"] = "changed"
+        self.assertEqual(await cache.get("idx", {"q": 1}), [{"_id": "1"}])
+        self.assertEqual(cache.stats(), {"hits": 2, "misses": 1, "hit_rate": 2 / 3})
+
+    async def test_shared_per_connection_and_credentials(self):
+        config = RetrieverConfig(type="opensearch", host="shared-cache", cache_ttl=60, user="a")
+        cache = SearchCache.from_config(config)
+        self.assertIs(SearchCache.from_config(config.model_copy()), cache)
+        for update in ({"user": "b"}, {"password": "secret"}, {"api_key": "key"}):
+            self.assertIsNot(
+                SearchCache.from_config(config.model_copy(update=update)), cache
+            )
+        self.assertIsNone(SearchCache.from_config(config.model_copy(update={"cache_ttl": 0})))
+
+    async def test_ttl_and_lru_eviction(self):
+        backend = InMemorySearchCacheBackend(max_size=2)
+        with patch("shraga_common.retrievers.search_cache.time.monotonic") as now:
+            now.return_value = 100
+            await backend.set("a", "1", ttl=10)
+            await backend.set("b", "2", ttl=10)
+            self.assertEqual(await backend.get("a"), "1")
+            await backend.set("c", "3", ttl=10)
+            # b was the least recently used entry
+            self.assertIsNone(await backend.get("b"))
+            self.assertEqual(len(backend), 2)
+
+            now.return_value = 111
+            self.assertIsNone(await backend.get("a"))
+            self.assertEqual(len(backend), 1)
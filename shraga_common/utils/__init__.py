@@ -6,6 +6,7 @@ from .parsers import BedrockParser, extract_xml_section
 from .typing import safe_to_int
 from .is_prod_env import is_prod_env
 from .extract_user_org import extract_user_org
+from .deadline import deadline, remaining_time
 
 __all__ = [
     "BedrockParser",
@@ -19,4 +20,6 @@ __all__ = [
     "extract_xml_section",
     "is_prod_env",
     "extract_user_org",
+    "deadline",
+    "remaining_time",
 ]
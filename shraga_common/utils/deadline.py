@@ -0,0 +1,35 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator, Optional
+
+# absolute time.monotonic() deadline of the current request, if any
+_deadline: ContextVar[Optional[float]] = ContextVar("shraga_deadline", default=None)
+
+
+@contextmanager
+def deadline(timeout: Optional[float]) -> Iterator[None]:
+    """
+    Set a deadline of timeout seconds for the block and the tasks created in it.
+    A nested deadline can only shorten the enclosing one; None leaves it as is.
+    """
+    if timeout is None:
+        yield
+        return
+    expires_at = time.monotonic() + timeout
+    current = _deadline.get()
+    if current is not None:
+        expires_at = min(expires_at, current)
+    token = _deadline.set(expires_at)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def remaining_time() -> Optional[float]:
+    """Seconds left until the current deadline, None if there is no deadline."""
+    expires_at = _deadline.get()
+    if expires_at is None:
+        return None
+    return expires_at - time.monotonic()
@@ -0,0 +1,28 @@
+import asyncio
+import unittest
+
+from shraga_common.utils.deadline import deadline, remaining_time
+
+
+class TestDeadline(unittest.IsolatedAsyncioTestCase):
+
+    async def test_deadline(self):
+        self.assertIsNone(remaining_time())
+        with deadline(10):
+            self.assertAlmostEqual(remaining_time(), 10, delta=0.5)
+            # nested deadlines only shorten the enclosing one
+            with deadline(60):
+                self.assertLessEqual(remaining_time(), 10)
+            with deadline(1):
+                self.assertLessEqual(remaining_time(), 1)
+            with deadline(None):
+                self.assertGreater(remaining_time(), 1)
+        self.assertIsNone(remaining_time())
+
+    async def test_deadline_propagates_to_tasks(self):
+        async def task_remaining_time():
+            return remaining_time()
+
+        with deadline(5):
+            task = asyncio.create_task(task_remaining_time())
+        self.assertAlmostEqual(await task, 5, delta=0.5)